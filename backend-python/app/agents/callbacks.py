@@ -0,0 +1,279 @@
+"""エージェント実行用のコールバックハンドラ"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+from app.services import metrics
+from app.services.llm_cache import CACHE_HIT_KEY
+from app.services.usage_meter import usage_meter
+from .llm import ANSWERED_BY_KEY
+
+
+class ToolOutputCollector(AsyncCallbackHandler):
+    """完了したツールの出力を記録する（デッドライン超過時に途中結果を返すため）"""
+
+    def __init__(self):
+        self._running: Dict[UUID, str] = {}
+        self.outputs: List[tuple] = []
+
+    async def on_tool_start(
+        self,
+        serialized: Dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        self._running[run_id] = serialized.get("name", "")
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        name = self._running.pop(run_id, "")
+        self.outputs.append((name, output))
+
+    @property
+    def tools_called(self) -> List[str]:
+        return [name for name, _ in self.outputs]
+
+    def last_output(self, tool_name: str) -> Optional[Any]:
+        """指定したツールの最後の出力"""
+        for name, output in reversed(self.outputs):
+            if name == tool_name:
+                return output
+        return None
+
+
+class TokenUsageCollector(AsyncCallbackHandler):
+    """LLM 呼び出しの回数とトークン数を集計する（LLM キャッシュのヒットは回数のみ数える）"""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.llm_cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        if is_llm_cache_hit(response):
+            self.llm_cache_hits += 1
+            return
+        prompt_tokens, completion_tokens = extract_token_usage(response)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += extract_cached_tokens(response)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "llm_cache_hits": self.llm_cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "prompt_cache_hit_rate": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+        }
+
+
+def is_llm_cache_hit(response: LLMResult) -> bool:
+    """LLM レスポンスキャッシュから返った結果か（トークン・コストは発生していない）"""
+    return any(
+        (generation.generation_info or {}).get(CACHE_HIT_KEY)
+        for generations in response.generations
+        for generation in generations
+    )
+
+
+def answered_by_model(response: LLMResult) -> Optional[str]:
+    """ヘッジ先（副系）が応答した場合のモデル名（主系が応答した場合は None）"""
+    for generations in response.generations:
+        for generation in generations:
+            model = (generation.generation_info or {}).get(ANSWERED_BY_KEY)
+            if model:
+                return model
+    return None
+
+
+def extract_token_usage(response: LLMResult) -> Tuple[int, int]:
+    """LLMResult から (prompt_tokens, completion_tokens) を取り出す
+
+    ストリーミング時は llm_output が空のため、メッセージの usage_metadata を優先する。
+    """
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+
+def extract_cached_tokens(response: LLMResult) -> int:
+    """LLMResult からプロンプトキャッシュに当たった入力トークン数を取り出す
+
+    usage_metadata の input_token_details（新しい langchain-core）を優先し、
+    なければ llm_output の prompt_tokens_details.cached_tokens を見る。
+    langchain-openai 0.1 系のストリーミングではどちらも残らないため 0 になる。
+    """
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            details = usage.get("input_token_details") or {}
+            if "cache_read" in details:
+                return details["cache_read"] or 0
+
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+
+class MetricsCallbackHandler(AsyncCallbackHandler):
+    """LLM 呼び出し・ツール・AgentExecutor の実行を Prometheus メトリクスに記録する
+
+    LLM のトークン数は usage_meter にも計上する（セッション・ユーザー・会社別のコスト）。
+    LLM キャッシュのヒットはレイテンシ（status="cache_hit"）のみ記録し、トークン・コストには含めない。
+
+    状態は run_id ごとに持つため、1つのインスタンスを全リクエストで共有できる。
+    LLM のコンストラクタと AgentExecutor の config の両方に渡しても二重には記録されない。
+    """
+
+    def __init__(self):
+        self._agent_runs: Dict[UUID, List[float]] = {}  # ルートの run_id -> [開始時刻, LLM 呼び出し回数]
+        self._root_of: Dict[UUID, UUID] = {}  # 子の chain の run_id -> ルートの run_id
+        self._llm_runs: Dict[UUID, Tuple[float, str]] = {}
+        self._tool_runs: Dict[UUID, Tuple[float, str]] = {}
+
+    # --- AgentExecutor ---
+
+    async def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        if parent_run_id is None:
+            self._agent_runs[run_id] = [time.perf_counter(), 0]
+            self._root_of[run_id] = run_id
+            metrics.AGENT_RUNS_IN_FLIGHT.inc()
+        elif parent_run_id in self._root_of:
+            self._root_of[run_id] = self._root_of[parent_run_id]
+
+    async def on_chain_end(self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_chain(run_id, "success")
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_chain(run_id, "cancelled" if isinstance(error, asyncio.CancelledError) else "error")
+
+    def _finish_chain(self, run_id: UUID, status: str) -> None:
+        self._root_of.pop(run_id, None)
+        agent_run = self._agent_runs.pop(run_id, None)
+        if agent_run is None:
+            return
+        started_at, iterations = agent_run
+        metrics.AGENT_RUNS_IN_FLIGHT.dec()
+        metrics.AGENT_RUN_LATENCY.labels(status=status).observe(time.perf_counter() - started_at)
+        metrics.AGENT_ITERATIONS.observe(iterations)
+
+    # --- LLM ---
+
+    async def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(serialized, run_id, parent_run_id, metadata)
+
+    async def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(serialized, run_id, parent_run_id, metadata)
+
+    def _start_llm(
+        self,
+        serialized: Dict[str, Any],
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        metadata: Optional[Dict[str, Any]],
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name") or serialized.get("kwargs", {}).get("model_name", "unknown")
+        self._llm_runs[run_id] = (time.perf_counter(), model)
+        root = self._root_of.get(parent_run_id) if parent_run_id else None
+        if root in self._agent_runs:
+            self._agent_runs[root][1] += 1
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        llm_run = self._llm_runs.pop(run_id, None)
+        if llm_run is None:
+            return
+        started_at, model = llm_run
+        latency = time.perf_counter() - started_at
+        # ヘッジ先が応答した場合は、そのモデルのトークン・単価で計上する
+        model = answered_by_model(response) or model
+        if is_llm_cache_hit(response):
+            # 保存時の usage_metadata が再生されるだけなので、トークン・コストには計上しない
+            metrics.LLM_CALL_LATENCY.labels(model=model, status="cache_hit").observe(latency)
+            return
+        metrics.LLM_CALL_LATENCY.labels(model=model, status="success").observe(latency)
+        prompt_tokens, completion_tokens = extract_token_usage(response)
+        metrics.LLM_PROMPT_TOKENS.labels(model=model).observe(prompt_tokens)
+        metrics.LLM_COMPLETION_TOKENS.labels(model=model).observe(completion_tokens)
+        cached_tokens = extract_cached_tokens(response)
+        metrics.LLM_CACHED_PROMPT_TOKENS.labels(model=model).observe(cached_tokens)
+        cost_usd = usage_meter.record(model, prompt_tokens, completion_tokens, cached_tokens)
+        metrics.LLM_COST_USD.labels(model=model).inc(cost_usd)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        llm_run = self._llm_runs.pop(run_id, None)
+        if llm_run is None:
+            return
+        started_at, model = llm_run
+        latency = time.perf_counter() - started_at
+        metrics.LLM_CALL_LATENCY.labels(model=model, status="error").observe(latency)
+
+    # --- ツール ---
+
+    async def on_tool_start(
+        self,
+        serialized: Dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        **kwargs: Any,
+    ) -> None:
+        self._tool_runs[run_id] = (time.perf_counter(), serialized.get("name", "unknown"))
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        status = "timeout" if isinstance(output, dict) and output.get("timeout") else "success"
+        self._finish_tool(run_id, status)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, "error")
+
+    def _finish_tool(self, run_id: UUID, status: str) -> None:
+        tool_run = self._tool_runs.pop(run_id, None)
+        if tool_run is None:
+            return
+        started_at, name = tool_run
+        metrics.TOOL_LATENCY.labels(tool=name, status=status).observe(time.perf_counter() - started_at)
+
+
+# 全リクエストで共有するインスタンス
+metrics_callback = MetricsCallbackHandler()
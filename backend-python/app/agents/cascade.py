@@ -0,0 +1,130 @@
+"""モデルカスケード
+
+小さいモデルでターンを分類し、ツールを使わずに答えられるターン（挨拶・雑談・使い方の質問・
+条件の聞き返し等）はそのまま応答する。ツールの呼び出しが必要なターンだけ大きいモデルの
+AgentExecutor にエスカレーションする。
+
+以下は小さいモデルを呼ばずに即エスカレーションする:
+- 出張条件が揃っている（plan_generator を呼ぶ可能性が高い）
+- ツールが必要なことが明らかなキーワードを含む
+"""
+import time
+from typing import Any, Dict, List, Literal, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+
+from app.logging_config import get_logger
+from app.models.schemas import TravelConditions
+from app.services import metrics
+from .fast_path import missing_slots
+from .keywords import TOOL_KEYWORDS, contains_any
+from .llm import DeadlineAwareChatOpenAI
+
+logger = get_logger(__name__)
+
+CASCADE_PROMPT = """あなたは営業担当者の出張計画をサポートするAIアシスタントの一次受付です。
+ユーザーの最新メッセージに、ツール（旅費規程チェック、交通検索、ホテル検索、プラン生成）を使わずに
+正確に答えられるかを判断してください。
+
+- 挨拶・お礼・雑談、アシスタントの使い方の質問、出張条件（出発地・目的地・日程）の不足分の聞き返しは
+  route="answer" とし、response に日本語で簡潔な応答を書いてください
+- 規程・予算・交通手段・ホテル・料金・プランに関わる内容、または判断に迷う場合は route="escalate" とし、
+  response は空にしてください
+"""
+
+# ターンごとに変わる情報（プロンプトキャッシュが効くよう CASCADE_PROMPT と分けて末尾側に置く）
+CONTEXT_PROMPT = """## 現在の会話状況
+{context}
+"""
+
+
+class CascadeDecision(BaseModel):
+    """小さいモデルの判定結果"""
+    route: Literal["answer", "escalate"] = Field(..., description="answer: このまま応答 / escalate: 上位モデルに委譲")
+    response: Optional[str] = Field(None, description="route=answer の場合の応答文")
+
+
+def needs_tools(user_message: str, conditions: TravelConditions) -> Optional[str]:
+    """小さいモデルを呼ぶまでもなくエスカレーションすべき理由（なければ None）"""
+    if not missing_slots(conditions):
+        return "conditions_complete"
+    # ツールが必要な話題は小さいモデルを呼ばずにエスカレーション
+    if contains_any(user_message, TOOL_KEYWORDS):
+        return "tool_keyword"
+    return None
+
+
+class ModelCascade:
+    """小さいモデルによる分類・応答と、エスカレーション判定のカウンタ"""
+
+    def __init__(self, small_llm: DeadlineAwareChatOpenAI):
+        self.small_llm = small_llm
+        self.classifier = small_llm.with_structured_output(CascadeDecision, include_raw=True)
+        self.routes: Dict[str, int] = {"small": 0, "escalate": 0}
+
+    async def decide(
+        self,
+        user_message: str,
+        conditions: TravelConditions,
+        chat_history: List[BaseMessage],
+        context: str,
+    ) -> Dict[str, Any]:
+        """ターンの振り分けを決める
+
+        Returns:
+            {"tier": "small" | "large", "response": str | None, "reason": str,
+             "latency_ms": float, "prompt_tokens": int, "completion_tokens": int}
+        """
+        start_time = time.perf_counter()
+        decision = {"tier": "large", "response": None, "prompt_tokens": 0, "completion_tokens": 0}
+
+        reason = needs_tools(user_message, conditions)
+        if reason is None:
+            try:
+                result = await self.classifier.ainvoke([
+                    SystemMessage(content=CASCADE_PROMPT),
+                    *chat_history,
+                    SystemMessage(content=CONTEXT_PROMPT.format(context=context)),
+                    HumanMessage(content=user_message),
+                ])
+                usage = getattr(result["raw"], "usage_metadata", None) or {}
+                decision["prompt_tokens"] = usage.get("input_tokens", 0)
+                decision["completion_tokens"] = usage.get("output_tokens", 0)
+
+                parsed: Optional[CascadeDecision] = result["parsed"]
+                if parsed and parsed.route == "answer" and parsed.response:
+                    decision["tier"] = "small"
+                    decision["response"] = parsed.response
+                    reason = "small_model_answered"
+                else:
+                    reason = "small_model_escalated"
+            except Exception as e:
+                # 判定に失敗した場合は上位モデルに任せる
+                logger.warning("cascade_classifier_failed", error=str(e), error_type=type(e).__name__)
+                reason = "classifier_error"
+
+        decision["reason"] = reason
+        decision["latency_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+        self.routes["small" if decision["tier"] == "small" else "escalate"] += 1
+        metrics.CASCADE_ROUTES.labels(tier=decision["tier"], reason=reason).inc()
+
+        logger.info(
+            "cascade_decision",
+            tier=decision["tier"],
+            reason=reason,
+            small_model=self.small_llm.model_name,
+            small_latency_ms=decision["latency_ms"],
+            small_prompt_tokens=decision["prompt_tokens"],
+            small_completion_tokens=decision["completion_tokens"],
+            **self.stats(),
+        )
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        """カウンタのスナップショット"""
+        total = sum(self.routes.values())
+        return {
+            "routes": dict(self.routes),
+            "small_tier_rate": round(self.routes["small"] / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,145 @@
+"""トークン予算付きの会話履歴
+
+直近のメッセージをトークン数の予算内で LLM に渡し、予算からあふれた古いメッセージは
+セッションごとのローリング要約（SessionData.history_summary）に畳み込む。
+
+- 要約は前回の要約 + 新たにあふれたメッセージから差分で更新する（全履歴を再要約しない）
+- 予算を超えたら予算の半分まで畳み込むため、要約の更新は数ターンに1回で済む
+- 要約に失敗した場合は要約を更新せず、予算内のメッセージだけを渡す
+"""
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.models.schemas import Message, SessionData
+from app.services.http_client import get_openai_http_client
+from app.services.token_counter import count_text_tokens
+from .callbacks import metrics_callback
+from .llm import DeadlineAwareChatOpenAI
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# メッセージごとのオーバーヘッド（role 等）の概算
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """以下は出張計画サポートの会話です。これまでの要約と新しいメッセージを統合し、
+今後の応答に必要な情報（出張条件、ユーザーの希望・制約、提示済みのプランと選択状況、未解決の質問）を
+箇条書きで簡潔にまとめてください。プランの詳細な表や金額の内訳は省略してください。
+
+## これまでの要約
+{summary}
+
+## 新しいメッセージ
+{messages}
+"""
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """メッセージ1件として送ったときのトークン数（本文 + メッセージの固定分）
+
+    同じメッセージをターンごとに数え直すためキャッシュする。
+    """
+    return count_text_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatHistoryBuilder:
+    """トークン予算内の会話履歴を組み立てる"""
+
+    def __init__(self, token_budget: int, summary_llm: Optional[DeadlineAwareChatOpenAI] = None):
+        self.token_budget = token_budget
+        self.summary_llm = summary_llm or DeadlineAwareChatOpenAI(
+            model=settings.history_summary_model,
+            temperature=0,
+            max_tokens=settings.history_summary_max_tokens,
+            api_key=settings.openai_api_key,
+            http_async_client=get_openai_http_client(),
+            callbacks=[metrics_callback],
+        )
+
+    async def build(self, session_data: SessionData, user_message: str) -> List[BaseMessage]:
+        """LangChain 形式の会話履歴を返す（必要に応じて要約を更新）"""
+        messages = session_data.messages
+        end = len(messages)
+        # 今回のユーザーメッセージは input として別に渡すため履歴から除く
+        if end and messages[-1].role == "user" and messages[-1].content == user_message:
+            end -= 1
+
+        start = min(session_data.summarized_message_count, end)
+        window = messages[start:end]
+        tokens = [count_tokens(m.content) for m in window]
+
+        if sum(tokens) > self.token_budget and len(window) > 1:
+            cut = self._keep_from(tokens, self.token_budget // 2)
+            if await self._fold(session_data, window[:cut], start + cut):
+                window = window[cut:]
+            else:
+                # 要約できなかった場合も予算内に収まる分だけ渡す
+                window = window[self._keep_from(tokens, self.token_budget):]
+
+        return self._to_langchain(session_data.history_summary, window)
+
+    @staticmethod
+    def _keep_from(tokens: List[int], target: int) -> int:
+        """新しい方から target トークンに収まる先頭の位置（直前の1件は必ず残す）"""
+        kept = 0
+        index = len(tokens)
+        for count in reversed(tokens):
+            if kept + count > target:
+                break
+            kept += count
+            index -= 1
+        return min(index, len(tokens) - 1)
+
+    async def _fold(self, session_data: SessionData, folded: List[Message], summarized_count: int) -> bool:
+        """あふれたメッセージを要約に畳み込む"""
+        start_time = time.time()
+        lines = []
+        for msg in folded:
+            speaker = "ユーザー" if msg.role == "user" else "アシスタント"
+            lines.append(f"{speaker}: {msg.content[:settings.history_summary_message_chars]}")
+
+        prompt = SUMMARY_PROMPT.format(
+            summary=session_data.history_summary or "（なし）",
+            messages="\n".join(lines),
+        )
+        try:
+            result = await self.summary_llm.ainvoke([HumanMessage(content=prompt)])
+        except Exception as e:
+            logger.warning(
+                "history_summary_failed",
+                session_id=session_data.session_id,
+                error=str(e),
+                error_type=type(e).__name__,
+            )
+            return False
+
+        session_data.history_summary = result.content.strip()
+        session_data.summarized_message_count = summarized_count
+
+        logger.info(
+            "history_summarized",
+            session_id=session_data.session_id,
+            folded_messages=len(folded),
+            summarized_message_count=summarized_count,
+            summary_tokens=count_tokens(session_data.history_summary),
+            duration_ms=round((time.time() - start_time) * 1000, 2),
+        )
+        return True
+
+    @staticmethod
+    def _to_langchain(summary: str, messages: List[Message]) -> List[BaseMessage]:
+        chat_history: List[BaseMessage] = []
+        if summary:
+            chat_history.append(SystemMessage(content=f"これまでの会話の要約:\n{summary}"))
+        for msg in messages:
+            if msg.role == "user":
+                chat_history.append(HumanMessage(content=msg.content))
+            else:
+                chat_history.append(AIMessage(content=msg.content))
+        return chat_history
@@ -0,0 +1,100 @@
+"""縮退運転用の決定的なプランナー
+
+LLM の劣化で縮退モード（app.services.degradation）に入っている間、新しいターンは
+LLM を使わずに既存のツールとルールで応答する（ツールは run_tool_async でスレッドプールから呼ぶ）:
+
+- 条件が揃っている → plan_generator でプランを生成
+- 規程・予算の質問 → 規程の要点と、分かっている条件での policy_checker の結果
+- それ以外 → 不足している条件を聞き返す
+
+応答には簡易モードである旨を添える。
+"""
+from typing import Any, Dict, List
+
+from app.logging_config import get_logger
+from app.models.schemas import TravelConditions
+from app.services import metrics
+from .fast_path import build_plan_input, build_plan_response, build_slot_question, missing_slots
+from .keywords import POLICY_KEYWORDS, contains_any
+from .tools import PlanGeneratorTool, PolicyCheckerTool
+from .tools.policy_checker import TRAVEL_POLICY
+from .tools.tool_runtime import run_tool_async
+from .tools.tool_output import render_policy
+
+logger = get_logger(__name__)
+
+DEGRADED_NOTICE = "\n\n※ 現在 AI の応答が遅延しているため、簡易モードでお答えしています。"
+
+
+def build_policy_overview() -> str:
+    """国内出張の規程の要点"""
+    budget = TRAVEL_POLICY["daily_budget"]["domestic"]
+    lines = [
+        "国内出張の旅費規程の要点です。",
+        f"- 交通費: 1日あたり{budget['transportation']:,}円まで",
+        f"- 宿泊費: 1泊あたり{budget['accommodation']:,}円まで（{TRAVEL_POLICY['accommodation_rules']['note']}）",
+        f"- 食事代: 1日あたり{budget['meals']:,}円まで",
+    ]
+    lines += [
+        f"- {name}: {rule['class']}（{rule['note']}）"
+        for name, rule in TRAVEL_POLICY["transportation_rules"].items()
+    ]
+    return "\n".join(lines)
+
+
+class DegradedPlanner:
+    """LLM を使わずに1ターン分の応答を作る"""
+
+    def __init__(self, plan_generator: PlanGeneratorTool, policy_checker: PolicyCheckerTool):
+        self.plan_generator = plan_generator
+        self.policy_checker = policy_checker
+
+    async def respond(self, user_message: str, conditions: TravelConditions) -> Dict[str, Any]:
+        """縮退中のターンの応答
+
+        Returns:
+            {"route": "plan" | "policy" | "slot_filling", "response": str, "plans": List[TravelPlan]}
+        """
+        result = await self._respond(user_message, conditions)
+        result["response"] += DEGRADED_NOTICE
+        metrics.DEGRADED_TURNS.labels(route=result["route"]).inc()
+        logger.info("degraded_planner_responded", route=result["route"], plan_count=len(result["plans"]))
+        return result
+
+    async def _respond(self, user_message: str, conditions: TravelConditions) -> Dict[str, Any]:
+        missing = missing_slots(conditions)
+        if not missing:
+            tool_output = await run_tool_async(self.plan_generator, **build_plan_input(conditions))
+            plans = tool_output.get("plans") or []
+            if plans:
+                return {
+                    "route": "plan",
+                    "response": build_plan_response(conditions, len(plans)),
+                    "plans": plans,
+                }
+
+        if contains_any(user_message, POLICY_KEYWORDS):
+            return {"route": "policy", "response": await self._policy_response(conditions), "plans": []}
+
+        if not missing:
+            # 条件は揃っているがプランを作れなかった（未対応の区間・タイムアウトなど）
+            return {
+                "route": "slot_filling",
+                "response": "申し訳ありません。ご指定の条件ではプランを作成できませんでした。出発地・目的地・日程をご確認ください。",
+                "plans": [],
+            }
+        return {"route": "slot_filling", "response": build_slot_question(conditions, missing), "plans": []}
+
+    async def _policy_response(self, conditions: TravelConditions) -> str:
+        lines: List[str] = [build_policy_overview()]
+        tool_input = {
+            "transportation_type": conditions.preferred_transportation,
+            "total_budget": conditions.budget,
+        }
+        tool_input = {k: v for k, v in tool_input.items() if v is not None}
+        if tool_input:
+            result = await run_tool_async(self.policy_checker, **tool_input)
+            if result.get("status"):
+                lines.append("\nご指定の条件でのチェック結果:")
+                lines.append(render_policy(result))
+        return "\n".join(lines)
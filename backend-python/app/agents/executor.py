@@ -0,0 +1,149 @@
+"""plan_generator の成功でループを終える AgentExecutor
+
+プランはフロントエンドがカード（type="plan_cards"）で表示するため、plan_generator の後に
+大きいモデルでプランを文章にし直す必要はない。plan_generator が成功したステップで実行を終え、
+応答文は以下のいずれかで作る（plan_finish_mode）:
+
+- template: ファストパスと同じ定型文（LLM 呼び出しなし）
+- summary: 小さいモデルによる短い要約（astream_events ではトークンとしてストリーミングされる）
+- off: 従来どおり LLM に次のステップを任せる
+
+非同期の実行（ainvoke / astream_events）のみ対象。
+"""
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import AsyncCallbackManagerForChainRun, Callbacks
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.tools import BaseTool
+
+from app.logging_config import get_logger
+from app.models.schemas import TravelConditions
+from .fast_path import build_plan_response
+from .tools import published_plans
+from .tools.tool_output import render_plans
+
+logger = get_logger(__name__)
+
+PLAN_FINISH_MODES = ("template", "summary")
+
+SUMMARY_PROMPT = """あなたは営業担当者の出張計画をサポートするAIアシスタントです。
+生成された出張プランの一覧（表）をもとに、ユーザーへの応答を日本語で2〜3文で書いてください。
+プランの詳細は別途カードで表示されるため、表を書き写さず、各プランの違い（料金・所要時間・規程）と
+選択を促す一言だけを述べてください。
+"""
+
+
+class PlanFinishingAgentExecutor(AgentExecutor):
+    """plan_generator が成功したらそのステップで AgentFinish を返す AgentExecutor"""
+
+    plan_finish_mode: str = "off"
+    summary_llm: Optional[BaseChatModel] = None
+
+    async def _aiter_next_step(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, str],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> AsyncIterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        # ainvoke（_acall）と astream（AgentExecutorIterator）の両方がこのメソッドでステップを進める
+        steps: List[AgentStep] = []
+        async for chunk in super()._aiter_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+        ):
+            if isinstance(chunk, AgentStep):
+                steps.append(chunk)
+            yield chunk
+
+        if self.plan_finish_mode not in PLAN_FINISH_MODES:
+            return
+        plan_step = next((step for step in steps if step.action.tool == "plan_generator"), None)
+        plans = published_plans()
+        if plan_step is None or not plans:
+            return
+
+        # AgentFinish を返すとこのステップの結果は intermediate_steps に追加されないため、ここで追加しておく
+        intermediate_steps.extend((step.action, step.observation) for step in steps)
+        response = await plan_finish_response(
+            self.plan_finish_mode,
+            self.summary_llm,
+            inputs.get("input", ""),
+            plan_step.action.tool_input,
+            plan_step.observation,
+            len(plans),
+            callbacks=run_manager.get_child() if run_manager else None,
+        )
+        yield AgentFinish({"output": response}, "")
+
+    def _consume_next_step(
+        self, values: List[Union[AgentFinish, AgentAction, AgentStep]]
+    ) -> Union[AgentFinish, List[Tuple[AgentAction, str]]]:
+        # 基底クラスは AgentFinish が単独で返ることを前提にしている
+        if len(values) > 1 and isinstance(values[-1], AgentFinish):
+            return values[-1]
+        return super()._consume_next_step(values)
+
+
+def _template_response(tool_input: Any, plan_count: int) -> str:
+    """ファストパスと同じ定型文（条件は plan_generator の引数から取る）"""
+    tool_input = tool_input if isinstance(tool_input, dict) else {}
+    conditions = TravelConditions(**{
+        key: value for key, value in tool_input.items() if key in TravelConditions.model_fields
+    })
+    return build_plan_response(conditions, plan_count)
+
+
+async def _summary_response(
+    summary_llm: Optional[BaseChatModel],
+    user_message: str,
+    observation: Any,
+    callbacks: Callbacks,
+) -> Optional[str]:
+    """小さいモデルで要約する（失敗時は None を返し、定型文に切り替える）"""
+    if summary_llm is None:
+        return None
+    table = observation if isinstance(observation, str) else render_plans(observation)
+    try:
+        message = await summary_llm.ainvoke(
+            [
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content=f"ユーザーの依頼: {user_message}\n\n{table}"),
+            ],
+            config={"callbacks": callbacks},
+        )
+        return message.content
+    except Exception as e:
+        logger.warning("agent_plan_summary_failed", error=str(e), error_type=type(e).__name__)
+        return None
+
+
+async def plan_finish_response(
+    mode: str,
+    summary_llm: Optional[BaseChatModel],
+    user_message: str,
+    tool_input: Any,
+    observation: Any,
+    plan_count: int,
+    callbacks: Callbacks = None,
+) -> str:
+    """plan_generator の成功で実行を終える際の応答文（ToolCallingLoop と共用）"""
+    start_time = time.perf_counter()
+    response = None
+    if mode == "summary":
+        response = await _summary_response(summary_llm, user_message, observation, callbacks)
+    if not response:
+        mode = "template"
+        response = _template_response(tool_input, plan_count)
+
+    logger.info(
+        "agent_plan_finish",
+        mode=mode,
+        plan_count=plan_count,
+        response_ms=round((time.perf_counter() - start_time) * 1000, 2),
+    )
+    return response
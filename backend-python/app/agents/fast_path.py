@@ -0,0 +1,274 @@
+"""LLM を経由しない決定的なファストパス
+
+エージェント実行前にユーザーメッセージを判定し、以下のターンは LLM 呼び出しを省略する:
+- 条件が揃った状態での確認（「お願いします」「それでお願い」等）
+  → plan_generator を直接呼び出してプランを返す
+- 条件が不足した状態での確認
+  → 不足項目を聞き返す定型文を返す
+- 条件のみを伝えるメッセージ（「東京から大阪、12/9-10で」等）
+  → 条件が揃えばプランを生成し、不足していれば聞き返す
+
+それ以外のターンは None を返し、通常どおり AgentExecutor に委譲する。
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from app.logging_config import get_logger
+from app.models.schemas import TravelConditions
+from app.services import metrics
+from .keywords import POLICY_KEYWORDS, QUESTION_KEYWORDS, contains_any
+from .tools import PlanGeneratorTool
+from .tools.tool_runtime import run_tool_async
+
+logger = get_logger(__name__)
+
+
+# 確認とみなす発話（正規化後に完全一致で判定）
+CONFIRMATION_PHRASES = {
+    "お願い",
+    "お願いします",
+    "お願いいたします",
+    "よろしく",
+    "よろしくお願いします",
+    "それで",
+    "それでお願い",
+    "それでお願いします",
+    "それでいい",
+    "それでいいです",
+    "それで大丈夫",
+    "それで大丈夫です",
+    "その条件で",
+    "その条件でお願い",
+    "その条件でお願いします",
+    "その内容で",
+    "その内容でお願いします",
+    "進めて",
+    "進めてください",
+    "プランを作って",
+    "プランを作ってください",
+    "プランを作成して",
+    "プランを作成してください",
+    "プランを出して",
+    "プランを出してください",
+    "プランお願いします",
+}
+
+# 直前のアシスタントの発話がプラン作成の確認だった場合のみ確認とみなす相づち
+# （「はい」だけでは何への返事か分からないため）
+ACKNOWLEDGEMENT_PHRASES = {
+    "はい",
+    "うん",
+    "ok",
+    "okです",
+    "了解",
+    "了解です",
+}
+
+# プラン作成の確認とみなすアシスタントの発話（対象の語と問いかけの両方を含む）
+PLAN_CONFIRMATION_TOPICS = ("プラン", "条件")
+PLAN_CONFIRMATION_QUESTIONS = ("よろしいですか", "よろしいでしょうか", "しますか", "しましょうか", "進めますか")
+
+# 不足項目ごとの聞き返しテンプレート
+SLOT_QUESTIONS = {
+    "departure_location": "出発地（例: 東京）",
+    "destination": "目的地（例: 大阪）",
+    "depart_date": "出発日（例: 12/9）",
+    "return_date": "帰着日（日帰りの場合は「日帰り」とお伝えください）",
+}
+
+# 条件の提示だけでなく質問・相談を含むとみなすキーワード（LLM に委譲する）。
+# 「1泊」「新幹線で」は条件の提示にも使うため、宿泊・交通は検索の指定になる語だけを含める
+OPEN_QUESTION_KEYWORDS = QUESTION_KEYWORDS + POLICY_KEYWORDS + ("ホテル", "時刻")
+
+# 条件提示とみなす抽出項目
+TRIP_CONDITION_KEYS = {
+    "departure_location", "destination", "unassigned_locations",
+    "depart_date", "return_date", "is_day_trip", "nights",
+}
+
+# 先頭のタグ（テストスクリプトが付与する "[Python] " 等）と記号・空白
+_TAG_PATTERN = re.compile(r"^\s*\[[^\]]*\]\s*")
+_NOISE_PATTERN = re.compile(r"[\s、。，．,.!！?？〜~ー…]+")
+
+
+def normalize_message(message: str) -> str:
+    """判定用にメッセージを正規化"""
+    text = _TAG_PATTERN.sub("", message)
+    text = _NOISE_PATTERN.sub("", text)
+    return text.lower()
+
+
+def asks_plan_confirmation(assistant_message: Optional[str]) -> bool:
+    """アシスタントの発話がプラン作成の確認を求めているか"""
+    if not assistant_message:
+        return False
+    return contains_any(assistant_message, PLAN_CONFIRMATION_TOPICS) and contains_any(
+        assistant_message, PLAN_CONFIRMATION_QUESTIONS
+    )
+
+
+def is_confirmation(message: str, last_assistant_message: Optional[str] = None) -> bool:
+    """確認のみの発話かどうか
+
+    「はい」等の相づちは、直前のアシスタントの発話がプラン作成の確認だった場合のみ確認とみなす。
+    """
+    text = normalize_message(message)
+    if text in CONFIRMATION_PHRASES:
+        return True
+    return text in ACKNOWLEDGEMENT_PHRASES and asks_plan_confirmation(last_assistant_message)
+
+
+def is_condition_statement(message: str, extracted: Dict[str, Any]) -> bool:
+    """出張条件を伝えるだけの発話かどうか"""
+    if not TRIP_CONDITION_KEYS & extracted.keys():
+        return False
+    return not contains_any(message, OPEN_QUESTION_KEYWORDS)
+
+
+def missing_slots(conditions: TravelConditions) -> List[str]:
+    """プラン生成に不足している条件項目を返す"""
+    missing = []
+    if not conditions.departure_location:
+        missing.append("departure_location")
+    if not conditions.destination:
+        missing.append("destination")
+    if not conditions.depart_date:
+        missing.append("depart_date")
+    if not conditions.return_date and not conditions.is_day_trip:
+        missing.append("return_date")
+    return missing
+
+
+def build_slot_question(conditions: TravelConditions, missing: List[str]) -> str:
+    """不足項目の聞き返し文を組み立てる"""
+    known = []
+    if conditions.departure_location:
+        known.append(f"出発地: {conditions.departure_location}")
+    if conditions.destination:
+        known.append(f"目的地: {conditions.destination}")
+    if conditions.depart_date:
+        known.append(f"出発日: {conditions.depart_date}")
+    if conditions.return_date:
+        known.append(f"帰着日: {conditions.return_date}")
+    elif conditions.is_day_trip:
+        known.append("日帰り")
+
+    head = f"承知しました（{'、'.join(known)}）。" if known else ""
+    items = "\n".join(f"- {SLOT_QUESTIONS[slot]}" for slot in missing)
+    return f"{head}プランを作成するために、以下を教えてください。\n{items}"
+
+
+def build_plan_response(conditions: TravelConditions, plan_count: int) -> str:
+    """ファストパスでプランを生成した際の応答文"""
+    if conditions.is_day_trip or not conditions.return_date:
+        schedule = f"{conditions.depart_date} 日帰り"
+    else:
+        schedule = f"{conditions.depart_date}〜{conditions.return_date}"
+    return (
+        f"{conditions.departure_location}から{conditions.destination}への出張"
+        f"（{schedule}）について、{plan_count}件のプランを作成しました。"
+        "内容をご確認のうえ、ご希望のプランを選択してください。"
+    )
+
+
+def build_plan_input(conditions: TravelConditions) -> Dict[str, Any]:
+    """条件から plan_generator の入力を組み立てる（未設定の項目は省略）"""
+    tool_input = {
+        "departure_location": conditions.departure_location,
+        "destination": conditions.destination,
+        "depart_date": conditions.depart_date,
+        "return_date": None if conditions.is_day_trip else conditions.return_date,
+        "budget": conditions.budget,
+        "preferred_transportation": conditions.preferred_transportation,
+    }
+    return {k: v for k, v in tool_input.items() if v is not None}
+
+
+class FastPathRouter:
+    """エージェント実行前のルーター
+
+    ヒット率はルート種別ごとのカウンタ（fast_path_routes）から算出し、判定のたびにログ出力する。
+    """
+
+    def __init__(self, plan_generator: PlanGeneratorTool):
+        self.plan_generator = plan_generator
+        self.total = 0
+        self.hits: Dict[str, int] = {"plan": 0, "slot_filling": 0}
+
+    @property
+    def hit_rate(self) -> float:
+        """ファストパスで処理したターンの割合"""
+        if self.total == 0:
+            return 0.0
+        return sum(self.hits.values()) / self.total
+
+    def stats(self) -> Dict[str, Any]:
+        """カウンタのスナップショット"""
+        return {
+            "total": self.total,
+            "hits": dict(self.hits),
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    async def route(
+        self,
+        user_message: str,
+        conditions: TravelConditions,
+        extracted: Optional[Dict[str, Any]] = None,
+        last_assistant_message: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """ファストパスで処理できる場合は結果を返す
+
+        Args:
+            conditions: 今回のメッセージをマージした後の条件
+            extracted: 今回のメッセージから抽出された項目
+            last_assistant_message: 直前のアシスタントの発話（相づちを確認とみなすかの判定に使う）
+
+        Returns:
+            {"route": "plan" | "slot_filling", "response": str, "tool_output": dict | None}
+            または None（エージェントに委譲）
+        """
+        self.total += 1
+        result = await self._route(user_message, conditions, extracted or {}, last_assistant_message)
+
+        if result:
+            self.hits[result["route"]] += 1
+        route = result["route"] if result else "agent"
+        metrics.FAST_PATH_ROUTES.labels(route=route).inc()
+
+        logger.info("fast_path_routed", route=route, **self.stats())
+        return result
+
+    async def _route(
+        self,
+        user_message: str,
+        conditions: TravelConditions,
+        extracted: Dict[str, Any],
+        last_assistant_message: Optional[str],
+    ) -> Optional[Dict[str, Any]]:
+        if not (
+            is_confirmation(user_message, last_assistant_message)
+            or is_condition_statement(user_message, extracted)
+        ):
+            return None
+
+        missing = missing_slots(conditions)
+        if missing:
+            return {
+                "route": "slot_filling",
+                "response": build_slot_question(conditions, missing),
+                "tool_output": None,
+            }
+
+        # スレッドプールで実行（同時実行数の上限・タイムアウト・デッドラインはツール呼び出しと共通）
+        tool_output = await run_tool_async(self.plan_generator, **build_plan_input(conditions))
+
+        # プランが作れない（未対応の区間・タイムアウトなど）場合は LLM に説明を任せる
+        if not tool_output.get("plans"):
+            return None
+
+        return {
+            "route": "plan",
+            "response": build_plan_response(conditions, len(tool_output["plans"])),
+            "tool_output": tool_output,
+        }
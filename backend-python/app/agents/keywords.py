@@ -0,0 +1,31 @@
+"""メッセージの内容を判定するキーワード
+
+ファストパス・モデルカスケード・ツール選択・縮退運転のプランナーで共有する
+（同じ話題の判定がモジュールごとにずれないように、ここでだけ定義する）。
+"""
+
+# 旅費規程・予算
+POLICY_KEYWORDS = ("規程", "ルール", "予算", "上限", "精算", "申請", "承認")
+
+# 交通手段の検索
+TRANSPORTATION_KEYWORDS = ("新幹線", "飛行機", "電車", "交通", "時刻", "便", "移動")
+
+# 宿泊先の検索
+HOTEL_KEYWORDS = ("ホテル", "宿泊", "泊", "宿")
+
+# 料金・プラン
+COST_KEYWORDS = ("プラン", "料金", "金額", "いくら", "費用")
+
+# ツールが必要な話題（いずれかを含むターンは小さいモデルに任せない）
+TOOL_KEYWORDS = POLICY_KEYWORDS + TRANSPORTATION_KEYWORDS + HOTEL_KEYWORDS + COST_KEYWORDS
+
+# 質問・相談の言い回し
+QUESTION_KEYWORDS = (
+    "?", "？", "教えて", "どう", "いくら", "可能", "できる", "できます",
+    "おすすめ", "比較", "違い", "なぜ", "変更",
+)
+
+
+def contains_any(message: str, keywords: tuple) -> bool:
+    """message がいずれかのキーワードを含むか"""
+    return any(keyword in message for keyword in keywords)
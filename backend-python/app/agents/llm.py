@@ -0,0 +1,161 @@
+"""エージェントで使う ChatOpenAI"""
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_openai import ChatOpenAI
+
+from app.services.deadline import remaining_seconds
+from app.services.rate_governor import rate_governor
+from .resilience import LLMResilience
+
+StreamStart = Tuple[AsyncIterator[ChatGenerationChunk], Optional[ChatGenerationChunk]]
+
+# ヘッジ先（副系）が応答した場合に generation_info に入れるモデル名。
+# 呼び出しのコールバックは主系のものなので、トークン・コストはこのモデルで計上する（app.agents.callbacks）
+ANSWERED_BY_KEY = "answered_by_model"
+
+
+async def _open_stream(stream: AsyncIterator[ChatGenerationChunk]) -> StreamStart:
+    """最初のチャンクまで読み進める（ヘッジの勝敗は最初のチャンクで決める）"""
+    try:
+        return stream, await stream.__anext__()
+    except StopAsyncIteration:
+        return stream, None
+    except BaseException:
+        await stream.aclose()
+        raise
+
+
+async def _close_stream(started: StreamStart) -> None:
+    """ヘッジで負けたストリームを閉じる"""
+    await started[0].aclose()
+
+
+class DeadlineAwareChatOpenAI(ChatOpenAI):
+    """リクエストのデッドラインまでの残り時間を OpenAI 呼び出しのタイムアウトにする
+
+    タイムアウトはキャッシュキー（llm_string）の計算後に付与するため、LLM キャッシュには影響しない。
+    with_resilience() を呼ぶと、呼び出しをヘッジ・リトライ・サーキットブレーカー
+    （app.agents.resilience）で包む。これらもキャッシュキーには含まれない。
+    送信（リトライ・ヘッジを含む1回ごと）の前にレート制限のガバナー（app.services.rate_governor）で待つ。
+    主系の待ちはヘッジの待ち時間・レイテンシの計測が始まる前に済ませる（LLMResilience の admit）。
+    """
+
+    _resilience: Optional[LLMResilience] = PrivateAttr(default=None)
+    _hedge_llm: Optional["DeadlineAwareChatOpenAI"] = PrivateAttr(default=None)
+
+    def with_resilience(
+        self,
+        resilience: LLMResilience,
+        hedge_llm: Optional["DeadlineAwareChatOpenAI"] = None,
+    ) -> "DeadlineAwareChatOpenAI":
+        """耐障害性の設定を付ける（hedge_llm はヘッジ先。コールバックは呼ばれない）"""
+        self._resilience = resilience
+        self._hedge_llm = hedge_llm
+        return self
+
+    def _with_deadline(self, kwargs: Any) -> Any:
+        timeout = remaining_seconds()
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self._resilience is None:
+            await self._acquire_rate_limit(messages, kwargs)
+            return await self._agenerate_once(messages, stop, run_manager, **kwargs)
+
+        hedge_llm = self._hedge_llm
+        return await self._resilience.call(
+            lambda: self._agenerate_once(messages, stop, run_manager, **kwargs),
+            (lambda: hedge_llm._agenerate_governed(messages, stop, **kwargs)) if hedge_llm else None,
+            admit=lambda: self._acquire_rate_limit(messages, kwargs),
+        )
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self._resilience is None:
+            await self._acquire_rate_limit(messages, kwargs)
+            async for chunk in self._astream_once(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+
+        hedge_llm = self._hedge_llm
+        stream, first = await self._resilience.call(
+            lambda: _open_stream(self._astream_once(messages, stop, run_manager, **kwargs)),
+            (lambda: _open_stream(hedge_llm._astream_governed(messages, stop, **kwargs))) if hedge_llm else None,
+            admit=lambda: self._acquire_rate_limit(messages, kwargs),
+            discard=_close_stream,
+        )
+        if first is None:
+            return
+        # 副系のストリームはコールバックなしで読んでいるため、トークンのコールバックはここで呼ぶ
+        hedged = run_manager is not None and ANSWERED_BY_KEY in (first.generation_info or {})
+        if hedged:
+            await run_manager.on_llm_new_token(first.text, chunk=first)
+        yield first
+        async for chunk in stream:
+            if hedged:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _acquire_rate_limit(self, messages: List[BaseMessage], kwargs: Any) -> None:
+        """レート制限のガバナーで送信できるまで待つ（ヘッジ・サーキットブレーカーの計測には含めない）"""
+        prompt_chars = sum(len(str(message.content)) for message in messages) + len(str(kwargs.get("tools") or ""))
+        await rate_governor.acquire(self.model_name, rate_governor.estimate_tokens(prompt_chars, self.max_tokens))
+
+    async def _agenerate_governed(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> ChatResult:
+        """ヘッジ先として呼ぶ（コールバックなし。ガバナーの待ちを含む。応答したモデルを generation_info に残す）"""
+        await self._acquire_rate_limit(messages, kwargs)
+        result = await self._agenerate_once(messages, stop, None, **kwargs)
+        for generation in result.generations:
+            generation.generation_info = {**(generation.generation_info or {}), ANSWERED_BY_KEY: self.model_name}
+        return result
+
+    async def _astream_governed(
+        self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """ヘッジ先として呼ぶ（コールバックなし。ガバナーの待ちを含む。応答したモデルを最初のチャンクに残す）
+
+        チャンクの generation_info は結合時に文字列が連結されるため、印は最初のチャンクにだけ付ける。
+        """
+        await self._acquire_rate_limit(messages, kwargs)
+        first = True
+        async for chunk in self._astream_once(messages, stop, None, **kwargs):
+            if first:
+                chunk.generation_info = {**(chunk.generation_info or {}), ANSWERED_BY_KEY: self.model_name}
+                first = False
+            yield chunk
+
+    async def _agenerate_once(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **self._with_deadline(kwargs))
+
+    async def _astream_once(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **self._with_deadline(kwargs)):
+            yield chunk
@@ -0,0 +1,279 @@
+"""LLM 呼び出しの耐障害性（ヘッジ・リトライ・サーキットブレーカー）
+
+DeadlineAwareChatOpenAI（エージェントの大きいモデル）の1回の呼び出しを以下で包む:
+
+- ヘッジ: 直近の呼び出しの p95 レイテンシ（min/max で制限）を過ぎても応答がなければ、
+  副系（別モデル・別デプロイメント）にも同じリクエストを送り、先に返った方を使う。
+  ストリーミングは最初のチャンクが先に届いた方を採用する。負けた方はキャンセルし、
+  すでに返っていればその結果を閉じる（負けた呼び出しのトークンはコールバックに計上されない）。
+  副系が勝った場合のトークン・コストは副系のモデルで計上する（app.agents.llm の ANSWERED_BY_KEY）。
+- リトライ: 429・5xx・接続エラー・タイムアウトは full jitter の指数バックオフで再試行する
+  （Retry-After があればそれに従う。リクエストのデッドラインを越える待ちはしない）。
+  OpenAI SDK 側のリトライは無効にしておく。
+- サーキットブレーカー: 主系の失敗が続いたら一定時間主系を呼ばない。副系があればそちらに送り、
+  なければ即座に CircuitOpenError にする（縮退運転の判定にエラーとして反映される）。
+
+主系の実際の呼び出し（キャッシュヒット・他のモデルは含まない）のレイテンシと成否は
+縮退運転のコントローラ（app.services.degradation）にも記録する。
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+import openai
+
+from app.logging_config import get_logger
+from app.services import metrics
+from app.services.deadline import remaining_seconds
+from app.services.degradation import DegradationController, degradation_controller
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,  # APITimeoutError を含む
+)
+
+# p95 を使い始めるまでに必要な呼び出し数（それまでは max_delay でヘッジする）
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(RuntimeError):
+    """サーキットブレーカーが開いていて主系を呼べない"""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"Circuit breaker for {model} is open (retry after {retry_after:.1f}s)")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """連続失敗で開き、reset_seconds 後に1回だけ試して（half-open）閉じるか開き直す"""
+
+    def __init__(self, model: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        metrics.LLM_CIRCUIT_OPEN.labels(model=model).set(0)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.retry_after() <= 0 else "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """主系を呼んでよいか（half-open では同時に1回だけ）"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """half-open の試行を成否に数えずに終える（キャンセル・リトライ対象外のエラー）"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.opened_at is not None:
+            self._transition(None, "closed")
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        trial = self._trial_in_flight
+        self._trial_in_flight = False
+        if trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self._transition(time.monotonic(), "open")
+
+    def _transition(self, opened_at: Optional[float], state: str) -> None:
+        self.opened_at = opened_at
+        metrics.LLM_CIRCUIT_OPEN.labels(model=self.model).set(1 if state == "open" else 0)
+        metrics.LLM_CIRCUIT_TRANSITIONS.labels(model=self.model, state=state).inc()
+        logger.warning("llm_circuit_changed", model=self.model, state=state, failures=self.failures)
+
+
+class LLMResilience:
+    """ヘッジ・リトライ・サーキットブレーカーの設定と状態（主系のモデル1つにつき1インスタンス）"""
+
+    def __init__(
+        self,
+        model: str,
+        hedge_model: Optional[str] = None,
+        hedge_min_delay_seconds: float = 2.0,
+        hedge_max_delay_seconds: float = 20.0,
+        latency_window: int = 200,
+        retry_attempts: int = 2,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 8.0,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_seconds: float = 30.0,
+        health: DegradationController = degradation_controller,
+    ):
+        self.model = model
+        self.health = health
+        self.hedge_model = hedge_model
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.hedge_max_delay_seconds = hedge_max_delay_seconds
+        self.retry_attempts = retry_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.breaker = CircuitBreaker(model, circuit_failure_threshold, circuit_reset_seconds)
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+
+    def hedge_delay(self) -> float:
+        """ヘッジを送るまでの待ち時間（主系の直近の p95）"""
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return self.hedge_max_delay_seconds
+        latencies = sorted(self._latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return min(self.hedge_max_delay_seconds, max(self.hedge_min_delay_seconds, p95))
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        """attempt 回目（0 始まり）の失敗後の待ち時間"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.retry_max_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    async def call(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        hedge: Optional[Callable[[], Awaitable[T]]] = None,
+        admit: Optional[Callable[[], Awaitable[None]]] = None,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """primary（と hedge）を呼び出す。ストリーミングは最初のチャンクまでをこの中で待つ
+
+        admit は primary を送る前に毎回待つ処理（レート制限のガバナー）。
+        その待ちはヘッジの待ち時間・主系のレイテンシに含めない（流量の制限を主系の遅延と誤認しない）。
+        discard はヘッジで負けた側が結果を返し終えていた場合の後始末（開いたストリームを閉じる等）。
+        """
+        for attempt in range(self.retry_attempts + 1):
+            if not self.breaker.allow():
+                if hedge is None:
+                    error = CircuitOpenError(self.model, self.breaker.retry_after())
+                    self.health.record(0.0, error)
+                    raise error
+                metrics.LLM_HEDGES.labels(model=self.hedge_model, reason="circuit_open").inc()
+                return await hedge()
+            try:
+                if admit is not None:
+                    await admit()
+                return await self._hedged(primary, hedge, discard)
+            except RETRYABLE_ERRORS as e:
+                delay = self.retry_delay(attempt, e)
+                remaining = remaining_seconds()
+                if attempt == self.retry_attempts or (remaining is not None and delay >= remaining):
+                    raise
+                metrics.LLM_RETRIES.labels(model=self.model, error=type(e).__name__).inc()
+                logger.warning(
+                    "llm_retry",
+                    model=self.model,
+                    attempt=attempt + 1,
+                    delay_seconds=round(delay, 3),
+                    error_type=type(e).__name__,
+                )
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _hedged(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        hedge: Optional[Callable[[], Awaitable[T]]],
+        discard: Optional[Callable[[T], Awaitable[None]]],
+    ) -> T:
+        start = time.perf_counter()
+        primary_task = asyncio.ensure_future(self._observe(primary, start))
+        if hedge is None:
+            return await primary_task
+
+        delay = self.hedge_delay()
+        metrics.LLM_HEDGE_DELAY.labels(model=self.model).set(delay)
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            return primary_task.result()
+
+        metrics.LLM_HEDGES.labels(model=self.hedge_model, reason="slow").inc()
+        hedge_task = asyncio.ensure_future(hedge())
+        winners = {primary_task: "primary", hedge_task: "hedge"}
+        pending = set(winners)
+        first_error: Optional[BaseException] = None
+        winner: Optional[asyncio.Future] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        metrics.LLM_HEDGE_WINS.labels(winner=winners[task]).inc()
+                        logger.info(
+                            "llm_hedge_won",
+                            winner=winners[task],
+                            hedge_delay_seconds=round(delay, 3),
+                            latency_seconds=round(time.perf_counter() - start, 3),
+                        )
+                        return task.result()
+                    if winners[task] == "primary" or first_error is None:
+                        first_error = task.exception()
+            raise first_error
+        finally:
+            for task in winners:
+                if task is winner:
+                    continue
+                if not task.done():
+                    # 実行中ならキャンセルで閉じる（_open_stream はキャンセル時にストリームを閉じる）
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    # 同じ wait で両方が返った場合、負けた側の結果（開いたストリーム等）を閉じる
+                    try:
+                        await discard(task.result())
+                    except Exception as e:
+                        logger.warning("llm_hedge_discard_failed", error=str(e), error_type=type(e).__name__)
+
+    async def _observe(self, primary: Callable[[], Awaitable[T]], start: float) -> T:
+        """主系の結果をサーキットブレーカー・レイテンシ・縮退運転の判定に反映する
+
+        ヘッジに負けてキャンセルされた場合もその時点までの時間を記録する（実際の値の下限）。
+        """
+        try:
+            result = await primary()
+        except asyncio.CancelledError as e:
+            latency = time.perf_counter() - start
+            self._latencies.append(latency)
+            self.health.record(latency, e)
+            self.breaker.release_trial()
+            raise
+        except RETRYABLE_ERRORS as e:
+            self.health.record(time.perf_counter() - start, e)
+            self.breaker.record_failure()
+            raise
+        except Exception as e:
+            self.health.record(time.perf_counter() - start, e)
+            self.breaker.release_trial()
+            raise
+        latency = time.perf_counter() - start
+        self._latencies.append(latency)
+        self.health.record(latency)
+        self.breaker.record_success()
+        return result
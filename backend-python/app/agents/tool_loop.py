@@ -0,0 +1,162 @@
+"""OpenAI の tool calling を直接回す軽量なエージェントループ
+
+AgentExecutor（create_openai_tools_agent）と同じツール・同じ入出力で動く代替実装。
+1ステップごとに以下を省く:
+
+- プロンプトテンプレートの展開と agent_scratchpad の再構築（メッセージのリストに追記していく）
+- エージェント内部の RunnableSequence（RunnableAssign・プロンプト・出力パーサ）のコールバック
+- verbose の標準出力
+
+ChatOpenAI は LLM キャッシュ・デッドライン・メトリクス・トークン集計のためにそのまま使う。
+ツールは tool.ainvoke で呼ぶため、ツールのコールバック（メトリクス・途中結果の記録・
+astream_events の on_tool_start / on_tool_end）は AgentExecutor と同じく発生する。
+
+ツールが例外を投げた場合は AgentExecutor（handle_tool_error）と同じくエラー内容を観測として LLM に返し、
+ターン全体は失敗させない。同期の invoke はイベントループの外（スクリプト等）からのみ使える。
+"""
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.agents import AgentAction
+from langchain_core.callbacks import AsyncCallbackManagerForChainRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.tools import BaseTool
+
+from app.logging_config import get_logger
+from .executor import PLAN_FINISH_MODES, plan_finish_response
+from .tools import published_plans
+
+logger = get_logger(__name__)
+
+# AgentExecutor（early_stopping_method="force"）と同じ文言
+STOPPED_RESPONSE = "Agent stopped due to iteration limit or time limit."
+
+
+class ToolCallingLoop(Runnable[Dict[str, Any], Dict[str, Any]]):
+    """tool calling のループ（入力・出力・イベント名は AgentExecutor と同じ）
+
+    入力: {"input", "chat_history", "context"}
+    出力: {"output", "intermediate_steps"}
+    """
+
+    name = "AgentExecutor"
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        tools: Sequence[BaseTool],
+        system_prompt: str,
+        context_prompt: str,
+        max_iterations: int = 10,
+        plan_finish_mode: str = "off",
+        summary_llm: Optional[BaseChatModel] = None,
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        self.llm_with_tools = llm.bind_tools(list(tools))
+        self.system_message = SystemMessage(content=system_prompt)
+        self.context_prompt = context_prompt
+        self.max_iterations = max_iterations
+        self.plan_finish_mode = plan_finish_mode
+        self.summary_llm = summary_llm
+
+    def invoke(self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> Dict[str, Any]:
+        """同期呼び出し（イベントループの外からのみ。ループの中では ainvoke を使う）
+
+        共有の httpx.AsyncClient（get_openai_http_client）は実行中のループに紐づくため、
+        別スレッドに新しいループを立てて呼ぶことはしない。
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.ainvoke(input, config, **kwargs))
+        raise RuntimeError(
+            "ToolCallingLoop.invoke() cannot be called from a running event loop; use `await ainvoke()` instead"
+        )
+
+    async def ainvoke(
+        self, input: Dict[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        return await self._acall_with_config(self._arun, input, config, run_type="chain")
+
+    async def _arun(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: AsyncCallbackManagerForChainRun,
+        config: RunnableConfig,
+    ) -> Dict[str, Any]:
+        messages: List[BaseMessage] = [
+            self.system_message,
+            *inputs.get("chat_history", []),
+            SystemMessage(content=self.context_prompt.format(context=inputs.get("context", ""))),
+            HumanMessage(content=inputs["input"]),
+        ]
+        intermediate_steps: List[Tuple[AgentAction, Any]] = []
+
+        for _ in range(self.max_iterations):
+            ai_message: AIMessage = await self.llm_with_tools.ainvoke(messages, config=config)
+            messages.append(ai_message)
+            if not ai_message.tool_calls and not ai_message.invalid_tool_calls:
+                return {"output": ai_message.content, "intermediate_steps": intermediate_steps}
+
+            # 引数の JSON が壊れている呼び出しはエラー内容を返して LLM に再試行させる
+            for invalid in ai_message.invalid_tool_calls:
+                messages.append(ToolMessage(
+                    content=f"{invalid.get('name')} の引数を解釈できませんでした: {invalid.get('error')}",
+                    tool_call_id=invalid.get("id") or "",
+                ))
+
+            observations = await asyncio.gather(*(
+                self._run_tool(tool_call["name"], tool_call["args"], config)
+                for tool_call in ai_message.tool_calls
+            ))
+            new_steps = [
+                (AgentAction(tool=tool_call["name"], tool_input=tool_call["args"], log=""), observation)
+                for tool_call, observation in zip(ai_message.tool_calls, observations)
+            ]
+            intermediate_steps.extend(new_steps)
+            messages.extend(
+                ToolMessage(content=_to_content(observation), tool_call_id=tool_call["id"])
+                for tool_call, observation in zip(ai_message.tool_calls, observations)
+            )
+
+            plan_step = next((step for step in new_steps if step[0].tool == "plan_generator"), None)
+            plans = published_plans()
+            if self.plan_finish_mode in PLAN_FINISH_MODES and plan_step is not None and plans:
+                response = await plan_finish_response(
+                    self.plan_finish_mode,
+                    self.summary_llm,
+                    inputs["input"],
+                    plan_step[0].tool_input,
+                    plan_step[1],
+                    len(plans),
+                    callbacks=run_manager.get_child(),
+                )
+                return {"output": response, "intermediate_steps": intermediate_steps}
+
+        logger.warning("tool_loop_iteration_limit", max_iterations=self.max_iterations)
+        return {"output": STOPPED_RESPONSE, "intermediate_steps": intermediate_steps}
+
+    async def _run_tool(self, name: str, args: Dict[str, Any], config: RunnableConfig) -> Any:
+        tool = self.tools.get(name)
+        if tool is None:
+            # AgentExecutor の InvalidTool と同じ文言
+            return f"{name} is not a valid tool, try one of [{', '.join(self.tools)}]."
+        try:
+            return await tool.ainvoke(args, config=config)
+        except Exception as e:
+            # AgentExecutor（handle_tool_error）と同じく、エラーを観測として返して LLM に判断させる
+            logger.warning("tool_loop_tool_error", tool=name, error_type=type(e).__name__, error=str(e))
+            return f"{name} の実行中にエラーが発生しました: {type(e).__name__}: {e}"
+
+
+def _to_content(observation: Any) -> str:
+    """ツールの出力を ToolMessage の本文にする（dict は JSON）"""
+    if isinstance(observation, str):
+        return observation
+    try:
+        return json.dumps(observation, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        return str(observation)
@@ -0,0 +1,40 @@
+"""ターンごとに LLM に渡すツールの選択
+
+LLM 呼び出しのたびに全ツールの JSON スキーマを送ると、使えないツールの分だけ入力トークンが増え、
+誤ったツール選択（日帰りなのに hotel_search 等）の原因にもなる。
+セッションの条件（今回のメッセージをマージした後）とメッセージのキーワードから、
+このターンで意味のあるツールだけを選ぶ。
+
+- policy_checker: 常に使える（規程・予算の質問は条件に関係なく答えられる）
+- transportation_search: 出発地・目的地が分かっている
+- hotel_search: 目的地が分かっていて、日帰りでない
+- plan_generator: プラン生成の条件が揃っている
+
+plan_generator を使えるターンでは検索も plan_generator が内部で行うため、
+個別の検索ツールはメッセージで交通・宿泊に触れた場合のみ渡す。
+"""
+from typing import Tuple
+
+from app.models.schemas import TravelConditions
+from .fast_path import missing_slots
+from .keywords import HOTEL_KEYWORDS, TRANSPORTATION_KEYWORDS, contains_any
+
+# ツールの並び順（エージェントのキャッシュキーを安定させるため固定）
+TOOL_ORDER = ("policy_checker", "transportation_search", "hotel_search", "plan_generator")
+
+
+def select_tools(conditions: TravelConditions, user_message: str) -> Tuple[str, ...]:
+    """このターンで LLM に渡すツール名（TOOL_ORDER の順）"""
+    names = {"policy_checker"}
+    can_plan = not missing_slots(conditions)
+    if can_plan:
+        names.add("plan_generator")
+
+    if conditions.departure_location and conditions.destination:
+        if not can_plan or contains_any(user_message, TRANSPORTATION_KEYWORDS):
+            names.add("transportation_search")
+    if conditions.destination and not conditions.is_day_trip:
+        if not can_plan or contains_any(user_message, HOTEL_KEYWORDS):
+            names.add("hotel_search")
+
+    return tuple(name for name in TOOL_ORDER if name in names)
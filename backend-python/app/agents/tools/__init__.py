@@ -2,7 +2,11 @@ from .policy_checker import PolicyCheckerTool
 from .transportation_search import TransportationSearchTool
 from .hotel_search import HotelSearchTool
 from .plan_generator import PlanGeneratorTool
-from .condition_extractor import ConditionExtractorTool
+from .search_memo import SearchMemo, search_memo
+from .plan_speculation import PlanSpeculator
+from .plan_artifacts import plan_artifact_scope, published_plans
+from .tool_output import render_for_llm, tool_result_scope
+from .condition_extractor import ConditionExtractorTool, extract_conditions, merge_conditions
 
 __all__ = [
     "PolicyCheckerTool",
@@ -10,5 +14,14 @@ __all__ = [
     "HotelSearchTool",
     "PlanGeneratorTool",
     "ConditionExtractorTool",
+    "extract_conditions",
+    "merge_conditions",
+    "SearchMemo",
+    "search_memo",
+    "PlanSpeculator",
+    "plan_artifact_scope",
+    "published_plans",
+    "render_for_llm",
+    "tool_result_scope",
 ]
 
@@ -1,8 +1,335 @@
-"""出張条件抽出ツール"""
-from typing import Any, Dict, Optional
+"""出張条件抽出ツール（ルールベース）
+
+ユーザーのメッセージから出張条件を LLM を使わずに抽出する。
+正規表現のみで処理するため、1メッセージあたり数十マイクロ秒で完了する。
+
+抽出対象:
+- 出発地・目的地（都市名・駅名・空港名）
+- 日付（12/9, 12月9日, 2024-12-09, 明日, 来週火曜 など）と範囲（12/9-10, 2泊）。過去の日付は採用しない
+- 日帰り / 宿泊
+- 予算（5万円, 50,000円）
+- 希望交通手段、出張目的
+"""
+import re
+import unicodedata
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from app.models.schemas import TravelConditions
+
+
+# 地名の別名 → 正規化後の都市名（駅・空港も含む）
+LOCATION_ALIASES = {
+    "東京": "東京",
+    "品川": "東京",
+    "羽田": "東京",
+    "成田": "東京",
+    "新横浜": "横浜",
+    "横浜": "横浜",
+    "大阪": "大阪",
+    "新大阪": "大阪",
+    "梅田": "大阪",
+    "伊丹": "大阪",
+    "関空": "大阪",
+    "名古屋": "名古屋",
+    "名駅": "名古屋",
+    "中部国際": "名古屋",
+    "福岡": "福岡",
+    "博多": "福岡",
+    "天神": "福岡",
+    "仙台": "仙台",
+    "札幌": "札幌",
+    "新千歳": "札幌",
+    "京都": "京都",
+    "神戸": "神戸",
+    "新神戸": "神戸",
+    "広島": "広島",
+    "金沢": "金沢",
+    "新潟": "新潟",
+    "那覇": "那覇",
+    "沖縄": "那覇",
+    "tokyo": "東京",
+    "osaka": "大阪",
+    "nagoya": "名古屋",
+    "fukuoka": "福岡",
+    "sendai": "仙台",
+    "sapporo": "札幌",
+}
+
+TRANSPORTATION_KEYWORDS = {
+    "新幹線": ["新幹線", "のぞみ", "ひかり", "こだま", "はやぶさ"],
+    "飛行機": ["飛行機", "空路", "航空", "フライト"],
+    "高速バス": ["高速バス", "バス"],
+}
+
+PURPOSE_KEYWORDS = [
+    "商談", "打ち合わせ", "打合せ", "会議", "展示会", "研修",
+    "客先訪問", "視察", "セミナー", "営業",
+]
+
+WEEKDAYS = {"月": 0, "火": 1, "水": 2, "木": 3, "金": 4, "土": 5, "日": 6}
+WEEK_OFFSETS = {"今週": 0, "来週": 1, "再来週": 2}
+RELATIVE_DAYS = {"今日": 0, "本日": 0, "明日": 1, "あした": 1, "明後日": 2, "あさって": 2}
+
+_LOCATION_PATTERN = re.compile(
+    "(" + "|".join(sorted(map(re.escape, LOCATION_ALIASES), key=len, reverse=True)) + ")"
+    r"(?:駅|空港)?"
+)
+_DEPARTURE_MARKER = re.compile(r"^(?:から|発|を出|出発)")
+_DESTINATION_MARKER = re.compile(r"^(?:へ|に|まで|行き|出張|方面|で(?!す))")
+_DEPARTURE_LABEL = re.compile(r"出発(?:地|駅)?(?:は|:)?$")
+_DESTINATION_LABEL = re.compile(r"(?:目的地|行き先|出張先)(?:は|:)?$")
+# 2つの地名の間の区切り（「東京→大阪」「東京-大阪」は前が出発地、後が目的地）
+_ROUTE_CONNECTOR = re.compile(r"^\s*(?:→|⇒|->|=>|-|ー|—|–|~)\s*$")
+_PAIR_SEPARATOR = re.compile(r"^[\s、,・]+$")
+
+_ISO_DATE = re.compile(r"(\d{4})[-/年](\d{1,2})[-/月](\d{1,2})日?")
+_MONTH_DAY = re.compile(r"(?<![\d/])(\d{1,2})(?:月|/)(\d{1,2})日?")
+_RANGE_TAIL = re.compile(r"^\s*(?:~|-|から)\s*(\d{1,2})(?!\d|/|月|日間|泊)日?")
+_RELATIVE_DAY = re.compile("|".join(RELATIVE_DAYS))
+_WEEKDAY = re.compile(r"(再来週|来週|今週)?の?([月火水木金土日])曜日?")
+_NIGHTS = re.compile(r"(\d+)泊")
+_DAYS = re.compile(r"(\d+)日間")
+
+_BUDGET_MAN = re.compile(r"(\d+(?:\.\d+)?)万円?")
+_BUDGET_YEN = re.compile(r"(\d{1,3}(?:,\d{3})+|\d{4,})円")
+_PER_NIGHT_CONTEXT = re.compile(r"泊\S{0,2}$")
+_NEGATION = re.compile(r"^(?:以外|は使わ|は避け|はNG|は嫌|じゃなく|ではなく)")
+
+
+def _normalize(message: str) -> str:
+    """全角英数字・記号を半角に寄せる"""
+    text = unicodedata.normalize("NFKC", message)
+    return text.replace("〜", "~").lower()
+
+
+def _resolve_month_day(month: int, day: int, today: date) -> Optional[date]:
+    """年の省略された日付を、今日以降で最も近い日付に解決"""
+    try:
+        candidate = date(today.year, month, day)
+    except ValueError:
+        return None
+    if candidate < today:
+        try:
+            candidate = date(today.year + 1, month, day)
+        except ValueError:
+            return None
+    return candidate
+
+
+def _extract_dates(text: str, today: date) -> List[Tuple[int, date]]:
+    """日付の出現位置と値を出現順に返す"""
+    found: List[Tuple[int, date]] = []
+    consumed: List[Tuple[int, int]] = []
+
+    def add(pos: int, end: int, value: Optional[date]) -> None:
+        if value is None or any(s <= pos < e for s, e in consumed):
+            return
+        consumed.append((pos, end))
+        # 過去の日付（2024-12-09 等）は採用せず、LLM の確認に任せる
+        if value >= today:
+            found.append((pos, value))
+
+    for m in _ISO_DATE.finditer(text):
+        try:
+            value = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            continue
+        add(m.start(), m.end(), value)
+
+    for m in _MONTH_DAY.finditer(text):
+        value = _resolve_month_day(int(m.group(1)), int(m.group(2)), today)
+        add(m.start(), m.end(), value)
+        # 12/9-10, 12月9日〜10日 のような範囲指定
+        tail = _RANGE_TAIL.match(text[m.end():])
+        if value and tail:
+            end_day = int(tail.group(1))
+            end_month = value.month if end_day >= value.day else value.month % 12 + 1
+            add(m.end(), m.end() + tail.end(), _resolve_month_day(end_month, end_day, value))
+
+    for m in _RELATIVE_DAY.finditer(text):
+        add(m.start(), m.end(), today + timedelta(days=RELATIVE_DAYS[m.group(0)]))
+
+    for m in _WEEKDAY.finditer(text):
+        weekday = WEEKDAYS[m.group(2)]
+        if m.group(1):
+            monday = today - timedelta(days=today.weekday())
+            value = monday + timedelta(weeks=WEEK_OFFSETS[m.group(1)], days=weekday)
+        else:
+            value = today + timedelta(days=(weekday - today.weekday()) % 7 or 7)
+        add(m.start(), m.end(), value)
+
+    found.sort(key=lambda item: item[0])
+    return found
+
+
+def _extract_locations(text: str) -> Dict[str, Any]:
+    """出発地・目的地・役割不明の地名を抽出
+
+    「東京→大阪」「東京-大阪」のような区切りと、区切りなしで2つだけ並んだ地名
+    （「12/9-10 東京 大阪」）は、書かれた順に出発地・目的地とする。
+    """
+    departure = None
+    destination = None
+    unassigned: List[str] = []
+    previous: Optional[Tuple[str, int]] = None  # (直前の役割不明の地名, 終了位置)
+
+    for m in _LOCATION_PATTERN.finditer(text):
+        city = LOCATION_ALIASES[m.group(1)]
+        following = text[m.end():m.end() + 6].lstrip()
+        preceding = text[max(0, m.start() - 6):m.start()]
+
+        if _DEPARTURE_LABEL.search(preceding) or _DEPARTURE_MARKER.match(following):
+            departure = departure or city
+        elif _DESTINATION_LABEL.search(preceding) or _DESTINATION_MARKER.match(following):
+            destination = destination or city
+        elif previous and _ROUTE_CONNECTOR.match(text[previous[1]:m.start()]):
+            departure = departure or previous[0]
+            destination = destination or city
+            if previous[0] in unassigned:
+                unassigned.remove(previous[0])
+        elif city not in unassigned:
+            unassigned.append(city)
+        previous = (city, m.end()) if city in unassigned else None
+
+    unassigned = [c for c in unassigned if c not in (departure, destination)]
+    if not departure and not destination and len(unassigned) == 2 and _is_bare_pair(text, unassigned):
+        departure, destination = unassigned
+        unassigned = []
+    # 出発地が判明していれば、残りの地名は目的地とみなす
+    if departure and not destination and unassigned:
+        destination = unassigned.pop(0)
+    if departure == destination:
+        departure = None
+
+    return {
+        "departure_location": departure,
+        "destination": destination,
+        "unassigned_locations": unassigned,
+    }
+
+
+def _is_bare_pair(text: str, cities: List[str]) -> bool:
+    """2つの地名が空白・読点だけを挟んで並んでいるか"""
+    matches = [m for m in _LOCATION_PATTERN.finditer(text) if LOCATION_ALIASES[m.group(1)] in cities]
+    return len(matches) == 2 and bool(_PAIR_SEPARATOR.match(text[matches[0].end():matches[1].start()]))
+
+
+def _extract_budget(text: str) -> Optional[int]:
+    """予算（円）を抽出。1泊あたりの金額は除外する"""
+    for pattern, scale in ((_BUDGET_MAN, 10000), (_BUDGET_YEN, 1)):
+        for m in pattern.finditer(text):
+            if _PER_NIGHT_CONTEXT.search(text[max(0, m.start() - 4):m.start()]):
+                continue
+            return int(float(m.group(1).replace(",", "")) * scale)
+    return None
+
+
+def _extract_transportation(text: str) -> Optional[str]:
+    """希望交通手段を抽出（1種類に絞れる場合のみ）"""
+    kinds = set()
+    for kind, keywords in TRANSPORTATION_KEYWORDS.items():
+        for keyword in keywords:
+            idx = text.find(keyword)
+            if idx >= 0 and not _NEGATION.match(text[idx + len(keyword):]):
+                kinds.add(kind)
+                break
+    return kinds.pop() if len(kinds) == 1 else None
+
+
+def extract_conditions(message: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """メッセージから出張条件を抽出
+
+    見つかった項目のみをキーに持つ辞書を返す。
+    役割が判断できない地名は unassigned_locations、泊数は nights として返し、
+    既存の条件との突き合わせは merge_conditions で行う。
+    """
+    today = today or date.today()
+    text = _normalize(message)
+    extracted: Dict[str, Any] = {}
+
+    locations = _extract_locations(text)
+    for key, value in locations.items():
+        if value:
+            extracted[key] = value
+
+    dates = _extract_dates(text, today)
+    if dates:
+        extracted["depart_date"] = dates[0][1].isoformat()
+    if len(dates) >= 2 and dates[1][1] >= dates[0][1]:
+        extracted["return_date"] = dates[1][1].isoformat()
+
+    nights = _NIGHTS.search(text)
+    days = _DAYS.search(text)
+    if "日帰り" in text:
+        extracted["is_day_trip"] = True
+    elif nights:
+        extracted["is_day_trip"] = False
+        extracted["nights"] = int(nights.group(1))
+    elif days and int(days.group(1)) >= 2:
+        extracted["is_day_trip"] = False
+        extracted["nights"] = int(days.group(1)) - 1
+    elif "宿泊" in text:
+        extracted["is_day_trip"] = False
+
+    budget = _extract_budget(text)
+    if budget:
+        extracted["budget"] = budget
+
+    transportation = _extract_transportation(text)
+    if transportation:
+        extracted["preferred_transportation"] = transportation
+
+    for keyword in PURPOSE_KEYWORDS:
+        if keyword in text:
+            extracted["purpose"] = keyword
+            break
+
+    return extracted
+
+
+def merge_conditions(current: TravelConditions, extracted: Dict[str, Any]) -> TravelConditions:
+    """抽出結果を既存の条件にマージ（新しい値で上書き）"""
+    updates = {
+        key: value
+        for key, value in extracted.items()
+        if key in TravelConditions.model_fields and value is not None
+    }
+
+    # 役割不明の地名が1つだけなら未確定の項目に割り当てる（目的地を優先）。
+    # 複数ある場合は順序が判断できないため割り当てず、LLM の確認に任せる
+    unassigned = extracted.get("unassigned_locations", [])
+    if len(unassigned) == 1:
+        city = unassigned[0]
+        departure = updates.get("departure_location", current.departure_location)
+        destination = updates.get("destination", current.destination)
+        if not destination and city != departure:
+            updates["destination"] = city
+        elif not departure and city != destination:
+            updates["departure_location"] = city
+
+    depart_date = updates.get("depart_date", current.depart_date)
+
+    if updates.get("is_day_trip"):
+        updates["return_date"] = None
+    elif "nights" in extracted and depart_date and "return_date" not in updates:
+        nights = extracted["nights"]
+        updates["return_date"] = (date.fromisoformat(depart_date) + timedelta(days=nights)).isoformat()
+
+    if updates.get("return_date"):
+        updates["is_day_trip"] = updates["return_date"] == depart_date
+
+    merged = current.model_copy(update=updates)
+
+    # 出発日の変更で帰着日が前後逆転した場合は帰着日を破棄
+    if merged.depart_date and merged.return_date and merged.return_date < merged.depart_date:
+        merged.return_date = None
+
+    return merged
+
 
 class ConditionExtractorInput(BaseModel):
     """条件抽出入力"""
@@ -11,23 +338,27 @@ class ConditionExtractorInput(BaseModel):
 
 class ConditionExtractorTool(BaseTool):
     """ユーザーのメッセージから出張条件を抽出するツール"""
-    
+
     name: str = "condition_extractor"
     description: str = """ユーザーのメッセージから出張の条件（日程、目的地、予算など）を抽出します。
     抽出できた項目と、まだ確認が必要な項目を返します。"""
     args_schema: type[BaseModel] = ConditionExtractorInput
-    
+
     def _run(self, user_message: str) -> Dict[str, Any]:
-        """条件を抽出（このツールは主にLLMのプロンプトで処理される）"""
-        # このツールは実際にはLLMが条件を抽出するための
-        # インターフェースとして機能する
-        # 実際の抽出ロジックはエージェントのプロンプトで行う
+        """条件を抽出（ルールベース）"""
+        extracted = extract_conditions(user_message)
+        conditions = merge_conditions(TravelConditions(), extracted)
+
+        required = ["departure_location", "destination", "depart_date"]
+        missing = [key for key in required if not getattr(conditions, key)]
+        if not conditions.return_date and not conditions.is_day_trip:
+            missing.append("return_date")
+
         return {
-            "message": user_message,
-            "instruction": "このメッセージから出張条件を抽出してください"
+            "conditions": conditions.model_dump(exclude_none=True),
+            "missing": missing,
         }
-    
+
     async def _arun(self, user_message: str) -> Dict[str, Any]:
         """非同期実行"""
         return self._run(user_message)
-
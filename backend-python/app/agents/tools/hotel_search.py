@@ -1,9 +1,11 @@
 """宿泊先検索ツール（モック）"""
 from typing import Any, Dict, List, Optional
-from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from ddtrace.llmobs.decorators import tool as llmobs_tool
 
+from .search_memo import search_memo
+from .tool_runtime import ThreadPoolTool
+
 
 # モックホテルデータ
 HOTEL_DATA = {
@@ -164,7 +166,7 @@ class HotelSearchInput(BaseModel):
     preferred_area: Optional[str] = Field(None, description="希望エリア")
 
 
-class HotelSearchTool(BaseTool):
+class HotelSearchTool(ThreadPoolTool):
     """宿泊先を検索するツール"""
     
     name: str = "hotel_search"
@@ -180,16 +182,40 @@ class HotelSearchTool(BaseTool):
         max_price_per_night: Optional[int] = None,
         preferred_area: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """ホテルを検索"""
+        """ホテルを検索（正規化した引数でメモ化）"""
         # 目的地を正規化
         dest = self._normalize_location(destination)
         
+        result = search_memo.get_or_call(
+            self.name,
+            {
+                "destination": dest,
+                "nights": nights,
+                "max_price_per_night": max_price_per_night,
+                "preferred_area": preferred_area,
+            },
+            lambda: self._search(dest, nights, max_price_per_night, preferred_area),
+        )
+        
+        # 表記は今回の入力に合わせる
+        if result["found"]:
+            result["destination"] = destination
+        else:
+            result["message"] = f"{destination}のホテル情報が見つかりませんでした。"
+        return result
+    
+    def _search(
+        self,
+        dest: str,
+        nights: int,
+        max_price_per_night: Optional[int],
+        preferred_area: Optional[str],
+    ) -> Dict[str, Any]:
         hotels = HOTEL_DATA.get(dest, [])
         
         if not hotels:
             return {
                 "found": False,
-                "message": f"{destination}のホテル情報が見つかりませんでした。",
                 "hotels": []
             }
         
@@ -215,7 +241,6 @@ class HotelSearchTool(BaseTool):
         
         return {
             "found": True,
-            "destination": destination,
             "nights": nights,
             "hotels": result_hotels,
             "total_options": len(result_hotels)
@@ -237,8 +262,3 @@ class HotelSearchTool(BaseTool):
             "sapporo": "札幌",
         }
         return mappings.get(location.lower().strip(), location)
-    
-    async def _arun(self, **kwargs) -> Dict[str, Any]:
-        """非同期実行"""
-        return self._run(**kwargs)
-
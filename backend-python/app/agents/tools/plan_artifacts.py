@@ -0,0 +1,38 @@
+"""plan_generator が生成したプランのサイドチャネル
+
+PlanGeneratorTool は検証済みの TravelPlan をここに公開し、LLM にはコンパクトな要約だけを返す。
+エージェントは実行スコープ内で公開されたプランをそのまま受け取る（ツール出力の JSON を
+パースし直して TravelPlan を組み立て直すことはしない）。
+
+公開するのはツールの結果が使われた時点（_arun）のため、破棄された投機実行のプランは含まれない。
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from app.models.schemas import TravelPlan
+
+_current: ContextVar[Optional[List[TravelPlan]]] = ContextVar("plan_artifacts", default=None)
+
+
+@contextmanager
+def plan_artifact_scope() -> Iterator[List[TravelPlan]]:
+    """エージェント実行1回分のプランを集める（yield したリストに公開順に追加される）"""
+    plans: List[TravelPlan] = []
+    token = _current.set(plans)
+    try:
+        yield plans
+    finally:
+        _current.reset(token)
+
+
+def publish_plans(plans: List[TravelPlan]) -> None:
+    """生成したプランをエージェントに渡す（スコープ外では何もしない）"""
+    collected = _current.get()
+    if collected is not None:
+        collected.extend(plans)
+
+
+def published_plans() -> List[TravelPlan]:
+    """現在のスコープで公開済みのプラン（スコープ外では空）"""
+    return list(_current.get() or [])
@@ -1,10 +1,21 @@
 """出張プラン生成ツール"""
-from typing import Any, Dict, List, Optional
-import uuid
+from typing import Any, Dict, List, Optional, Union
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from ddtrace.llmobs.decorators import tool as llmobs_tool
 
+from app.models.schemas import HotelDetail, PlanSummary, TransportationDetail, TravelPlan
+from .transportation_search import TransportationSearchTool
+from .hotel_search import HotelSearchTool
+from .tool_runtime import run_tool_async
+from .plan_speculation import take_speculative_plan
+from .plan_artifacts import publish_plans
+from .tool_output import render_for_llm
+
+# 内部検索用のツール（結果は search_memo で実行スコープ・グローバルに共有される）
+_transportation_search = TransportationSearchTool()
+_hotel_search = HotelSearchTool()
+
 
 class PlanGeneratorInput(BaseModel):
     """プラン生成入力"""
@@ -36,14 +47,10 @@ class PlanGeneratorTool(BaseTool):
         preferred_transportation: Optional[str] = None,
     ) -> Dict[str, Any]:
         """プランを生成（内部で交通・ホテル検索を実行）"""
-        from .transportation_search import TransportationSearchTool
-        from .hotel_search import HotelSearchTool
-        
-        plans = []
+        plans: List[TravelPlan] = []
         
         # 交通手段を検索
-        trans_tool = TransportationSearchTool()
-        trans_result = trans_tool._run(
+        trans_result = _transportation_search._run(
             departure=departure_location,
             destination=destination,
             preferred_type=preferred_transportation,
@@ -66,145 +73,90 @@ class PlanGeneratorTool(BaseTool):
         # ホテルを検索（日帰りでない場合）
         hotel_options = []
         if not is_day_trip and nights > 0:
-            hotel_tool = HotelSearchTool()
-            hotel_result = hotel_tool._run(
+            hotel_result = _hotel_search._run(
                 destination=destination,
                 nights=nights,
                 max_price_per_night=15000,
             )
             hotel_options = hotel_result.get("hotels", [])
         
-        # 交通手段ごとにプランを生成
+        # 交通手段ごとにプランを生成（TravelPlan として1回だけ検証する）
         plan_labels = ["A", "B", "C", "D", "E"]
-        plan_count = 0
         
         if is_day_trip:
             # 日帰りプラン（ホテルなし）
-            for trans in transportation_options[:3]:
-                if plan_count >= 3:
-                    break
-                
-                schedule = trans.get("schedules", [{}])[0] if trans.get("schedules") else {}
-                trans_price = schedule.get("price", trans.get("price", 0))
-                round_trip_trans = trans_price * 2
-                total = round_trip_trans
-                
-                policy_status = "OK"
-                policy_note = None
-                if budget and total > budget:
-                    policy_status = "注意"
-                    policy_note = f"予算 {budget:,}円を{total - budget:,}円超過しています"
-                
-                plan = {
-                    "plan_id": str(uuid.uuid4()),
-                    "label": f"プラン{plan_labels[plan_count]}",
-                    "summary": {
-                        "depart_date": depart_date,
-                        "return_date": depart_date,  # 日帰りなので同日
-                        "destination": destination,
-                        "transportation": f"{trans.get('type', '交通手段')}（{trans.get('train_name', '')}）",
-                        "hotel": "なし（日帰り）",
-                        "estimated_total": total,
-                        "policy_status": policy_status,
-                        "policy_note": policy_note
-                    },
-                    "outbound_transportation": {
-                        "type": trans.get("type", ""),
-                        "departure_station": trans.get("departure_station", ""),
-                        "arrival_station": trans.get("arrival_station", ""),
-                        "departure_time": schedule.get("departure", ""),
-                        "arrival_time": schedule.get("arrival", ""),
-                        "price": trans_price,
-                        "train_name": trans.get("train_name", "")
-                    },
-                    "return_transportation": {
-                        "type": trans.get("type", ""),
-                        "departure_station": trans.get("arrival_station", ""),
-                        "arrival_station": trans.get("departure_station", ""),
-                        "departure_time": "18:00",
-                        "arrival_time": "",
-                        "price": trans_price,
-                        "train_name": trans.get("train_name", "")
-                    },
-                    "hotel": None
-                }
-                plans.append(plan)
-                plan_count += 1
+            combinations = [(trans, None) for trans in transportation_options[:3]]
         else:
             # 宿泊ありプラン
-            for trans in transportation_options[:3]:
-                for hotel in hotel_options[:2]:
-                    if plan_count >= 3:
-                        break
-                    
-                    schedule = trans.get("schedules", [{}])[0] if trans.get("schedules") else {}
-                    trans_price = schedule.get("price", trans.get("price", 0))
-                    round_trip_trans = trans_price * 2
-                    hotel_price = hotel.get("price_per_night", 0) * nights
-                    total = round_trip_trans + hotel_price
-                    
-                    policy_status = "OK"
-                    policy_note = None
-                    
-                    if budget and total > budget:
-                        policy_status = "注意"
-                        policy_note = f"予算 {budget:,}円を{total - budget:,}円超過しています"
-                    
-                    if hotel.get("price_per_night", 0) > 15000:
-                        policy_status = "NG"
-                        policy_note = "宿泊費が規程上限（15,000円/泊）を超過しています"
-                    
-                    plan = {
-                        "plan_id": str(uuid.uuid4()),
-                        "label": f"プラン{plan_labels[plan_count]}",
-                        "summary": {
-                            "depart_date": depart_date,
-                            "return_date": return_date,
-                            "destination": destination,
-                            "transportation": f"{trans.get('type', '交通手段')}（{trans.get('train_name', '')}）",
-                            "hotel": f"{hotel.get('name', 'ホテル')} {nights}泊",
-                            "estimated_total": total,
-                            "policy_status": policy_status,
-                            "policy_note": policy_note
-                        },
-                        "outbound_transportation": {
-                            "type": trans.get("type", ""),
-                            "departure_station": trans.get("departure_station", ""),
-                            "arrival_station": trans.get("arrival_station", ""),
-                            "departure_time": schedule.get("departure", ""),
-                            "arrival_time": schedule.get("arrival", ""),
-                            "price": trans_price,
-                            "train_name": trans.get("train_name", "")
-                        },
-                        "return_transportation": {
-                            "type": trans.get("type", ""),
-                            "departure_station": trans.get("arrival_station", ""),
-                            "arrival_station": trans.get("departure_station", ""),
-                            "departure_time": "18:00",
-                            "arrival_time": "",
-                            "price": trans_price,
-                            "train_name": trans.get("train_name", "")
-                        },
-                        "hotel": {
-                            "name": hotel.get("name", ""),
-                            "area": hotel.get("area", ""),
-                            "price_per_night": hotel.get("price_per_night", 0),
-                            "nights": nights,
-                            "total_price": hotel_price,
-                            "rating": hotel.get("rating")
-                        }
-                    }
-                    plans.append(plan)
-                    plan_count += 1
-                
-                if plan_count >= 3:
-                    break
+            combinations = [
+                (trans, hotel)
+                for trans in transportation_options[:3]
+                for hotel in hotel_options[:2]
+            ]
+        
+        for trans, hotel in combinations[:3]:
+            schedule = trans.get("schedules", [{}])[0] if trans.get("schedules") else {}
+            trans_price = schedule.get("price", trans.get("price", 0))
+            round_trip_trans = trans_price * 2
+            hotel_price = hotel.get("price_per_night", 0) * nights if hotel else 0
+            total = round_trip_trans + hotel_price
+            
+            policy_status = "OK"
+            policy_note = None
+            
+            if budget and total > budget:
+                policy_status = "注意"
+                policy_note = f"予算 {budget:,}円を{total - budget:,}円超過しています"
+            
+            if hotel and hotel.get("price_per_night", 0) > 15000:
+                policy_status = "NG"
+                policy_note = "宿泊費が規程上限（15,000円/泊）を超過しています"
+            
+            plans.append(TravelPlan(
+                label=f"プラン{plan_labels[len(plans)]}",
+                summary=PlanSummary(
+                    depart_date=depart_date,
+                    return_date=return_date or depart_date,  # 日帰りは同日
+                    destination=destination,
+                    transportation=f"{trans.get('type', '交通手段')}（{trans.get('train_name', '')}）",
+                    hotel=f"{hotel.get('name', 'ホテル')} {nights}泊" if hotel else "なし（日帰り）",
+                    estimated_total=total,
+                    policy_status=policy_status,
+                    policy_note=policy_note,
+                ),
+                outbound_transportation=TransportationDetail(
+                    type=trans.get("type", ""),
+                    departure_station=trans.get("departure_station", ""),
+                    arrival_station=trans.get("arrival_station", ""),
+                    departure_time=schedule.get("departure", ""),
+                    arrival_time=schedule.get("arrival", ""),
+                    price=trans_price,
+                    train_name=trans.get("train_name", ""),
+                ),
+                return_transportation=TransportationDetail(
+                    type=trans.get("type", ""),
+                    departure_station=trans.get("arrival_station", ""),
+                    arrival_station=trans.get("departure_station", ""),
+                    departure_time="18:00",
+                    arrival_time="",
+                    price=trans_price,
+                    train_name=trans.get("train_name", ""),
+                ),
+                hotel=HotelDetail(
+                    name=hotel.get("name", ""),
+                    area=hotel.get("area", ""),
+                    price_per_night=hotel.get("price_per_night", 0),
+                    nights=nights,
+                    total_price=hotel_price,
+                    rating=hotel.get("rating"),
+                ) if hotel else None,
+            ))
         
         # 予算内のプランを優先してソート
         if budget:
             plans.sort(key=lambda p: (
-                0 if p["summary"]["policy_status"] == "OK" else 1,
-                p["summary"]["estimated_total"]
+                0 if p.summary.policy_status == "OK" else 1,
+                p.summary.estimated_total
             ))
         
         return {
@@ -213,6 +165,13 @@ class PlanGeneratorTool(BaseTool):
             "total_plans": len(plans)
         }
     
-    async def _arun(self, **kwargs) -> Dict[str, Any]:
-        """非同期実行"""
-        return self._run(**kwargs)
+    async def _arun(self, **kwargs) -> Union[str, Dict[str, Any]]:
+        """非同期実行（投機実行済みならその結果を使い、なければスレッドプールで実行）
+
+        生成した TravelPlan はサイドチャネルでエージェントに渡し、LLM には圧縮した表だけを返す。
+        """
+        result = await take_speculative_plan(kwargs)
+        if result is None:
+            result = await run_tool_async(self, **kwargs)
+        publish_plans(result.get("plans") or [])
+        return render_for_llm(self.name, result)
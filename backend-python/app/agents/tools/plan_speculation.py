@@ -0,0 +1,128 @@
+"""plan_generator の投機実行
+
+出張条件（出発地・目的地・日程）が揃っている場合、LLM はほぼ確実に plan_generator を呼ぶ。
+そこで LLM の呼び出しと並行してプラン生成をバックグラウンドで開始し、
+同じ引数でツールが呼ばれたらその結果を再利用する。呼ばれなければ破棄する。
+
+投機の状態は ContextVar で1回のエージェント実行に閉じる。
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from app.logging_config import get_logger
+from app.services import metrics
+from .search_memo import MemoKey, build_memo_key
+from .tool_runtime import run_tool_async
+
+logger = get_logger(__name__)
+
+TOOL_NAME = "plan_generator"
+
+
+class _Speculation:
+    """実行中の投機1件"""
+
+    def __init__(self, speculator: "PlanSpeculator", key: MemoKey, task: "asyncio.Task"):
+        self.speculator = speculator
+        self.key = key
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.consumed = False
+
+
+_current: ContextVar[Optional[_Speculation]] = ContextVar("plan_speculation", default=None)
+
+
+class PlanSpeculator:
+    """plan_generator の投機実行とヒット・無駄のカウンタ"""
+
+    def __init__(self, plan_generator: Any, enabled: bool = True):
+        self.plan_generator = plan_generator
+        self.enabled = enabled
+        self.started = 0
+        self.hits = 0
+        self.mismatches = 0
+        self.wasted = 0
+        self.failed = 0
+
+    def start(self, tool_input: Dict[str, Any]) -> None:
+        """投機実行を開始（結果は take() で受け取る）"""
+        if not self.enabled:
+            return
+        task = asyncio.ensure_future(run_tool_async(self.plan_generator, **tool_input))
+        # 破棄した投機の例外を未回収のまま残さない
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        _current.set(_Speculation(self, build_memo_key(TOOL_NAME, tool_input), task))
+        self.started += 1
+        metrics.PLAN_SPECULATIONS.labels(outcome="started").inc()
+        logger.debug("plan_speculation_started", **self.stats())
+
+    async def take(self, tool_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """同じ引数の投機があれば結果を返す（なければ None）"""
+        speculation = _current.get()
+        if speculation is None or speculation.consumed:
+            return None
+
+        speculation.consumed = True
+        if speculation.key != build_memo_key(TOOL_NAME, tool_input):
+            self.mismatches += 1
+            metrics.PLAN_SPECULATIONS.labels(outcome="mismatch").inc()
+            speculation.task.cancel()
+            logger.info("plan_speculation_mismatch", **self.stats())
+            return None
+
+        ready = speculation.task.done()
+        try:
+            result = await speculation.task
+        except Exception as e:
+            self.failed += 1
+            metrics.PLAN_SPECULATIONS.labels(outcome="failed").inc()
+            logger.warning("plan_speculation_failed", error=str(e), error_type=type(e).__name__)
+            return None
+
+        self.hits += 1
+        metrics.PLAN_SPECULATIONS.labels(outcome="hit").inc()
+        logger.info(
+            "plan_speculation_hit",
+            ready=ready,
+            speculation_age_ms=round((time.perf_counter() - speculation.started_at) * 1000, 2),
+            **self.stats(),
+        )
+        return result
+
+    def finish(self) -> None:
+        """エージェント実行の終了時に呼ぶ。使われなかった投機は破棄して無駄として数える"""
+        speculation = _current.get()
+        if speculation is None:
+            return
+        _current.set(None)
+        if not speculation.consumed:
+            self.wasted += 1
+            metrics.PLAN_SPECULATIONS.labels(outcome="wasted").inc()
+            speculation.task.cancel()
+            logger.info("plan_speculation_wasted", **self.stats())
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.started if self.started else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """カウンタのスナップショット"""
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "mismatches": self.mismatches,
+            "wasted": self.wasted,
+            "failed": self.failed,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+async def take_speculative_plan(tool_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """現在のエージェント実行で投機済みのプランがあれば取得（PlanGeneratorTool から呼ぶ）"""
+    speculation = _current.get()
+    if speculation is None:
+        return None
+    return await speculation.speculator.take(tool_input)
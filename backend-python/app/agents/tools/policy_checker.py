@@ -1,9 +1,10 @@
 """社内旅費規程チェックツール（モック）"""
 from typing import Any, Dict, Optional
-from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from ddtrace.llmobs.decorators import tool as llmobs_tool
 
+from .tool_runtime import ThreadPoolTool
+
 
 # モック社内旅費規程
 TRAVEL_POLICY = {
@@ -59,7 +60,7 @@ class PolicyCheckInput(BaseModel):
     is_domestic: bool = Field(True, description="国内出張かどうか")
 
 
-class PolicyCheckerTool(BaseTool):
+class PolicyCheckerTool(ThreadPoolTool):
     """社内旅費規程をチェックするツール"""
     
     name: str = "policy_checker"
@@ -146,8 +147,3 @@ class PolicyCheckerTool(BaseTool):
             }
         
         return results
-    
-    async def _arun(self, **kwargs) -> Dict[str, Any]:
-        """非同期実行"""
-        return self._run(**kwargs)
-
@@ -0,0 +1,140 @@
+"""検索ツールのメモ化
+
+transportation_search / hotel_search の結果を正規化した引数をキーに再利用する。
+
+- 実行スコープ: 1回のエージェント実行内（LLM が直接呼んだ検索を plan_generator が再利用する等）
+- グローバルスコープ: セッションをまたいで TTL 付き LRU で保持
+
+結果は呼び出し側で変更されても影響しないよう、取得時にコピーを返す。
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services import metrics
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+MemoKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+# 実行スコープのキャッシュ（run_scope() の中でのみ有効）
+_run_entries: ContextVar[Optional[Dict[MemoKey, Any]]] = ContextVar("search_memo_run", default=None)
+
+# カウンタ名 → search_memo_lookups の result ラベル
+_LOOKUP_RESULTS = {"run_hits": "run_hit", "global_hits": "global_hit", "misses": "miss"}
+
+
+def build_memo_key(tool_name: str, args: Dict[str, Any]) -> MemoKey:
+    """ツール名と正規化済み引数からキーを作成（None の引数は省略とみなす）"""
+    items = []
+    for name, value in sorted(args.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower()
+        items.append((name, value))
+    return tool_name, tuple(items)
+
+
+class SearchMemo:
+    """検索結果のメモ化（実行スコープ + グローバル LRU）"""
+
+    def __init__(self, enabled: bool, max_entries: int, ttl_seconds: float):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[MemoKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @contextmanager
+    def run_scope(self) -> Iterator[None]:
+        """1回のエージェント実行の間、実行スコープのキャッシュを有効にする"""
+        token = _run_entries.set({})
+        try:
+            yield
+        finally:
+            _run_entries.reset(token)
+            logger.debug("search_memo_run_completed", **self.stats())
+
+    def get_or_call(self, tool_name: str, args: Dict[str, Any], func: Callable[[], Any]) -> Any:
+        """メモ化された結果を返す。なければ func を実行して保存"""
+        if not self.enabled:
+            return func()
+
+        key = build_memo_key(tool_name, args)
+        run_entries = _run_entries.get()
+
+        if run_entries is not None and key in run_entries:
+            self._count(tool_name, "run_hits")
+            logger.debug("search_memo_hit", tool=tool_name, scope="run")
+            return copy.deepcopy(run_entries[key])
+
+        value = self._get_global(key)
+        if value is not None:
+            self._count(tool_name, "global_hits")
+            logger.debug("search_memo_hit", tool=tool_name, scope="global")
+        else:
+            self._count(tool_name, "misses")
+            value = func()
+            self._set_global(key, value)
+
+        if run_entries is not None:
+            run_entries[key] = value
+        return copy.deepcopy(value)
+
+    def _count(self, tool_name: str, kind: str) -> None:
+        # ツールはスレッドプールで並行実行されるためロック下で更新
+        with self._lock:
+            counters = self._counters.setdefault(tool_name, {"run_hits": 0, "global_hits": 0, "misses": 0})
+            counters[kind] += 1
+        metrics.SEARCH_MEMO_LOOKUPS.labels(tool=tool_name, result=_LOOKUP_RESULTS[kind]).inc()
+
+    def _get_global(self, key: MemoKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_global(self, key: MemoKey, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """ツールごとのヒット数とヒット率のスナップショット"""
+        tools = {}
+        for tool_name, counters in self._counters.items():
+            hits = counters["run_hits"] + counters["global_hits"]
+            total = hits + counters["misses"]
+            tools[tool_name] = {
+                **counters,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+        return {"entries": len(self._entries), "tools": tools}
+
+
+search_memo = SearchMemo(
+    enabled=settings.search_memo_enabled,
+    max_entries=settings.search_memo_max_entries,
+    ttl_seconds=settings.search_memo_ttl_seconds,
+)
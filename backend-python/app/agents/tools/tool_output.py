@@ -0,0 +1,171 @@
+"""LLM に渡すツール出力の圧縮表現
+
+ツールの結果（dict）をそのまま LLM に返すと、ID・全便の時刻・アメニティ等の次のステップで
+使わない項目までプロンプトに入る。ここではツールごとに短い表（上位 k 件）に変換して返す。
+
+完全な結果は tool_result_scope() で集め、API（ストリーミングの tool_end イベント等）から参照する。
+失敗・タイムアウト時の結果は元々小さいため dict のまま返す（TravelPlan 等のモデルは JSON にできる
+dict に変換し、ToolMessage が Python の repr にならないようにする）。
+"""
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services.token_counter import count_text_tokens
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+_results: ContextVar[Optional[List[Tuple[str, Dict[str, Any]]]]] = ContextVar("tool_results", default=None)
+
+
+@contextmanager
+def tool_result_scope() -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+    """エージェント実行1回分のツールの完全な結果を集める（(ツール名, 結果) を実行順に追加）"""
+    results: List[Tuple[str, Dict[str, Any]]] = []
+    token = _results.set(results)
+    try:
+        yield results
+    finally:
+        _results.reset(token)
+
+
+def _yen(value: Any) -> str:
+    return f"{value:,}円" if isinstance(value, int) else "-"
+
+
+def render_transportation(result: Dict[str, Any]) -> str:
+    top_k = settings.tool_output_top_k
+    lines = [
+        f"{result.get('departure', '')}→{result.get('destination', '')} {result['total_options']}件"
+        f"（種別|便名|区間|所要|料金|便 先頭{top_k}本）"
+    ]
+    for option in result["options"]:
+        schedules = option.get("schedules", [])
+        times = ", ".join(f"{s['departure']}→{s['arrival']}" for s in schedules[:top_k])
+        if len(schedules) > top_k:
+            times += f" 他{len(schedules) - top_k}本"
+        prices = sorted({s["price"] for s in schedules})
+        price = _yen(prices[0]) + ("〜" if len(prices) > 1 else "") if prices else "-"
+        row = [
+            option.get("type", ""),
+            option.get("train_name", ""),
+            f"{option.get('departure_station', '')}→{option.get('arrival_station', '')}",
+            f"{option['duration_minutes']}分" if option.get("duration_minutes") else "-",
+            price,
+            times,
+        ]
+        if option.get("note"):
+            row.append(option["note"])
+        lines.append("|".join(row))
+    return "\n".join(lines)
+
+
+def render_hotels(result: Dict[str, Any]) -> str:
+    top_k = settings.tool_output_top_k
+    hotels = result["hotels"]
+    lines = [
+        f"{result.get('destination', '')} {result['nights']}泊 {result['total_options']}件"
+        + (f"中 評価上位{top_k}件" if len(hotels) > top_k else "")
+        + "（ホテル|エリア|1泊|合計|評価|アクセス）"
+    ]
+    for hotel in hotels[:top_k]:
+        lines.append("|".join([
+            hotel.get("name", ""),
+            hotel.get("area", ""),
+            _yen(hotel.get("price_per_night")),
+            _yen(hotel.get("total_price")),
+            str(hotel.get("rating", "-")),
+            hotel.get("distance_to_station", "-"),
+        ]))
+    return "\n".join(lines)
+
+
+def render_policy(result: Dict[str, Any]) -> str:
+    lines = [f"判定: {result['status']}"]
+    lines += [f"OK: {check['item']} - {check['detail']}" for check in result.get("checks", [])]
+    lines += [f"注意: {warning}" for warning in result.get("warnings", [])]
+    lines += [f"NG: {error}" for error in result.get("errors", [])]
+    summary = result.get("summary")
+    if summary:
+        lines.append(
+            f"総予算 {_yen(summary.get('total_budget'))} / 承認{'要' if summary.get('approval_required') else '不要'}"
+        )
+    return "\n".join(lines)
+
+
+def render_plans(result: Dict[str, Any]) -> str:
+    lines = [f"{result['total_plans']}件のプランを作成（ラベル|交通|宿泊|概算|規程|備考）"]
+    for plan in result["plans"]:
+        summary = plan.summary
+        lines.append("|".join([
+            plan.label,
+            summary.transportation,
+            summary.hotel,
+            _yen(summary.estimated_total),
+            summary.policy_status,
+            summary.policy_note or "",
+        ]))
+    return "\n".join(lines)
+
+
+_RENDERERS: Dict[str, Tuple[str, Callable[[Dict[str, Any]], str]]] = {
+    # ツール名: (成功を表すキー, 変換関数)
+    "transportation_search": ("found", render_transportation),
+    "hotel_search": ("found", render_hotels),
+    "policy_checker": ("status", render_policy),
+    "plan_generator": ("success", render_plans),
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def _jsonable(value: Any) -> Any:
+    """モデルを dict に変換する（AgentExecutor・ToolCallingLoop が JSON にできる形にする）"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+def render_for_llm(tool_name: str, result: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+    """完全な結果を記録し、LLM に渡す表現を返す"""
+    collected = _results.get()
+    if collected is not None:
+        collected.append((tool_name, result))
+
+    renderer = _RENDERERS.get(tool_name)
+    if not settings.tool_output_compact or renderer is None:
+        return _jsonable(result)
+    success_key, render = renderer
+    if not result.get(success_key) or result.get("timeout"):
+        return _jsonable(result)
+
+    start = time.perf_counter()
+    rendered = render(result)
+    render_us = round((time.perf_counter() - start) * 1_000_000, 1)
+    if settings.tool_output_token_stats:
+        # 圧縮前の JSON のトークン数を数えるのは計測時のみ（ツール呼び出しごとに数 KB を encode するため）
+        logger.info(
+            "tool_output_rendered",
+            tool=tool_name,
+            full_tokens=count_text_tokens(json.dumps(result, ensure_ascii=False, default=_json_default)),
+            llm_tokens=count_text_tokens(rendered),
+            render_us=render_us,
+        )
+    else:
+        logger.debug("tool_output_rendered", tool=tool_name, llm_chars=len(rendered), render_us=render_us)
+    return rendered
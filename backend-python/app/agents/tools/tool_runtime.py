@@ -0,0 +1,75 @@
+"""ツールの非同期実行
+
+AgentExecutor は1ステップ内の複数ツール呼び出し（parallel tool calls）を asyncio.gather で
+同時に実行する。各ツールの _arun から run_tool_async を呼び（検索・規程チェックのツールは
+ThreadPoolTool を継承して共通の _arun を使う）、以下を行う:
+
+- 同期の _run をスレッドプールで実行（イベントループをブロックしない）
+- 同時実行数の上限（全リクエスト共通のセマフォ）
+- ツールごとのタイムアウト（リクエストの残り時間が短ければそちらを優先。超過時はエラー内容を LLM に返す）
+
+タイムアウトしたスレッドは中断できないため、処理自体はバックグラウンドで完了まで走る。
+"""
+import asyncio
+import time
+from typing import Any, Dict, Union
+
+from langchain_core.runnables.config import run_in_executor
+from langchain_core.tools import BaseTool
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services.deadline import remaining_seconds
+from .tool_output import render_for_llm
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+_semaphore = asyncio.Semaphore(settings.tool_max_concurrency)
+
+
+def get_tool_timeout(tool_name: str) -> float:
+    """ツールのタイムアウト秒数（個別設定がなければ既定値、リクエストのデッドラインで頭打ち）"""
+    return remaining_seconds(settings.tool_timeout_map.get(tool_name, settings.tool_timeout_seconds))
+
+
+async def run_tool_async(tool: BaseTool, **kwargs: Any) -> Dict[str, Any]:
+    """ツールの _run を同時実行数の上限・タイムアウト付きで実行"""
+    timeout = get_tool_timeout(tool.name)
+    queued_at = time.perf_counter()
+
+    async with _semaphore:
+        started_at = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                run_in_executor(None, tool._run, **kwargs),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "tool_timeout",
+                tool=tool.name,
+                timeout_seconds=timeout,
+                wait_ms=round((started_at - queued_at) * 1000, 2),
+            )
+            return {
+                "success": False,
+                "timeout": True,
+                "message": f"{tool.name} の実行が{timeout:g}秒以内に完了しませんでした。",
+            }
+
+    logger.debug(
+        "tool_executed",
+        tool=tool.name,
+        wait_ms=round((started_at - queued_at) * 1000, 2),
+        duration_ms=round((time.perf_counter() - started_at) * 1000, 2),
+    )
+    return result
+
+
+class ThreadPoolTool(BaseTool):
+    """同期の _run だけを実装するツールの基底クラス（_arun は run_tool_async + 圧縮表示）"""
+
+    async def _arun(self, **kwargs: Any) -> Union[str, Dict[str, Any]]:
+        """非同期実行（スレッドプールで実行、同時実行数・タイムアウトを制御）。LLM には圧縮した表を返す"""
+        return render_for_llm(self.name, await run_tool_async(self, **kwargs))
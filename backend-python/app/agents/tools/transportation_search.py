@@ -1,9 +1,11 @@
 """交通手段検索ツール（モック）"""
 from typing import Any, Dict, List, Optional
-from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from ddtrace.llmobs.decorators import tool as llmobs_tool
 
+from .search_memo import search_memo
+from .tool_runtime import ThreadPoolTool
+
 
 # モック交通データ
 TRANSPORTATION_DATA = {
@@ -139,7 +141,7 @@ class TransportationSearchInput(BaseModel):
     max_price: Optional[int] = Field(None, description="片道上限金額")
 
 
-class TransportationSearchTool(BaseTool):
+class TransportationSearchTool(ThreadPoolTool):
     """交通手段を検索するツール"""
     
     name: str = "transportation_search"
@@ -155,11 +157,32 @@ class TransportationSearchTool(BaseTool):
         preferred_type: Optional[str] = None,
         max_price: Optional[int] = None,
     ) -> Dict[str, Any]:
-        """交通手段を検索"""
+        """交通手段を検索（正規化した引数でメモ化）"""
         # 出発地と目的地を正規化
         dep = self._normalize_location(departure)
         dest = self._normalize_location(destination)
         
+        result = search_memo.get_or_call(
+            self.name,
+            {"departure": dep, "destination": dest, "preferred_type": preferred_type, "max_price": max_price},
+            lambda: self._search(dep, dest, preferred_type, max_price),
+        )
+        
+        # 表記は今回の入力に合わせる
+        if result["found"]:
+            result["departure"] = departure
+            result["destination"] = destination
+        else:
+            result["message"] = f"{departure}から{destination}への交通手段が見つかりませんでした。"
+        return result
+    
+    def _search(
+        self,
+        dep: str,
+        dest: str,
+        preferred_type: Optional[str],
+        max_price: Optional[int],
+    ) -> Dict[str, Any]:
         # データ検索
         key = (dep, dest)
         reverse_key = (dest, dep)
@@ -174,7 +197,6 @@ class TransportationSearchTool(BaseTool):
         if not results:
             return {
                 "found": False,
-                "message": f"{departure}から{destination}への交通手段が見つかりませんでした。",
                 "options": []
             }
         
@@ -187,8 +209,6 @@ class TransportationSearchTool(BaseTool):
         
         return {
             "found": True,
-            "departure": departure,
-            "destination": destination,
             "options": filtered,
             "total_options": len(filtered)
         }
@@ -220,8 +240,3 @@ class TransportationSearchTool(BaseTool):
             new_r["departure_station"], new_r["arrival_station"] = r["arrival_station"], r["departure_station"]
             swapped.append(new_r)
         return swapped
-    
-    async def _arun(self, **kwargs) -> Dict[str, Any]:
-        """非同期実行"""
-        return self._run(**kwargs)
-
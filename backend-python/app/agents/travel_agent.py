@@ -10,38 +10,59 @@ LangChain AgentExecutor を使用した自律的なツール選択:
 3. hotel_search - 宿泊施設検索
 4. plan_generator - 出張プラン生成
 """
+import asyncio
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.agents import create_openai_tools_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
 
 # Datadog LLM Observability SDK
 from ddtrace.llmobs import LLMObs
 
 from app.config import get_settings, APP_VERSION
 from app.logging_config import get_logger
+from app.services.deadline import Deadline, deadline_scope
+from app.services.degradation import degradation_controller
+from app.services.usage_meter import usage_meter
+from app.services.http_client import get_openai_http_client
+from app.services.llm_cache import get_llm_response_cache
 from app.models.schemas import (
     TravelConditions,
     TravelPlan,
     SessionData,
     Message,
-    PlanSummary,
-    TransportationDetail,
-    HotelDetail,
 )
 from .tools import (
     PolicyCheckerTool,
     TransportationSearchTool,
     HotelSearchTool,
     PlanGeneratorTool,
+    PlanSpeculator,
+    plan_artifact_scope,
+    tool_result_scope,
+    extract_conditions,
+    search_memo,
+    merge_conditions,
 )
+from .callbacks import TokenUsageCollector, ToolOutputCollector, metrics_callback
+from .cascade import ModelCascade
+from .degraded_planner import DegradedPlanner
+from .executor import PlanFinishingAgentExecutor
+from .fast_path import FastPathRouter, build_plan_input, missing_slots
+from .llm import DeadlineAwareChatOpenAI
+from .resilience import LLMResilience
+from .tool_loop import ToolCallingLoop
+from .tool_selection import select_tools
+from .chat_history import ChatHistoryBuilder
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+MAX_ITERATIONS = 10
+
 
 # =============================================================================
 # プロンプトテンプレート（シンプル化）
@@ -62,9 +83,6 @@ SYSTEM_PROMPT = """あなたは営業担当者の出張計画をサポートす
 - 日帰りの場合 → plan_generator に return_date を省略して渡す
 - 条件が不足している場合 → ツールを使わずにユーザーに質問
 
-## 現在の会話状況
-{context}
-
 ## 重要
 - **プランを提案する際は、必ず plan_generator ツールを使用してください。自分でプランを生成してはいけません。**
 - 条件が不足している場合は、まずユーザーに確認してください
@@ -73,12 +91,18 @@ SYSTEM_PROMPT = """あなたは営業担当者の出張計画をサポートす
 - 「お願いします」「それでお願い」などの確認が来たら、条件が揃っていれば plan_generator を呼び出してください
 """
 
+# ターンごとに変わる情報は SYSTEM_PROMPT に含めず、ユーザー入力の直前に置く
+CONTEXT_PROMPT = """## 現在の会話状況
+{context}
+"""
+
 
 class TravelSupportAgent:
-    """出張サポートエージェント（簡素化版）
-    
-    AgentExecutor にツール選択を完全に委譲し、
-    冗長な条件抽出ロジックを削除。
+    """出張サポートエージェント
+
+    1ターンは以下の順に処理し、LLM が不要な段階で応答できればそこで返す:
+    条件抽出（ルールベース）→ ファストパス → 縮退運転 → モデルカスケード（小さいモデル）→
+    このターンで使えるツールに絞ったエージェント（AgentExecutor または ToolCallingLoop）。
     """
 
     def __init__(self):
@@ -87,59 +111,194 @@ class TravelSupportAgent:
             model=settings.openai_model,
         )
 
-        self.llm = ChatOpenAI(
+        self.llm = DeadlineAwareChatOpenAI(
             model=settings.openai_model,
             temperature=0.3,
             api_key=settings.openai_api_key,
-        )
+            cache=get_llm_response_cache(),
+            http_async_client=get_openai_http_client(),
+            stream_usage=True,
+            max_retries=0,  # リトライは LLMResilience で行う
+            callbacks=[metrics_callback],
+        ).with_resilience(self._build_resilience(), self._build_hedge_llm())
+
+        # モデルカスケード（ツール不要なターンは小さいモデルで応答）
+        self.cascade: Optional[ModelCascade] = None
+        if settings.cascade_enabled:
+            self.cascade = ModelCascade(DeadlineAwareChatOpenAI(
+                model=settings.cascade_model,
+                temperature=0.3,
+                api_key=settings.openai_api_key,
+                cache=get_llm_response_cache(),
+                http_async_client=get_openai_http_client(),
+                callbacks=[metrics_callback],
+            ))
 
         # ツールの初期化
+        self.plan_generator = PlanGeneratorTool()
+        self.policy_checker = PolicyCheckerTool()
         self.tools = [
-            PolicyCheckerTool(),
+            self.policy_checker,
             TransportationSearchTool(),
             HotelSearchTool(),
-            PlanGeneratorTool(),
+            self.plan_generator,
         ]
 
+        # LLM を経由しないファストパス
+        self.fast_path = FastPathRouter(self.plan_generator)
+
+        # LLM の劣化時（縮退運転中）に使う決定的なプランナー
+        self.degraded_planner = DegradedPlanner(self.plan_generator, self.policy_checker)
+
+        # 条件が揃っている場合の plan_generator の投機実行
+        self.plan_speculator = PlanSpeculator(
+            self.plan_generator, enabled=settings.plan_speculation_enabled
+        )
+
+        # トークン予算付きの会話履歴
+        self.history_builder = ChatHistoryBuilder(token_budget=settings.history_token_budget)
+
         logger.debug(
             "tools_initialized",
             tool_count=len(self.tools),
             tool_names=[t.name for t in self.tools],
         )
 
+        # plan_generator が成功したらそのステップで終了（プランはカードで表示するため）
+        self.summary_llm: Optional[DeadlineAwareChatOpenAI] = None
+        if settings.plan_finish_mode == "summary":
+            self.summary_llm = DeadlineAwareChatOpenAI(
+                model=settings.cascade_model,
+                temperature=0.3,
+                max_tokens=settings.plan_summary_max_tokens,
+                api_key=settings.openai_api_key,
+                http_async_client=get_openai_http_client(),
+                stream_usage=True,
+                callbacks=[metrics_callback],
+            )
+
+        # エージェントループ（AgentExecutor / ToolCallingLoop。入出力・イベントは同じ）
+        self.agent_executor = self.build_engine(settings.agent_engine)
+        # ターンごとに選んだツールの組み合わせ別のエージェント（初回に作成して使い回す）
+        self._engines: Dict[Tuple[str, ...], Runnable] = {
+            tuple(tool.name for tool in self.tools): self.agent_executor,
+        }
+
+        logger.info(
+            "travel_agent_init_complete",
+            max_iterations=MAX_ITERATIONS,
+            agent_engine=settings.agent_engine,
+            plan_finish_mode=settings.plan_finish_mode,
+        )
+
+    @staticmethod
+    def _build_resilience() -> LLMResilience:
+        return LLMResilience(
+            model=settings.openai_model,
+            hedge_model=settings.llm_hedge_model or None,
+            hedge_min_delay_seconds=settings.llm_hedge_min_delay_seconds,
+            hedge_max_delay_seconds=settings.llm_hedge_max_delay_seconds,
+            latency_window=settings.llm_hedge_latency_window,
+            retry_attempts=settings.llm_retry_attempts,
+            retry_base_seconds=settings.llm_retry_base_seconds,
+            retry_max_seconds=settings.llm_retry_max_seconds,
+            circuit_failure_threshold=settings.llm_circuit_failure_threshold,
+            circuit_reset_seconds=settings.llm_circuit_reset_seconds,
+        )
+
+    @staticmethod
+    def _build_hedge_llm() -> Optional[DeadlineAwareChatOpenAI]:
+        """ヘッジ先の LLM（設定がなければ None）"""
+        if not settings.llm_hedge_model:
+            return None
+        return DeadlineAwareChatOpenAI(
+            model=settings.llm_hedge_model,
+            temperature=0.3,
+            api_key=settings.openai_api_key,
+            base_url=settings.llm_hedge_base_url or None,
+            http_async_client=get_openai_http_client(),
+            stream_usage=True,
+            max_retries=0,
+        )
+
+    def build_engine(self, engine: str, tools: Optional[List[BaseTool]] = None) -> Runnable:
+        """エージェントループを作成（langchain: AgentExecutor / native: ToolCallingLoop）
+
+        tools を省略した場合は全ツールを渡す。
+        """
+        tools = tools or self.tools
+        if engine == "native":
+            return ToolCallingLoop(
+                llm=self.llm,
+                tools=tools,
+                system_prompt=SYSTEM_PROMPT,
+                context_prompt=CONTEXT_PROMPT,
+                max_iterations=MAX_ITERATIONS,
+                plan_finish_mode=settings.plan_finish_mode,
+                summary_llm=self.summary_llm,
+            )
+        if engine != "langchain":
+            raise ValueError(f"Unknown agent engine: {engine}")
+
         # プロンプトテンプレート
-        self.prompt = ChatPromptTemplate.from_messages([
+        # OpenAI のプロンプトキャッシュは先頭一致のため、不変部分（ツール定義・SYSTEM_PROMPT）→
+        # 追記のみの会話履歴 → ターンごとに変わるコンテキストの順に並べる
+        prompt = ChatPromptTemplate.from_messages([
             ("system", SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
+            ("system", CONTEXT_PROMPT),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ])
 
         # エージェントの作成
-        self.agent = create_openai_tools_agent(
+        agent = create_openai_tools_agent(
             llm=self.llm,
-            tools=self.tools,
-            prompt=self.prompt,
+            tools=tools,
+            prompt=prompt,
         )
 
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
+        return PlanFinishingAgentExecutor(
+            name="AgentExecutor",  # イベント・トレース上の名前は従来どおり
+            plan_finish_mode=settings.plan_finish_mode,
+            summary_llm=self.summary_llm,
+            agent=agent,
+            tools=tools,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=10,
+            max_iterations=MAX_ITERATIONS,
+            return_intermediate_steps=True,
+            # astream() は LLM キャッシュを参照しないため、ainvoke() 経由で呼び出す。
+            # トークンのストリーミングは astream_events() のコールバック経由で行われる。
+            stream_runnable=False,
         )
 
+    def _select_engine(self, session_data: SessionData, user_message: str) -> Tuple[Runnable, Tuple[str, ...]]:
+        """このターンのツールの組み合わせに対応するエージェントと、そのツール名"""
+        if not settings.dynamic_tools_enabled:
+            return self.agent_executor, tuple(tool.name for tool in self.tools)
+
+        tool_names = select_tools(session_data.conditions, user_message)
+        engine = self._engines.get(tool_names)
+        if engine is None:
+            engine = self.build_engine(
+                settings.agent_engine, [tool for tool in self.tools if tool.name in tool_names]
+            )
+            self._engines[tool_names] = engine
         logger.info(
-            "travel_agent_init_complete",
-            max_iterations=10,
+            "agent_tools_selected",
+            session_id=session_data.session_id,
+            tools=list(tool_names),
+            cached_engines=len(self._engines),
         )
+        return engine, tool_names
 
     async def process_message(
         self,
         user_message: str,
         session_data: SessionData,
         company_name: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
         """ユーザーメッセージを処理
         
@@ -157,7 +316,9 @@ class TravelSupportAgent:
         with LLMObs.agent(
             name="travel-support-agent",
             session_id=session_data.session_id,
-        ) as agent_span:
+        ) as agent_span, search_memo.run_scope(), deadline_scope(deadline), usage_meter.usage_scope(
+            session_data.session_id, session_data.user_id, company_name
+        ), plan_artifact_scope() as plans, tool_result_scope():
             # タグを構築（会社名がある場合は追加）
             custom_tags = {}
             if company_name:
@@ -181,51 +342,81 @@ class TravelSupportAgent:
                 history_count=len(session_data.messages),
             )
 
-            try:
-                # 会話履歴を構築
-                chat_history = self._build_chat_history(session_data.messages)
-
-                # コンテキストを構築
-                context = self._build_context(session_data)
-
-                # === AgentExecutor を実行 ===
-                with LLMObs.workflow(name="agent_execution") as exec_span:
-                    LLMObs.annotate(
-                        span=exec_span,
-                        input_data={
-                            "user_message": user_message,
-                            "available_tools": [t.name for t in self.tools],
-                        },
-                    )
-
-                    result = await self.agent_executor.ainvoke({
-                        "input": user_message,
-                        "chat_history": chat_history,
-                        "context": context,
-                    })
-
-                    agent_output = result.get("output", "")
+            # デッドライン超過時に途中結果を返すため、完了したツールの出力を記録
+            collector = ToolOutputCollector()
+            usage = TokenUsageCollector()
 
-                    # ツール呼び出しをログ
-                    tools_called = self._extract_tools_called(result)
-
-                    LLMObs.annotate(
-                        span=exec_span,
-                        output_data={
-                            "tools_called": tools_called,
-                            "tools_count": len(tools_called),
-                            "output_length": len(agent_output),
-                        },
-                    )
-
-                    logger.info(
-                        "agent_execution_complete",
-                        tools_called=tools_called,
-                        tools_count=len(tools_called),
-                    )
+            try:
+                # === 条件抽出（ルールベース、LLM 呼び出しなし） ===
+                extracted = self._update_conditions(user_message, session_data)
 
-                # プランを抽出
-                plans = self._extract_plans_from_result(result)
+                # === ファストパス（LLM 呼び出しなし） ===
+                fast_result = await self._try_fast_path(
+                    user_message, session_data, extracted, agent_span, start_time
+                )
+                if fast_result is not None:
+                    return fast_result
+
+                # === 縮退運転（LLM の劣化中は決定的なプランナーで応答） ===
+                if not degradation_controller.allow_llm():
+                    return await self._degraded_result(user_message, session_data, agent_span, start_time)
+
+                self._start_plan_speculation(session_data)
+
+                async with asyncio.timeout(deadline.remaining() if deadline else None):
+                    # 会話履歴を構築
+                    chat_history = await self.history_builder.build(session_data, user_message)
+
+                    # コンテキストを構築
+                    context = self._build_context(session_data)
+
+                    # === モデルカスケード（ツール不要なら小さいモデルの応答を返す） ===
+                    cascade = await self._decide_cascade(user_message, session_data, chat_history, context)
+                    if cascade["tier"] == "small":
+                        return self._small_tier_result(session_data, cascade, agent_span, start_time)
+
+                    # === AgentExecutor を実行 ===
+                    agent_start = time.time()
+                    agent_executor, tools_exposed = self._select_engine(session_data, user_message)
+                    with LLMObs.workflow(name="agent_execution") as exec_span:
+                        LLMObs.annotate(
+                            span=exec_span,
+                            input_data={
+                                "user_message": user_message,
+                                "available_tools": list(tools_exposed),
+                            },
+                        )
+
+                        result = await agent_executor.ainvoke(
+                            {
+                                "input": user_message,
+                                "chat_history": chat_history,
+                                "context": context,
+                            },
+                            config={"callbacks": [collector, usage, metrics_callback]},
+                        )
+
+                        agent_output = result.get("output", "")
+
+                        # ツール呼び出しをログ
+                        tools_called = self._extract_tools_called(result)
+
+                        LLMObs.annotate(
+                            span=exec_span,
+                            output_data={
+                                "tools_called": tools_called,
+                                "tools_count": len(tools_called),
+                                "output_length": len(agent_output),
+                            },
+                        )
+
+                        logger.info(
+                            "agent_execution_complete",
+                            tools_called=tools_called,
+                            tools_count=len(tools_called),
+                        )
+
+                logger.info("total_plans_extracted", count=len(plans))
 
                 total_duration = time.time() - start_time
 
@@ -245,6 +436,13 @@ class TravelSupportAgent:
                     session_id=session_data.session_id,
                     total_duration_ms=round(total_duration * 1000, 2),
                     tools_called=tools_called,
+                    tools_exposed=list(tools_exposed),
+                    tier="large",
+                    cascade_reason=cascade["reason"],
+                    small_latency_ms=cascade["latency_ms"],
+                    large_latency_ms=round((time.time() - agent_start) * 1000, 2),
+                    large_model=settings.openai_model,
+                    **usage.as_dict(),
                 )
 
                 return {
@@ -254,6 +452,11 @@ class TravelSupportAgent:
                 }
 
             except Exception as e:
+                if deadline is not None and deadline.expired:
+                    return self._deadline_exceeded_result(
+                        session_data, deadline, collector.tools_called, plans
+                    )
+
                 logger.error(
                     "process_message_error",
                     session_id=session_data.session_id,
@@ -266,15 +469,433 @@ class TravelSupportAgent:
                     "updated_conditions": session_data.conditions,
                 }
 
-    def _build_chat_history(self, messages: List[Message]) -> List:
-        """会話履歴をLangChain形式に変換"""
-        chat_history = []
-        for msg in messages[-10:]:  # 直近10件
-            if msg.role == "user":
-                chat_history.append(HumanMessage(content=msg.content))
-            else:
-                chat_history.append(AIMessage(content=msg.content))
-        return chat_history
+            finally:
+                self.plan_speculator.finish()
+
+    async def stream_message(
+        self,
+        user_message: str,
+        session_data: SessionData,
+        company_name: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """ユーザーメッセージをストリーミング処理
+
+        AgentExecutor のイベントストリームを購読し、発生順にイベントを yield する:
+        - token: LLM の出力トークン
+        - tool_start / tool_end: ツールの開始・終了（tool_end には LLM に渡していない完全な結果を含む）
+        - plans: plan_generator が返した直後のプラン
+        - result: process_message と同じ形式の最終結果（最後に1回だけ）
+        """
+        start_time = time.time()
+
+        # === LLMObs: Agentスパンを開始 ===
+        with LLMObs.agent(
+            name="travel-support-agent",
+            session_id=session_data.session_id,
+        ) as agent_span, search_memo.run_scope(), deadline_scope(deadline), usage_meter.usage_scope(
+            session_data.session_id, session_data.user_id, company_name
+        ), plan_artifact_scope() as plans, tool_result_scope() as tool_results:
+            custom_tags = {}
+            if company_name:
+                custom_tags["company_name"] = company_name
+            custom_tags["user_id"] = session_data.user_id
+
+            LLMObs.annotate(
+                span=agent_span,
+                input_data={
+                    "user_message": user_message,
+                    "history_count": len(session_data.messages),
+                    "version": APP_VERSION,
+                    "streaming": True,
+                },
+                tags=custom_tags,
+            )
+
+            logger.info(
+                "stream_message_start",
+                session_id=session_data.session_id,
+                message_length=len(user_message),
+                history_count=len(session_data.messages),
+            )
+
+            agent_output = ""
+            streamed_tokens: List[str] = []
+            tools_called: List[str] = []
+            emitted_plan_count = 0
+            emitted_result_counts: Dict[str, int] = {}
+            first_token_ms = None
+            answer_streamed = False  # 最後のツール実行の後にトークンが流れたか
+            usage = TokenUsageCollector()
+
+            try:
+                # === 条件抽出（ルールベース、LLM 呼び出しなし） ===
+                extracted = self._update_conditions(user_message, session_data)
+
+                # === ファストパス（LLM 呼び出しなし） ===
+                fast_result = await self._try_fast_path(
+                    user_message, session_data, extracted, agent_span, start_time
+                )
+                if fast_result is not None:
+                    if fast_result["plans"]:
+                        yield {
+                            "event": "plans",
+                            "data": {"plans": [p.model_dump() for p in fast_result["plans"]]},
+                        }
+                    yield {"event": "token", "data": {"content": fast_result["response"]}}
+                    yield {"event": "result", "data": fast_result}
+                    return
+
+                if not degradation_controller.allow_llm():
+                    result = await self._degraded_result(user_message, session_data, agent_span, start_time)
+                    if result["plans"]:
+                        yield {
+                            "event": "plans",
+                            "data": {"plans": [p.model_dump() for p in result["plans"]]},
+                        }
+                    yield {"event": "token", "data": {"content": result["response"]}}
+                    yield {"event": "result", "data": result}
+                    return
+
+                self._start_plan_speculation(session_data)
+
+                async with asyncio.timeout(deadline.remaining() if deadline else None):
+                    chat_history = await self.history_builder.build(session_data, user_message)
+                    context = self._build_context(session_data)
+                    cascade = await self._decide_cascade(user_message, session_data, chat_history, context)
+
+                if cascade["tier"] == "small":
+                    result = self._small_tier_result(session_data, cascade, agent_span, start_time)
+                    yield {"event": "token", "data": {"content": result["response"]}}
+                    yield {"event": "result", "data": result}
+                    return
+
+                agent_executor, tools_exposed = self._select_engine(session_data, user_message)
+                events = agent_executor.astream_events(
+                    {
+                        "input": user_message,
+                        "chat_history": chat_history,
+                        "context": context,
+                    },
+                    version="v2",
+                    config={"callbacks": [usage, metrics_callback]},
+                )
+                while True:
+                    # タイムアウトは次のイベントを待つ間だけに掛ける（yield 中に打ち切らない）
+                    async with asyncio.timeout(deadline.remaining() if deadline else None):
+                        event = await anext(events, None)
+                    if event is None:
+                        break
+
+                    kind = event["event"]
+                    name = event.get("name", "")
+                    data = event.get("data", {})
+
+                    if kind == "on_chat_model_stream":
+                        token = getattr(data.get("chunk"), "content", "")
+                        if token:
+                            if first_token_ms is None:
+                                first_token_ms = round((time.time() - start_time) * 1000, 2)
+                            streamed_tokens.append(token)
+                            answer_streamed = True
+                            yield {"event": "token", "data": {"content": token}}
+
+                    elif kind == "on_tool_start":
+                        tools_called.append(name)
+                        yield {
+                            "event": "tool_start",
+                            "data": {"tool": name, "input": data.get("input")},
+                        }
+
+                    elif kind == "on_tool_end":
+                        # LLM には圧縮した表を渡しているため、API には完全な結果を返す（プランは plans イベント）
+                        tool_end = {"tool": name}
+                        results_for_tool = [result for tool, result in tool_results if tool == name]
+                        emitted = emitted_result_counts.get(name, 0)
+                        if name != "plan_generator" and len(results_for_tool) > emitted:
+                            tool_end["result"] = results_for_tool[emitted]
+                            emitted_result_counts[name] = emitted + 1
+                        answer_streamed = False
+                        yield {"event": "tool_end", "data": tool_end}
+                        if len(plans) > emitted_plan_count:
+                            new_plans = plans[emitted_plan_count:]
+                            emitted_plan_count = len(plans)
+                            yield {
+                                "event": "plans",
+                                "data": {"plans": [p.model_dump() for p in new_plans]},
+                            }
+
+                    elif kind == "on_chain_end" and name == "AgentExecutor":
+                        output = data.get("output") or {}
+                        agent_output = output.get("output", "")
+
+                # キャッシュヒット時や plan_generator 後の定型文など、最終応答のトークンが流れなかった場合は
+                # 最終出力をまとめて送る
+                if not answer_streamed and agent_output:
+                    yield {"event": "token", "data": {"content": agent_output}}
+
+                total_duration = time.time() - start_time
+
+                LLMObs.annotate(
+                    span=agent_span,
+                    output_data={
+                        "response": agent_output[:200] if len(agent_output) > 200 else agent_output,
+                        "tools_called": tools_called,
+                        "plans_generated": len(plans),
+                        "duration_ms": round(total_duration * 1000, 2),
+                        "first_token_ms": first_token_ms,
+                    },
+                )
+
+                logger.info(
+                    "stream_message_complete",
+                    session_id=session_data.session_id,
+                    total_duration_ms=round(total_duration * 1000, 2),
+                    first_token_ms=first_token_ms,
+                    tools_called=tools_called,
+                    tools_exposed=list(tools_exposed),
+                    tier="large",
+                    cascade_reason=cascade["reason"],
+                    small_latency_ms=cascade["latency_ms"],
+                    large_model=settings.openai_model,
+                    **usage.as_dict(),
+                )
+
+                yield {
+                    "event": "result",
+                    "data": {
+                        "response": agent_output,
+                        "plans": plans,
+                        "updated_conditions": session_data.conditions,
+                    },
+                }
+
+            except Exception as e:
+                if deadline is not None and deadline.expired:
+                    result = self._deadline_exceeded_result(
+                        session_data, deadline, tools_called, plans, partial_text="".join(streamed_tokens)
+                    )
+                    yield {"event": "token", "data": {"content": result["notice"]}}
+                    yield {"event": "result", "data": result}
+                    return
+
+                logger.error(
+                    "stream_message_error",
+                    session_id=session_data.session_id,
+                    error=str(e),
+                    error_type=type(e).__name__,
+                )
+                yield {
+                    "event": "result",
+                    "data": {
+                        "response": f"申し訳ありません。処理中にエラーが発生しました: {str(e)}",
+                        "plans": plans,
+                        "updated_conditions": session_data.conditions,
+                    },
+                }
+
+            finally:
+                self.plan_speculator.finish()
+
+    def _deadline_exceeded_result(
+        self,
+        session_data: SessionData,
+        deadline: Deadline,
+        tools_called: List[str],
+        plans: List[TravelPlan],
+        partial_text: str = "",
+    ) -> Dict[str, Any]:
+        """デッドライン超過時に途中までの結果から応答を組み立てる"""
+        if plans:
+            notice = (
+                "時間内にすべての処理を完了できなかったため、途中までの結果をお返しします。"
+                f"{len(plans)}件のプランを作成しました。内容をご確認ください。"
+            )
+        else:
+            notice = "申し訳ありません。時間内に回答を完了できませんでした。条件を絞るか、もう一度お試しください。"
+        if partial_text:
+            notice = f"\n\n（{notice}）"
+
+        logger.warning(
+            "process_message_deadline_exceeded",
+            session_id=session_data.session_id,
+            deadline_seconds=deadline.seconds,
+            tools_called=tools_called,
+            plans_generated=len(plans),
+            partial_text_length=len(partial_text),
+        )
+
+        return {
+            "response": partial_text + notice,
+            "plans": plans,
+            "updated_conditions": session_data.conditions,
+            "deadline_exceeded": True,
+            "notice": notice,
+        }
+
+    async def _decide_cascade(
+        self,
+        user_message: str,
+        session_data: SessionData,
+        chat_history: List,
+        context: str,
+    ) -> Dict[str, Any]:
+        """モデルカスケードの振り分け（無効の場合は常に大きいモデル）"""
+        if self.cascade is None:
+            return {"tier": "large", "reason": "cascade_disabled", "latency_ms": 0.0}
+        return await self.cascade.decide(user_message, session_data.conditions, chat_history, context)
+
+    def _small_tier_result(
+        self,
+        session_data: SessionData,
+        cascade: Dict[str, Any],
+        agent_span: Any,
+        start_time: float,
+    ) -> Dict[str, Any]:
+        """小さいモデルの応答を process_message と同じ形式の結果にする"""
+        total_duration = time.time() - start_time
+
+        LLMObs.annotate(
+            span=agent_span,
+            output_data={
+                "response": cascade["response"][:200],
+                "duration_ms": round(total_duration * 1000, 2),
+            },
+            tags={"cascade_tier": "small"},
+        )
+
+        logger.info(
+            "process_message_complete",
+            session_id=session_data.session_id,
+            total_duration_ms=round(total_duration * 1000, 2),
+            tools_called=[],
+            tier="small",
+            cascade_reason=cascade["reason"],
+            small_latency_ms=cascade["latency_ms"],
+            small_model=settings.cascade_model,
+            prompt_tokens=cascade["prompt_tokens"],
+            completion_tokens=cascade["completion_tokens"],
+        )
+
+        return {
+            "response": cascade["response"],
+            "plans": [],
+            "updated_conditions": session_data.conditions,
+        }
+
+    async def _degraded_result(
+        self,
+        user_message: str,
+        session_data: SessionData,
+        agent_span: Any,
+        start_time: float,
+    ) -> Dict[str, Any]:
+        """縮退運転中の応答を process_message と同じ形式の結果にする"""
+        planned = await self.degraded_planner.respond(user_message, session_data.conditions)
+        total_duration = time.time() - start_time
+
+        LLMObs.annotate(
+            span=agent_span,
+            output_data={
+                "response": planned["response"][:200],
+                "route": planned["route"],
+                "plans_generated": len(planned["plans"]),
+                "duration_ms": round(total_duration * 1000, 2),
+            },
+            tags={"degraded": planned["route"]},
+        )
+
+        logger.info(
+            "process_message_degraded",
+            session_id=session_data.session_id,
+            route=planned["route"],
+            plan_count=len(planned["plans"]),
+            total_duration_ms=round(total_duration * 1000, 2),
+            **degradation_controller.stats(),
+        )
+
+        return {
+            "response": planned["response"],
+            "plans": planned["plans"],
+            "updated_conditions": session_data.conditions,
+        }
+
+    def _start_plan_speculation(self, session_data: SessionData) -> None:
+        """条件が揃っていれば LLM の応答を待たずに plan_generator を開始"""
+        if missing_slots(session_data.conditions):
+            return
+        self.plan_speculator.start(build_plan_input(session_data.conditions))
+
+    def _update_conditions(self, user_message: str, session_data: SessionData) -> Dict[str, Any]:
+        """メッセージから条件を抽出し、セッションの条件にマージ
+
+        Returns:
+            今回のメッセージから抽出された項目
+        """
+        extract_start = time.perf_counter()
+        extracted = extract_conditions(user_message)
+        if extracted:
+            session_data.conditions = merge_conditions(session_data.conditions, extracted)
+
+        logger.debug(
+            "conditions_extracted",
+            session_id=session_data.session_id,
+            extracted_keys=sorted(extracted),
+            duration_us=round((time.perf_counter() - extract_start) * 1_000_000, 1),
+        )
+        return extracted
+
+    async def _try_fast_path(
+        self,
+        user_message: str,
+        session_data: SessionData,
+        extracted: Dict[str, Any],
+        agent_span: Any,
+        start_time: float,
+    ) -> Optional[Dict[str, Any]]:
+        """ファストパスで処理できる場合は process_message と同じ形式の結果を返す"""
+        if not settings.fast_path_enabled:
+            return None
+
+        last_assistant_message = next(
+            (m.content for m in reversed(session_data.messages) if m.role == "assistant" and m.type == "text"),
+            None,
+        )
+        routed = await self.fast_path.route(
+            user_message, session_data.conditions, extracted, last_assistant_message
+        )
+        if routed is None:
+            return None
+
+        plans = routed["tool_output"]["plans"] if routed["tool_output"] else []
+
+        total_duration = time.time() - start_time
+
+        LLMObs.annotate(
+            span=agent_span,
+            output_data={
+                "response": routed["response"][:200],
+                "route": routed["route"],
+                "plans_generated": len(plans),
+                "duration_ms": round(total_duration * 1000, 2),
+            },
+            tags={"fast_path": routed["route"]},
+        )
+
+        logger.info(
+            "process_message_fast_path",
+            session_id=session_data.session_id,
+            route=routed["route"],
+            plan_count=len(plans),
+            total_duration_ms=round(total_duration * 1000, 2),
+            fast_path_hit_rate=round(self.fast_path.hit_rate, 4),
+        )
+
+        return {
+            "response": routed["response"],
+            "plans": plans,
+            "updated_conditions": session_data.conditions,
+        }
 
     def _build_context(self, session_data: SessionData) -> str:
         """コンテキスト情報を構築"""
@@ -296,6 +917,14 @@ class TravelSupportAgent:
             parts.append(f"出発日: {conditions.depart_date}")
         if conditions.return_date:
             parts.append(f"帰着日: {conditions.return_date}")
+        elif conditions.is_day_trip:
+            parts.append("帰着日: 日帰り")
+        if conditions.budget:
+            parts.append(f"予算: {conditions.budget:,}円")
+        if conditions.preferred_transportation:
+            parts.append(f"希望交通手段: {conditions.preferred_transportation}")
+        if conditions.purpose:
+            parts.append(f"目的: {conditions.purpose}")
 
         return "\n".join(parts) if parts else "新規会話"
 
@@ -314,68 +943,3 @@ class TravelSupportAgent:
                     tool_input=str(getattr(action, 'tool_input', ''))[:100],
                 )
         return tools_called
-
-    def _extract_plans_from_result(self, result: Dict) -> List[TravelPlan]:
-        """エージェントの実行結果からプランを抽出
-        
-        plan_generator ツールの実行結果からプランを取得
-        """
-        import json
-        
-        plans = []
-        intermediate_steps = result.get("intermediate_steps", [])
-
-        for step in intermediate_steps:
-            if len(step) >= 2:
-                action = step[0]
-                tool_output = step[1]
-                tool_name = getattr(action, 'tool', '')
-
-                if tool_name == "plan_generator":
-                    # tool_output が文字列の場合はJSONとしてパース
-                    if isinstance(tool_output, str):
-                        try:
-                            tool_output = json.loads(tool_output)
-                        except json.JSONDecodeError:
-                            logger.warning("plan_generator_output_not_json", output=tool_output[:100])
-                            continue
-                    
-                    if isinstance(tool_output, dict):
-                        raw_plans = tool_output.get("plans", [])
-                        logger.info("plan_generator_plans_found", count=len(raw_plans))
-                        
-                        for p in raw_plans:
-                            if isinstance(p, dict):
-                                try:
-                                    plan = TravelPlan(
-                                        plan_id=p.get("plan_id", ""),
-                                        label=p.get("label", ""),
-                                        summary=PlanSummary(
-                                            depart_date=p.get("summary", {}).get("depart_date", ""),
-                                            return_date=p.get("summary", {}).get("return_date", ""),
-                                            destination=p.get("summary", {}).get("destination", ""),
-                                            transportation=p.get("summary", {}).get("transportation", ""),
-                                            hotel=p.get("summary", {}).get("hotel", ""),
-                                            estimated_total=p.get("summary", {}).get("estimated_total", 0),
-                                            policy_status=p.get("summary", {}).get("policy_status", "OK"),
-                                            policy_note=p.get("summary", {}).get("policy_note"),
-                                        ),
-                                        outbound_transportation=TransportationDetail(
-                                            **p["outbound_transportation"]
-                                        ) if p.get("outbound_transportation") else None,
-                                        return_transportation=TransportationDetail(
-                                            **p["return_transportation"]
-                                        ) if p.get("return_transportation") else None,
-                                        hotel=HotelDetail(**p["hotel"]) if p.get("hotel") else None,
-                                    )
-                                    plans.append(plan)
-                                    logger.info("plan_extracted", plan_id=plan.plan_id, label=plan.label)
-                                except Exception as e:
-                                    logger.warning(
-                                        "plan_extraction_error",
-                                        error=str(e),
-                                        plan_data=str(p)[:200],
-                                    )
-
-        logger.info("total_plans_extracted", count=len(plans))
-        return plans
@@ -1,5 +1,6 @@
 from .chat import router as chat_router
 from .plan import router as plan_router
+from .admin import router as admin_router
 
-__all__ = ["chat_router", "plan_router"]
+__all__ = ["chat_router", "plan_router", "admin_router"]
 
@@ -0,0 +1,35 @@
+"""管理APIエンドポイント"""
+import hmac
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from app.config import get_settings
+from app.services.usage_meter import usage_meter
+from app.logging_config import get_logger
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+def require_admin_key(x_admin_key: Optional[str] = Header(None)) -> None:
+    """X-Admin-Key ヘッダを確認（ADMIN_API_KEY が未設定なら常に拒否）"""
+    if not settings.admin_api_key:
+        logger.warning("admin_api_disabled")
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, settings.admin_api_key):
+        logger.warning("admin_auth_failed")
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+@router.get("/usage", dependencies=[Depends(require_admin_key)])
+async def get_usage(
+    group: Literal["session", "user", "company", "model"] = "company",
+    key: Optional[str] = Query(None, description="特定のセッションID・ユーザーID・会社名・モデル"),
+    sort_by: Literal["cost_usd", "total_tokens", "prompt_tokens", "completion_tokens", "llm_calls"] = "cost_usd",
+    limit: int = Query(50, ge=1, le=1000),
+) -> Dict[str, Any]:
+    """トークン数・コストの集計（起動からの累計）"""
+    logger.debug("usage_summary_request", group=group, key=key, sort_by=sort_by, limit=limit)
+    return usage_meter.summary(group, key=key, sort_by=sort_by, limit=limit)
@@ -1,11 +1,22 @@
 """チャットAPIエンドポイント"""
+import asyncio
+import json
+import math
 import os
 import time
 from contextlib import nullcontext
-from fastapi import APIRouter, HTTPException
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from app.models.schemas import ChatRequest, ChatResponse, Message
-from app.services.session_manager import session_manager
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.config import get_settings
+from app.models.schemas import BatchChatRequest, BatchConversation, ChatRequest, ChatResponse, Message, TravelPlan
+from app.services.deadline import Deadline, resolve_deadline_seconds
+from app.services.session_manager import SessionBusyError, session_manager
+from app.services.single_flight import build_flight_key, single_flight
+from app.services.usage_meter import usage_meter
 from app.agents import TravelSupportAgent
 from app.logging_config import get_logger
 
@@ -17,13 +28,17 @@ if os.getenv("DD_LLMOBS_ENABLED") == "1":
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 logger = get_logger(__name__)
+settings = get_settings()
+
+# クライアントが切断した場合のステータス（nginx の慣例に合わせる）
+CLIENT_CLOSED_REQUEST = 499
 
 # エージェントのシングルトン
 _agent: TravelSupportAgent = None
 
 
 def get_agent() -> TravelSupportAgent:
-    """エージェントを取得"""
+    """エージェントを取得（通常は app.main の lifespan で起動時に構築済み）"""
     global _agent
     if _agent is None:
         logger.info("agent_initialization", message="Creating new TravelSupportAgent instance")
@@ -32,9 +47,113 @@ def get_agent() -> TravelSupportAgent:
     return _agent
 
 
+class _DisconnectWatcher:
+    """クライアントの切断を検知したら処理中のタスクをキャンセルする（非ストリーミング用）
+
+    ストリーミングでは StreamingResponse 自身が receive() で切断を待つため使わない
+    （同じ receive() を並行して待つと切断通知を取り合う）。
+    """
+
+    def __init__(self, http_request: Request, task: "asyncio.Task"):
+        self.http_request = http_request
+        self.task = task
+        self.disconnected = False
+        self._watch_task: Optional["asyncio.Task"] = None
+
+    async def __aenter__(self) -> "_DisconnectWatcher":
+        self._watch_task = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._watch_task.cancel()
+
+    async def _watch(self) -> None:
+        # ボディは読み込み済みのため、次に届くのは切断通知のみ
+        # （BaseHTTPMiddleware 配下では Request.is_disconnected() が切断を検知できない）
+        message = await self.http_request.receive()
+        if message["type"] == "http.disconnect":
+            self.disconnected = True
+            self.task.cancel()
+
+
+def _persist_agent_result(session_id: str, result: Dict[str, Any]) -> Tuple[Message, List[TravelPlan]]:
+    """エージェントの処理結果をセッションに反映
+
+    条件・プラン・アシスタントメッセージを session_manager 経由で保存する。
+    通常のチャットとストリーミングの両方で共通。
+    """
+    # 条件を更新
+    updated_conditions = result.get("updated_conditions")
+    if updated_conditions:
+        logger.debug(
+            "conditions_updated",
+            session_id=session_id,
+            departure_location=updated_conditions.departure_location,
+            destination=updated_conditions.destination,
+            depart_date=updated_conditions.depart_date,
+            return_date=updated_conditions.return_date,
+            budget=updated_conditions.budget,
+            preferred_transportation=updated_conditions.preferred_transportation,
+        )
+        session_manager.update_session(
+            session_id,
+            conditions=updated_conditions,
+        )
+
+    # process_message の結果からプランを取得
+    # AgentExecutor が plan_generator を呼んだ場合、結果に含まれる
+    plans = result.get("plans", [])
+
+    if plans:
+        session_manager.add_plans(session_id, plans)
+
+        logger.info(
+            "plans_from_agent",
+            session_id=session_id,
+            plan_count=len(plans),
+        )
+
+        for plan in plans:
+            logger.debug(
+                "plan_detail",
+                session_id=session_id,
+                plan_id=getattr(plan, 'plan_id', None) or getattr(plan, 'id', 'unknown'),
+                label=getattr(plan, 'label', None) or getattr(plan, 'name', 'unknown'),
+                destination=plan.summary.destination,
+                estimated_total=plan.summary.estimated_total,
+                policy_status=plan.summary.policy_status,
+            )
+
+    # アシスタントメッセージを追加
+    assistant_message = Message(
+        role="assistant",
+        type="plan_cards" if plans else "text",
+        content=result.get("response", ""),
+    )
+    session_manager.update_session(
+        session_id,
+        add_message=assistant_message,
+    )
+
+    logger.debug(
+        "assistant_message_added",
+        session_id=session_id,
+        message_type=assistant_message.type,
+        has_plans=len(plans) > 0,
+    )
+
+    return assistant_message, plans
+
+
 @router.post("", response_model=ChatResponse)
-async def send_message(request: ChatRequest) -> ChatResponse:
-    """チャットメッセージを送信"""
+async def send_message(request: ChatRequest, http_request: Request) -> ChatResponse:
+    """チャットメッセージを送信
+
+    同じセッション・同じメッセージのリクエストが処理中の場合は、その結果を待って同じレスポンスを返す。
+    同じセッションの別のメッセージは到着順に処理し、待ちきれない場合は 429 を返す。
+    デッドライン（会社別・エンドポイント別に設定）を超えた場合は途中までの結果を返す。
+    クライアントが切断した場合はエージェントの処理を中断する（合流中の他のリクエストがあれば継続）。
+    """
     start_time = time.time()
     
     logger.info(
@@ -46,26 +165,68 @@ async def send_message(request: ChatRequest) -> ChatResponse:
     )
     
     try:
-        # セッションを取得または作成
-        logger.debug(
-            "session_lookup",
-            session_id=request.session_id,
-            user_id=request.user_id,
+        flight_key = build_flight_key(request.session_id, request.user_id, request.message)
+        call_task = asyncio.ensure_future(
+            single_flight.do(flight_key, lambda: _process_chat_request(request, start_time))
         )
+        async with _DisconnectWatcher(http_request, call_task) as watcher:
+            try:
+                return await call_task
+            except asyncio.CancelledError:
+                if not watcher.disconnected:
+                    raise
+                logger.info(
+                    "chat_client_disconnected",
+                    session_id=request.session_id,
+                    duration_ms=round((time.time() - start_time) * 1000, 2),
+                )
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
         
-        session = session_manager.get_or_create_session(
-            request.session_id,
-            request.user_id,
+    except SessionBusyError as e:
+        logger.warning(
+            "chat_session_busy",
+            session_id=request.session_id,
+            reason=e.reason,
         )
-        
-        logger.debug(
-            "session_resolved",
-            session_id=session.session_id,
-            is_new_session=request.session_id is None or request.session_id != session.session_id,
-            existing_message_count=len(session.messages),
-            existing_plan_count=len(session.plans),
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    except Exception as e:
+        logger.error(
+            "chat_processing_error",
+            user_id=request.user_id,
+            session_id=request.session_id,
+            error=str(e),
+            error_type=type(e).__name__,
         )
+        raise HTTPException(status_code=500, detail=str(e))
 
+
+async def _process_chat_request(request: ChatRequest, start_time: float) -> ChatResponse:
+    """チャットメッセージを1件処理（重複リクエストとはこの結果を共有する）"""
+    deadline = Deadline(resolve_deadline_seconds("chat", request.company_name))
+
+    # セッションを取得または作成
+    logger.debug(
+        "session_lookup",
+        session_id=request.session_id,
+        user_id=request.user_id,
+    )
+    
+    session = session_manager.get_or_create_session(
+        request.session_id,
+        request.user_id,
+    )
+    
+    logger.debug(
+        "session_resolved",
+        session_id=session.session_id,
+        is_new_session=request.session_id is None or request.session_id != session.session_id,
+        existing_message_count=len(session.messages),
+        existing_plan_count=len(session.plans),
+    )
+
+    # 同じセッションのメッセージは到着順に1件ずつ処理する（待ち時間もデッドラインに含める）
+    async with session_manager.session_turn(session.session_id, timeout=deadline.remaining()):
         llmobs_root_ctx = (
             LLMObs.workflow(name="chat_request", session_id=session.session_id)
             if LLMObs
@@ -100,6 +261,7 @@ async def send_message(request: ChatRequest) -> ChatResponse:
                 user_message=request.message,
                 session_data=session,
                 company_name=request.company_name,
+                deadline=deadline,
             )
             agent_duration = time.time() - agent_start
 
@@ -110,90 +272,336 @@ async def send_message(request: ChatRequest) -> ChatResponse:
                 response_length=len(result.get("response", "")),
             )
 
-            # 条件を更新
-            updated_conditions = result.get("updated_conditions")
-            if updated_conditions:
-                logger.debug(
-                    "conditions_updated",
-                    session_id=session.session_id,
-                    departure_location=updated_conditions.departure_location,
-                    destination=updated_conditions.destination,
-                    depart_date=updated_conditions.depart_date,
-                    return_date=updated_conditions.return_date,
-                    budget=updated_conditions.budget,
-                    preferred_transportation=updated_conditions.preferred_transportation,
-                )
-                session_manager.update_session(
-                    session.session_id,
-                    conditions=updated_conditions,
-                )
+            assistant_message, plans = _persist_agent_result(session.session_id, result)
 
-            # process_message の結果からプランを取得
-            # AgentExecutor が plan_generator を呼んだ場合、結果に含まれる
-            plans = result.get("plans", [])
+            total_duration = time.time() - start_time
+            logger.info(
+                "chat_response_sent",
+                session_id=session.session_id,
+                total_duration_ms=round(total_duration * 1000, 2),
+                plan_count=len(plans),
+                response_type=assistant_message.type,
+            )
 
-            if plans:
-                session_manager.add_plans(session.session_id, plans)
+            return ChatResponse(
+                session_id=session.session_id,
+                messages=[assistant_message],
+                plans=plans,
+            )
 
-                logger.info(
-                    "plans_from_agent",
-                    session_id=session.session_id,
-                    plan_count=len(plans),
-                )
 
-                for plan in plans:
-                    logger.debug(
-                        "plan_detail",
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Server-Sent Events 形式の1イベントを組み立てる"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@router.post("/stream")
+async def stream_message(request: ChatRequest, http_request: Request) -> StreamingResponse:
+    """チャットメッセージを送信（Server-Sent Events でストリーミング）
+
+    イベント種別:
+    - session: セッションID（最初に即時送信）
+    - token / tool_start / tool_end / plans: エージェントの途中経過
+    - done: 最終レスポンス（ChatResponse と同じ形式）
+    - error: 処理失敗
+
+    デッドラインを超えた場合は途中までの結果で done を送る。
+    クライアントが切断した場合はエージェントの処理を中断する。
+    同じセッション・同じメッセージのリクエストが処理中の場合は、その結果で session と done のみを送る。
+    同じセッションの別のメッセージは到着順に処理し、待ちきれない場合は error を送る。
+    """
+    logger.info(
+        "chat_stream_request_received",
+        user_id=request.user_id,
+        session_id=request.session_id,
+        message_length=len(request.message),
+        message_preview=request.message[:100] + "..." if len(request.message) > 100 else request.message,
+    )
+
+    flight_key = build_flight_key(request.session_id, request.user_id, request.message)
+    inflight = single_flight.join(flight_key)
+    if inflight is not None:
+        return _sse_response(_coalesced_event_stream(inflight))
+    # join との間に await を挟まずに登録し、同時に届いた重複リクエストの先行を1件にする。
+    # ストリームが始まらずに終わった場合も background の _settle_flight で決着させる
+    flight = single_flight.lead(flight_key)
+
+    try:
+        session = session_manager.get_or_create_session(
+            request.session_id,
+            request.user_id,
+        )
+    except Exception as e:
+        _settle_flight(flight, e)
+        raise
+
+    async def event_stream() -> AsyncIterator[str]:
+        start_time = time.time()
+
+        # TTFB を最小化するため、エージェント起動前にセッションIDを送る
+        yield _format_sse("session", {"session_id": session.session_id})
+
+        llmobs_root_ctx = (
+            LLMObs.workflow(name="chat_request", session_id=session.session_id)
+            if LLMObs
+            else nullcontext()
+        )
+        deadline = Deadline(resolve_deadline_seconds("stream", request.company_name))
+        try:
+            # 同じセッションのメッセージは到着順に1件ずつ処理する
+            async with session_manager.session_turn(session.session_id, timeout=deadline.remaining()):
+                with llmobs_root_ctx:
+                    user_message = Message(
+                        role="user",
+                        type="text",
+                        content=request.message,
+                    )
+                    session_manager.update_session(
+                        session.session_id,
+                        add_message=user_message,
+                    )
+
+                    result: Dict[str, Any] = {}
+                    agent = get_agent()
+                    async for event in agent.stream_message(
+                        user_message=request.message,
+                        session_data=session,
+                        company_name=request.company_name,
+                        deadline=deadline,
+                    ):
+                        if event["event"] == "result":
+                            result = event["data"]
+                            continue
+                        yield _format_sse(event["event"], event["data"])
+
+                    assistant_message, plans = _persist_agent_result(session.session_id, result)
+
+                    response = ChatResponse(
                         session_id=session.session_id,
-                        plan_id=getattr(plan, 'plan_id', None) or getattr(plan, 'id', 'unknown'),
-                        label=getattr(plan, 'label', None) or getattr(plan, 'name', 'unknown'),
-                        destination=plan.summary.destination,
-                        estimated_total=plan.summary.estimated_total,
-                        policy_status=plan.summary.policy_status,
+                        messages=[assistant_message],
+                        plans=plans,
                     )
 
-            # アシスタントメッセージを追加
-            assistant_message = Message(
-                role="assistant",
-                type="plan_cards" if plans else "text",
-                content=result.get("response", ""),
-            )
-            session_manager.update_session(
-                session.session_id,
-                add_message=assistant_message,
-            )
+                    total_duration = time.time() - start_time
+                    logger.info(
+                        "chat_stream_response_sent",
+                        session_id=session.session_id,
+                        total_duration_ms=round(total_duration * 1000, 2),
+                        plan_count=len(plans),
+                        response_type=assistant_message.type,
+                    )
 
-            logger.debug(
-                "assistant_message_added",
+                    if flight is not None:
+                        flight.set_result(response)
+                    yield _format_sse("done", response.model_dump())
+
+        except asyncio.CancelledError:
+            # クライアントの切断は StreamingResponse が検知してこのジェネレータをキャンセルする
+            # （取り消しは Starlette のキャンセルスコープに任せ、ここでは握りつぶさない）
+            logger.info(
+                "chat_stream_client_disconnected",
                 session_id=session.session_id,
-                message_type=assistant_message.type,
-                has_plans=len(plans) > 0,
+                duration_ms=round((time.time() - start_time) * 1000, 2),
             )
+            raise
 
-            total_duration = time.time() - start_time
-            logger.info(
-                "chat_response_sent",
+        except SessionBusyError as e:
+            logger.warning(
+                "chat_stream_session_busy",
                 session_id=session.session_id,
-                total_duration_ms=round(total_duration * 1000, 2),
-                plan_count=len(plans),
-                response_type=assistant_message.type,
+                reason=e.reason,
             )
+            if flight is not None:
+                flight.set_exception(e)
+            yield _format_sse("error", {"detail": str(e), "reason": e.reason})
 
-            return ChatResponse(
+        except Exception as e:
+            logger.error(
+                "chat_stream_processing_error",
+                user_id=request.user_id,
                 session_id=session.session_id,
-                messages=[assistant_message],
-                plans=plans,
+                error=str(e),
+                error_type=type(e).__name__,
             )
-        
+            yield _format_sse("error", {"detail": str(e)})
+
+        finally:
+            _settle_flight(flight)
+
+    return _sse_response(event_stream(), background=BackgroundTask(_settle_flight, flight))
+
+
+def _settle_flight(flight: Optional["asyncio.Future"], error: Optional[Exception] = None) -> None:
+    """先行リクエストが結果を設定せずに終わった場合、待っている重複リクエストをエラーで終わらせる"""
+    if flight is not None and not flight.done():
+        flight.set_exception(error or RuntimeError("先行リクエストが完了しませんでした"))
+
+
+async def _coalesced_event_stream(inflight: "asyncio.Future") -> AsyncIterator[str]:
+    """処理中の同一リクエストの結果を待ち、session と done だけを送る"""
+    try:
+        # 重複側が切断しても先行リクエストの処理は止めない
+        response: ChatResponse = await asyncio.shield(inflight)
     except Exception as e:
-        logger.error(
-            "chat_processing_error",
-            user_id=request.user_id,
-            session_id=request.session_id,
-            error=str(e),
-            error_type=type(e).__name__,
+        yield _format_sse("error", {"detail": str(e)})
+        return
+    except asyncio.CancelledError:
+        if not inflight.cancelled():
+            raise
+        yield _format_sse("error", {"detail": "先行リクエストが中断されました"})
+        return
+
+    yield _format_sse("session", {"session_id": response.session_id})
+    yield _format_sse("done", response.model_dump())
+
+
+def _sse_response(stream: AsyncIterator[str], background: Optional[BackgroundTask] = None) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        background=background,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx 等のリバースプロキシでバッファリングさせない
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.post("/batch")
+async def batch_messages(request: BatchChatRequest) -> StreamingResponse:
+    """複数の会話をまとめて実行（評価・一括プランニング用）
+
+    会話ごとに新しいセッションを作り、メッセージを順番に送る。会話同士はセマフォで
+    同時実行数を制限して並行に実行し、終わった会話から NDJSON で1行ずつ返す。
+    最後の行はスループットとレイテンシのパーセンタイル（type=summary）。
+    バッチのセッションは会話が終わったら削除する（結果の session_id は突き合わせ用）。
+    """
+    if len(request.conversations) > settings.batch_max_conversations:
+        raise HTTPException(
+            status_code=413,
+            detail=f"conversations は {settings.batch_max_conversations} 件までです",
         )
-        raise HTTPException(status_code=500, detail=str(e))
+    turn_count = sum(len(c.messages) for c in request.conversations)
+    if turn_count > settings.batch_max_turns:
+        raise HTTPException(
+            status_code=413,
+            detail=f"メッセージは合計 {settings.batch_max_turns} 件までです",
+        )
+    concurrency = min(request.concurrency or settings.batch_concurrency, settings.batch_max_concurrency)
+
+    logger.info(
+        "chat_batch_received",
+        conversation_count=len(request.conversations),
+        turn_count=turn_count,
+        concurrency=concurrency,
+    )
+
+    async def ndjson_stream() -> AsyncIterator[str]:
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [
+            asyncio.ensure_future(_run_batch_conversation(
+                conversation.conversation_id or str(index), conversation, semaphore
+            ))
+            for index, conversation in enumerate(request.conversations)
+        ]
+        turn_latencies: List[float] = []
+        conversation_latencies: List[float] = []
+        error_count = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                conversation_latencies.append(result["latency_ms"])
+                turn_latencies.extend(turn["latency_ms"] for turn in result["turns"])
+                error_count += sum(1 for turn in result["turns"] if "error" in turn)
+                yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+        finally:
+            # クライアントが切断した場合は残りの会話を中断する
+            for task in tasks:
+                task.cancel()
+
+        elapsed = time.time() - start_time
+        summary = {
+            "type": "summary",
+            "conversations": len(tasks),
+            "turns": len(turn_latencies),
+            "errors": error_count,
+            "concurrency": concurrency,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": {
+                "conversations_per_second": round(len(tasks) / elapsed, 3) if elapsed else None,
+                "turns_per_second": round(len(turn_latencies) / elapsed, 3) if elapsed else None,
+            },
+            "turn_latency_ms": _latency_percentiles(turn_latencies),
+            "conversation_latency_ms": _latency_percentiles(conversation_latencies),
+        }
+        logger.info("chat_batch_complete", **{k: v for k, v in summary.items() if k != "type"})
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+async def _run_batch_conversation(
+    conversation_id: str,
+    conversation: BatchConversation,
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """バッチの会話1件を実行（エラーはターン単位で記録し、会話は打ち切る）
+
+    セッションは先に作り、終わったら（中断されても）削除する。
+    """
+    async with semaphore:
+        start_time = time.time()
+        session_id = session_manager.create_session(conversation.user_id).session_id
+        turns: List[Dict[str, Any]] = []
+
+        try:
+            for message in conversation.messages:
+                turn_start = time.time()
+                turn: Dict[str, Any] = {"message": message}
+                try:
+                    response = await _process_chat_request(
+                        ChatRequest(
+                            session_id=session_id,
+                            message=message,
+                            user_id=conversation.user_id,
+                            company_name=conversation.company_name,
+                        ),
+                        turn_start,
+                    )
+                    turn["response"] = response.messages[0].content
+                    turn["plans"] = [plan.model_dump() for plan in response.plans]
+                except Exception as e:
+                    turn["error"] = f"{type(e).__name__}: {e}"
+                turn["latency_ms"] = round((time.time() - turn_start) * 1000, 2)
+                turns.append(turn)
+                if "error" in turn:
+                    break
+        finally:
+            session_manager.delete_session(session_id)
+            usage_meter.forget_session(session_id)
+
+        return {
+            "type": "conversation",
+            "conversation_id": conversation_id,
+            "session_id": session_id,
+            "turns": turns,
+            "latency_ms": round((time.time() - start_time) * 1000, 2),
+        }
+
+
+def _latency_percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """レイテンシのパーセンタイル（nearest-rank）"""
+    if not latencies:
+        return {"p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(latencies)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {"p50": rank(50), "p90": rank(90), "p95": rank(95), "p99": rank(99), "max": ordered[-1]}
 
 
 @router.get("/session/{session_id}")
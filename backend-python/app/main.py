@@ -1,4 +1,5 @@
 """営業出張サポートAI - メインアプリケーション"""
+import asyncio
 import os
 import time
 import uuid
@@ -9,11 +10,17 @@ load_dotenv()  # .env ファイルを最初にロード
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 import structlog
 
 from app.config import get_settings
 from app.logging_config import setup_logging, get_logger
-from app.api.routes import chat_router, plan_router
+from app.api.routes import admin_router, chat_router, plan_router
+from app.api.routes.chat import get_agent
+from app.services.http_client import close_openai_http_client, warm_up_openai_connection
+from app.services.llm_cache import set_cache_bypass
+from app.services.metrics import REQUEST_LATENCY, render_metrics
+from app.services.usage_meter import usage_meter
 
 settings = get_settings()
 
@@ -41,7 +48,17 @@ async def lifespan(app: FastAPI):
         log_level=settings.log_level,
         openai_model=settings.openai_model,
     )
+
+    # 初回リクエストでエージェント構築・TLS ハンドシェイクが発生しないよう起動時に済ませる
+    get_agent()
+    if settings.openai_warmup_enabled:
+        await warm_up_openai_connection()
+    usage_flusher = asyncio.create_task(usage_meter.run_flusher(settings.usage_flush_interval_seconds))
+
     yield
+
+    usage_flusher.cancel()
+    await close_openai_http_client()
     logger.info("application_shutdown")
 
 
@@ -79,6 +96,7 @@ async def logging_middleware(request: Request, call_next):
         
         # レスポンスログ
         duration_ms = (time.time() - start_time) * 1000
+        _observe_request_latency(request, response.status_code, duration_ms / 1000)
         logger.info(
             "request_completed",
             request_id=request_id,
@@ -92,6 +110,7 @@ async def logging_middleware(request: Request, call_next):
         
     except Exception as e:
         duration_ms = (time.time() - start_time) * 1000
+        _observe_request_latency(request, 500, duration_ms / 1000)
         logger.error(
             "request_failed",
             request_id=request_id,
@@ -104,6 +123,27 @@ async def logging_middleware(request: Request, call_next):
         raise
 
 
+def _observe_request_latency(request: Request, status_code: int, duration_seconds: float) -> None:
+    """リクエストのレイテンシを記録（ラベルはパスではなくルートのテンプレートにして系列数を抑える）"""
+    route = request.scope.get("route")
+    REQUEST_LATENCY.labels(
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(status_code),
+    ).observe(duration_seconds)
+
+
+@app.middleware("http")
+async def llm_cache_bypass_middleware(request: Request, call_next):
+    """X-LLM-Cache: bypass / Cache-Control: no-cache の場合は LLM キャッシュを参照しない"""
+    bypass = (
+        request.headers.get("x-llm-cache", "").lower() == "bypass"
+        or "no-cache" in request.headers.get("cache-control", "").lower()
+    )
+    set_cache_bypass(bypass)
+    return await call_next(request)
+
+
 # CORS設定
 app.add_middleware(
     CORSMiddleware,
@@ -116,6 +156,7 @@ app.add_middleware(
 # ルーター登録
 app.include_router(chat_router)
 app.include_router(plan_router)
+app.include_router(admin_router)
 
 
 @app.get("/")
@@ -136,6 +177,13 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus メトリクス"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,6 +1,8 @@
 from .schemas import (
     ChatRequest,
     ChatResponse,
+    BatchChatRequest,
+    BatchConversation,
     Message,
     TravelPlan,
     PlanConfirmRequest,
@@ -12,6 +14,8 @@ from .database import get_db, Base
 __all__ = [
     "ChatRequest",
     "ChatResponse",
+    "BatchChatRequest",
+    "BatchConversation",
     "Message",
     "TravelPlan",
     "PlanConfirmRequest",
@@ -70,6 +70,20 @@ class ChatResponse(BaseModel):
     plans: List[TravelPlan] = []
 
 
+class BatchConversation(BaseModel):
+    """バッチ実行する会話1件（messages を同じセッションで順番に送る）"""
+    conversation_id: Optional[str] = Field(None, description="結果の突き合わせ用ID（省略時は連番）")
+    messages: List[str] = Field(..., min_length=1)
+    user_id: str = "batch-user"
+    company_name: Optional[str] = Field(None, description="会社名（LLMObsタグ用）")
+
+
+class BatchChatRequest(BaseModel):
+    """バッチチャットリクエスト"""
+    conversations: List[BatchConversation] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1, description="同時に実行する会話数（省略時は設定値、上限あり）")
+
+
 class ApplicationPayload(BaseModel):
     """申請データペイロード"""
     destination: str = Field(..., description="目的地")
@@ -106,6 +120,7 @@ class TravelConditions(BaseModel):
     destination: Optional[str] = Field(None, description="目的地")
     depart_date: Optional[str] = Field(None, description="出発日")
     return_date: Optional[str] = Field(None, description="帰着日")
+    is_day_trip: Optional[bool] = Field(None, description="日帰りかどうか")
     budget: Optional[int] = Field(None, description="予算上限")
     preferred_transportation: Optional[str] = Field(None, description="希望交通手段")
     purpose: Optional[str] = Field(None, description="出張目的")
@@ -119,6 +134,8 @@ class SessionData(BaseModel):
     conditions: TravelConditions = Field(default_factory=TravelConditions)
     plans: List[TravelPlan] = []
     messages: List[Message] = []
+    history_summary: str = Field("", description="古いメッセージのローリング要約")
+    summarized_message_count: int = Field(0, description="要約に畳み込み済みの先頭メッセージ数")
     created_at: str = ""
     updated_at: str = ""
 
@@ -1,4 +1,5 @@
-from .session_manager import SessionManager
-
-__all__ = ["SessionManager"]
+from .session_manager import SessionBusyError, SessionManager
+from .llm_cache import LLMResponseCache, get_llm_response_cache
+from .single_flight import SingleFlight, single_flight
 
+__all__ = ["SessionManager", "SessionBusyError", "LLMResponseCache", "get_llm_response_cache", "SingleFlight", "single_flight"]
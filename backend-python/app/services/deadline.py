@@ -0,0 +1,62 @@
+"""リクエストのデッドライン
+
+エンドポイント・会社ごとに設定した秒数からデッドラインを作り、ContextVar で
+LLM 呼び出し・ツール実行に残り時間を伝える。
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("request_deadline", default=None)
+
+
+class Deadline:
+    """リクエストの締め切り時刻"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """残り秒数（0 未満にはならない）"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def resolve_deadline_seconds(endpoint: str, company_name: Optional[str] = None) -> float:
+    """デッドラインの秒数（会社別 > エンドポイント別 > 既定値 の順に優先）"""
+    if company_name and company_name in settings.company_deadline_map:
+        return settings.company_deadline_map[company_name]
+    return settings.request_deadline_map.get(endpoint, settings.request_deadline_seconds)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining_seconds(default: Optional[float] = None) -> Optional[float]:
+    """現在のデッドラインまでの残り秒数と default の小さい方（デッドラインなしなら default）"""
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    if default is None:
+        return deadline.remaining()
+    return min(default, deadline.remaining())
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[None]:
+    """この中で実行される LLM 呼び出し・ツールにデッドラインを伝える"""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
@@ -0,0 +1,156 @@
+"""LLM の劣化を検知して縮退運転に切り替えるコントローラ
+
+LLM 呼び出しのレイテンシと成否を直近 window_seconds 分だけ保持し、
+p95 レイテンシまたはエラー率がしきい値を超えたら縮退モードにする。
+縮退中の新しいターンは LLM を使わず決定的なプランナー（app.agents.degraded_planner）で応答する。
+
+縮退中は LLM の新しいサンプルが入らないため、probe_interval_seconds ごとに1ターンだけ
+LLM に通して様子を見る（プローブ）。縮退に入った時点でサンプルを捨て、プローブ等で
+recovery_samples 件以上集まってしきい値を下回れば通常モードに戻す。
+
+サンプルはエージェントの主系モデルの実際の呼び出しだけを LLMResilience（app.agents.resilience）から記録する。
+カスケードの分類・履歴の要約などの小さいモデルや、LLM キャッシュのヒットは含めない。
+記録・判定はすべてイベントループ上で await を挟まずに行うため、ロックは持たない。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services import metrics
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+NORMAL = "normal"
+DEGRADED = "degraded"
+
+
+class DegradationController:
+    """直近の LLM のレイテンシ・エラー率による通常/縮退モードの切り替え"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        window_seconds: float = 60.0,
+        min_samples: int = 5,
+        latency_p95_seconds: float = 20.0,
+        error_rate: float = 0.5,
+        probe_interval_seconds: float = 10.0,
+        recovery_samples: int = 3,
+    ):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.latency_p95_seconds = latency_p95_seconds
+        self.error_rate = error_rate
+        self.probe_interval_seconds = probe_interval_seconds
+        self.recovery_samples = recovery_samples
+        self.mode = NORMAL
+        self._samples: Deque[Tuple[float, float, bool]] = deque()  # (記録時刻, レイテンシ秒, 成功)
+        self._degraded_since: Optional[float] = None
+        self._last_probe_at = 0.0
+        metrics.DEGRADED_MODE.set(0)
+
+    @property
+    def degraded(self) -> bool:
+        return self.mode == DEGRADED
+
+    def record(self, latency_seconds: float, error: Optional[BaseException] = None) -> None:
+        """LLM 呼び出し1回の結果を記録する
+
+        キャンセル（デッドライン超過・クライアント切断）はレイテンシのみ数え、エラーには数えない。
+        """
+        if not self.enabled:
+            return
+        ok = error is None or isinstance(error, asyncio.CancelledError)
+        now = time.monotonic()
+        self._samples.append((now, latency_seconds, ok))
+        self._evaluate(now)
+
+    def allow_llm(self) -> bool:
+        """このターンで LLM を使うか（縮退中は probe_interval_seconds ごとに1ターンだけ True）"""
+        if not self.enabled or self.mode == NORMAL:
+            return True
+        now = time.monotonic()
+        if now - self._last_probe_at < self.probe_interval_seconds:
+            return False
+        self._last_probe_at = now
+        metrics.DEGRADATION_PROBES.inc()
+        logger.info("degradation_probe", **self.stats())
+        return True
+
+    def _evaluate(self, now: float) -> None:
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+        count, p95, error_rate = self._window_stats()
+
+        if self.mode == NORMAL:
+            if count < self.min_samples:
+                return
+            if p95 > self.latency_p95_seconds:
+                reason = "latency"
+            elif error_rate > self.error_rate:
+                reason = "error_rate"
+            else:
+                return
+            self._transition(DEGRADED, reason, now)
+            # 縮退前のサンプルで復帰の判定をしないよう捨てる
+            self._samples.clear()
+        elif (
+            count >= self.recovery_samples
+            and p95 <= self.latency_p95_seconds
+            and error_rate <= self.error_rate
+        ):
+            self._transition(NORMAL, "recovered", now)
+
+    def _window_stats(self) -> Tuple[int, float, float]:
+        """(サンプル数, p95 レイテンシ秒, エラー率)"""
+        count = len(self._samples)
+        if count == 0:
+            return 0, 0.0, 0.0
+        latencies = sorted(latency for _, latency, _ in self._samples)
+        p95 = latencies[min(count - 1, int(count * 0.95))]
+        errors = sum(1 for _, _, ok in self._samples if not ok)
+        return count, p95, errors / count
+
+    def _transition(self, mode: str, reason: str, now: float) -> None:
+        count, p95, error_rate = self._window_stats()
+        degraded_seconds = now - self._degraded_since if self._degraded_since is not None else None
+        self.mode = mode
+        self._degraded_since = now if mode == DEGRADED else None
+        self._last_probe_at = now
+        metrics.DEGRADED_MODE.set(1 if mode == DEGRADED else 0)
+        metrics.DEGRADATION_TRANSITIONS.labels(mode=mode, reason=reason).inc()
+        logger.warning(
+            "degradation_mode_changed",
+            mode=mode,
+            reason=reason,
+            samples=count,
+            latency_p95_seconds=round(p95, 3),
+            error_rate=round(error_rate, 4),
+            degraded_seconds=round(degraded_seconds, 1) if degraded_seconds is not None else None,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """状態のスナップショット"""
+        count, p95, error_rate = self._window_stats()
+        return {
+            "mode": self.mode,
+            "samples": count,
+            "latency_p95_seconds": round(p95, 3),
+            "error_rate": round(error_rate, 4),
+        }
+
+
+degradation_controller = DegradationController(
+    enabled=settings.degradation_enabled,
+    window_seconds=settings.degradation_window_seconds,
+    min_samples=settings.degradation_min_samples,
+    latency_p95_seconds=settings.degradation_latency_p95_seconds,
+    error_rate=settings.degradation_error_rate,
+    probe_interval_seconds=settings.degradation_probe_interval_seconds,
+    recovery_samples=settings.degradation_recovery_samples,
+)
@@ -0,0 +1,89 @@
+"""OpenAI 呼び出し用の共有 HTTP クライアント
+
+全リクエストで1つの httpx.AsyncClient を使い回し、TLS ハンドシェイクを接続プールの
+keep-alive で償却する。HTTP/2 は h2 パッケージがある場合のみ有効（なければ HTTP/1.1）。
+応答ヘッダのレート制限はレスポンスフックでガバナー（app.services.rate_governor）に渡す。
+"""
+import time
+from typing import Optional
+
+import httpx
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services.rate_governor import rate_governor
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_openai_http_client() -> httpx.AsyncClient:
+    """共有クライアントを取得（初回呼び出し時に作成）"""
+    global _client
+    if _client is None:
+        http2 = settings.openai_http2 and _http2_available()
+        if settings.openai_http2 and not http2:
+            logger.warning("openai_http2_unavailable", message="h2 is not installed; using HTTP/1.1")
+
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections,
+                keepalive_expiry=settings.openai_keepalive_expiry_seconds,
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout_seconds, connect=settings.openai_connect_timeout_seconds),
+            event_hooks={"response": [rate_governor.observe_response]},
+        )
+        logger.info(
+            "openai_http_client_created",
+            http2=http2,
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+        )
+    return _client
+
+
+async def warm_up_openai_connection() -> None:
+    """OpenAI への接続を事前に確立する（トークンを消費しない GET /models）"""
+    start_time = time.time()
+    client = get_openai_http_client()
+    try:
+        response = await client.get(
+            f"{OPENAI_BASE_URL}/models",
+            headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+        )
+        logger.info(
+            "openai_warmup_complete",
+            status_code=response.status_code,
+            http_version=response.http_version,
+            duration_ms=round((time.time() - start_time) * 1000, 2),
+        )
+    except httpx.HTTPError as e:
+        # ウォームアップの失敗で起動を止めない
+        logger.warning(
+            "openai_warmup_failed",
+            error=str(e),
+            error_type=type(e).__name__,
+            duration_ms=round((time.time() - start_time) * 1000, 2),
+        )
+
+
+async def close_openai_http_client() -> None:
+    """共有クライアントを閉じる（シャットダウン時）"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
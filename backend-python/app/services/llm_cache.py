@@ -0,0 +1,368 @@
+"""LLM レスポンスキャッシュ
+
+LangChain の BaseCache として ChatOpenAI に組み込み、同一プロンプトへの再問い合わせを省略する。
+
+- バックエンド: メモリ（LRU）とローカル SQLite。両方指定すると2階層で動作
+- 追い出し: TTL とエントリ数上限
+- キー:
+  - 完全一致キー: LangChain が渡すプロンプト文字列と llm_string のハッシュ
+  - 正規化キー: モデル名・ツール定義のハッシュ・正規化したメッセージ・temperature
+    （空白・全角半角の揺れ、プランID等の UUID、tool_call ID の違いを吸収）
+- リクエスト単位のバイパス: X-LLM-Cache: bypass または Cache-Control: no-cache
+
+キャッシュから返した generation には generation_info[CACHE_HIT_KEY] を付ける
+（保存時の usage_metadata がそのまま再生されるため、コールバックで新規の消費と区別する）。
+"""
+import ast
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services import metrics
+
+logger = get_logger(__name__)
+
+# リクエスト単位のバイパスフラグ（ミドルウェアで設定）
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+_UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+_TOOL_CALL_ID_PATTERN = re.compile(r"call_[A-Za-z0-9]+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+CACHE_HIT_KEY = "llm_cache_hit"
+
+
+def set_cache_bypass(bypass: bool) -> None:
+    """現在のリクエストでキャッシュの参照を行わないようにする"""
+    _bypass.set(bypass)
+
+
+def is_cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+# =============================================================================
+# バックエンド
+# =============================================================================
+
+class CacheBackend:
+    """キャッシュバックエンドのインターフェース"""
+
+    name: str = "backend"
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryLRUBackend(CacheBackend):
+    """インメモリ LRU（TTL 付き）"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend(CacheBackend):
+    """ローカル SQLite（TTL 付き、最終アクセスが古い順に追い出し）"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # 期限切れを削除し、上限を超えた分は最終アクセスが古い順に追い出す
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+# =============================================================================
+# キャッシュキー
+# =============================================================================
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    text = _UUID_PATTERN.sub("<uuid>", text)
+    text = _TOOL_CALL_ID_PATTERN.sub("<call>", text)
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def _normalize_messages(prompt: str) -> List[Dict[str, Any]]:
+    """LangChain がシリアライズしたメッセージ列から、応答に影響する部分だけを取り出す"""
+    normalized = []
+    for message in json.loads(prompt):
+        kwargs = message.get("kwargs", {})
+        content = kwargs.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, sort_keys=True)
+        tool_calls = [
+            {
+                "name": call.get("function", {}).get("name"),
+                "arguments": _normalize_text(call.get("function", {}).get("arguments", "")),
+            }
+            for call in kwargs.get("additional_kwargs", {}).get("tool_calls", [])
+        ]
+        normalized.append({
+            "role": message.get("id", [""])[-1],
+            "content": _normalize_text(content),
+            "tool_calls": tool_calls,
+        })
+    return normalized
+
+
+def build_cache_keys(prompt: str, llm_string: str) -> List[tuple]:
+    """(キー種別, キー) のリストを返す。正規化キーはパースできた場合のみ"""
+    keys = [("exact", "exact:" + _hash(llm_string + "\x00" + prompt))]
+
+    try:
+        serialized, _, param_string = llm_string.partition("---")
+        model_kwargs = json.loads(serialized).get("kwargs", {})
+        params = dict(ast.literal_eval(param_string)) if param_string else {}
+        tools = params.pop("tools", None)
+        components = {
+            "model": model_kwargs.get("model_name") or model_kwargs.get("model"),
+            "temperature": model_kwargs.get("temperature"),
+            "tools": _hash(json.dumps(tools, ensure_ascii=False, sort_keys=True)) if tools else None,
+            "params": _hash(repr(sorted(params.items()))),
+            "messages": _normalize_messages(prompt),
+        }
+    except (ValueError, SyntaxError, TypeError, AttributeError):
+        return keys
+
+    keys.append(("normalized", "normalized:" + _hash(json.dumps(components, ensure_ascii=False, sort_keys=True))))
+    return keys
+
+
+# =============================================================================
+# LangChain キャッシュ
+# =============================================================================
+
+class LLMResponseCache(BaseCache):
+    """複数バックエンドを上位から順に参照する LLM レスポンスキャッシュ"""
+
+    def __init__(self, backends: Sequence[CacheBackend]):
+        self.backends = list(backends)
+        self.hits: Dict[str, int] = {backend.name: 0 for backend in self.backends}
+        self.normalized_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.writes = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if is_cache_bypassed():
+            self.bypasses += 1
+            metrics.LLM_CACHE_LOOKUPS.labels(result="bypass", backend="").inc()
+            return None
+
+        keys = build_cache_keys(prompt, llm_string)
+        for tier, backend in enumerate(self.backends):
+            for kind, key in keys:
+                value = backend.get(key)
+                if value is None:
+                    continue
+
+                # 上位の階層に昇格
+                for upper in self.backends[:tier]:
+                    for _, k in keys:
+                        upper.set(k, value)
+
+                self.hits[backend.name] += 1
+                metrics.LLM_CACHE_LOOKUPS.labels(result="hit", backend=backend.name).inc()
+                if kind == "normalized":
+                    self.normalized_hits += 1
+                logger.debug("llm_cache_hit", backend=backend.name, key_kind=kind, **self.counters())
+                generations = loads(value)
+                for generation in generations:
+                    generation.generation_info = {**(generation.generation_info or {}), CACHE_HIT_KEY: True}
+                return generations
+
+        self.misses += 1
+        metrics.LLM_CACHE_LOOKUPS.labels(result="miss", backend="").inc()
+        logger.debug("llm_cache_miss", **self.counters())
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = dumps(list(return_val))
+        for backend in self.backends:
+            for _, key in build_cache_keys(prompt, llm_string):
+                backend.set(key, value)
+        self.writes += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        for backend in self.backends:
+            backend.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = sum(self.hits.values()) + self.misses
+        return sum(self.hits.values()) / total if total else 0.0
+
+    def counters(self) -> Dict[str, Any]:
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """カウンタのスナップショット"""
+        return {
+            **self.counters(),
+            "hits_by_backend": dict(self.hits),
+            "normalized_hits": self.normalized_hits,
+            "bypasses": self.bypasses,
+            "writes": self.writes,
+            "entries": {backend.name: len(backend) for backend in self.backends},
+            "evictions": {backend.name: backend.evictions for backend in self.backends},
+        }
+
+
+@lru_cache()
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """設定に応じたキャッシュのシングルトンを取得（無効の場合は None）"""
+    settings = get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+
+    names = [name.strip() for name in settings.llm_cache_backends.split(",") if name.strip()]
+    backends: List[CacheBackend] = []
+    for name in names:
+        if name == "memory":
+            backends.append(MemoryLRUBackend(
+                max_entries=settings.llm_cache_memory_max_entries,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+            ))
+        elif name == "sqlite":
+            backends.append(SQLiteBackend(
+                path=settings.llm_cache_sqlite_path,
+                max_entries=settings.llm_cache_sqlite_max_entries,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+            ))
+        else:
+            raise ValueError(f"Unknown LLM cache backend: {name}")
+
+    logger.info(
+        "llm_cache_initialized",
+        backends=names,
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+    )
+    return LLMResponseCache(backends)
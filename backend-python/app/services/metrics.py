@@ -0,0 +1,256 @@
+"""Prometheus メトリクス
+
+/metrics（app.main）で公開する。LLM 呼び出し・ツール・エージェント実行の値は
+app.agents.callbacks.MetricsCallbackHandler が記録し、それ以外（キャッシュ・投機実行・
+セッションの実行待ち等）は各モジュールが直接記録する。
+DD_LLMOBS_ENABLED が無効でもレイテンシのパーセンタイルを見られるようにするためのもの。
+"""
+from typing import Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+NAMESPACE = "sales_support"
+
+# レイテンシ（秒）。LLM の応答は数秒〜数十秒かかるため上側を厚くする
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 45.0, 60.0, 90.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP リクエストのレイテンシ（ストリーミングはレスポンス開始まで）",
+    ["method", "route", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+AGENT_RUN_LATENCY = Histogram(
+    "agent_run_duration_seconds",
+    "AgentExecutor 1回の実行時間",
+    ["status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations",
+    "AgentExecutor 1回の実行あたりの LLM 呼び出し回数",
+    namespace=NAMESPACE,
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+
+LLM_CALL_LATENCY = Histogram(
+    "llm_call_duration_seconds",
+    "LLM 呼び出し1回のレイテンシ",
+    ["model", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "LLM 呼び出し1回の入力トークン数",
+    ["model"],
+    namespace=NAMESPACE,
+    buckets=TOKEN_BUCKETS,
+)
+
+LLM_COMPLETION_TOKENS = Histogram(
+    "llm_completion_tokens",
+    "LLM 呼び出し1回の出力トークン数",
+    ["model"],
+    namespace=NAMESPACE,
+    buckets=TOKEN_BUCKETS,
+)
+
+LLM_CACHED_PROMPT_TOKENS = Histogram(
+    "llm_cached_prompt_tokens",
+    "LLM 呼び出し1回の入力のうちプロンプトキャッシュに当たったトークン数（ヒット率は llm_prompt_tokens の sum との比）",
+    ["model"],
+    namespace=NAMESPACE,
+    buckets=TOKEN_BUCKETS,
+)
+
+LLM_COST_USD = Counter(
+    "llm_cost_usd",
+    "LLM 呼び出しのコスト（USD、model_prices から計算）",
+    ["model"],
+    namespace=NAMESPACE,
+)
+
+LLM_CACHE_LOOKUPS = Counter(
+    "llm_cache_lookups",
+    "LLM レスポンスキャッシュの参照回数（result: hit / miss / bypass、backend: ヒットした階層）",
+    ["result", "backend"],
+    namespace=NAMESPACE,
+)
+
+TOOL_LATENCY = Histogram(
+    "tool_duration_seconds",
+    "ツール実行1回のレイテンシ",
+    ["tool", "status"],
+    namespace=NAMESPACE,
+    buckets=LATENCY_BUCKETS,
+)
+
+SEARCH_MEMO_LOOKUPS = Counter(
+    "search_memo_lookups",
+    "検索ツールのメモ化の参照回数（result: run_hit / global_hit / miss）",
+    ["tool", "result"],
+    namespace=NAMESPACE,
+)
+
+PLAN_SPECULATIONS = Counter(
+    "plan_speculations",
+    "plan_generator の投機実行（outcome: started / hit / mismatch / wasted / failed）",
+    ["outcome"],
+    namespace=NAMESPACE,
+)
+
+DEGRADED_MODE = Gauge(
+    "degraded_mode",
+    "縮退運転中なら 1（LLM を使わず決定的なプランナーで応答）",
+    namespace=NAMESPACE,
+)
+
+DEGRADATION_TRANSITIONS = Counter(
+    "degradation_transitions",
+    "通常/縮退モードの切り替え回数（mode: 切り替え後のモード）",
+    ["mode", "reason"],
+    namespace=NAMESPACE,
+)
+
+DEGRADATION_PROBES = Counter(
+    "degradation_probes",
+    "縮退中に復帰の判定のため LLM に通したターン数",
+    namespace=NAMESPACE,
+)
+
+DEGRADED_TURNS = Counter(
+    "degraded_turns",
+    "縮退中に決定的なプランナーで応答したターン数",
+    ["route"],
+    namespace=NAMESPACE,
+)
+
+FAST_PATH_ROUTES = Counter(
+    "fast_path_routes",
+    "ファストパスの判定結果（route: plan / slot_filling / agent。agent 以外がヒット）",
+    ["route"],
+    namespace=NAMESPACE,
+)
+
+CASCADE_ROUTES = Counter(
+    "cascade_routes",
+    "モデルカスケードの振り分け（tier: small / large）",
+    ["tier", "reason"],
+    namespace=NAMESPACE,
+)
+
+LLM_HEDGES = Counter(
+    "llm_hedges",
+    "副系のモデルに送ったヘッジリクエスト数（reason: slow=主系が p95 を超えた / circuit_open=主系のサーキットが開いている）",
+    ["model", "reason"],
+    namespace=NAMESPACE,
+)
+
+LLM_HEDGE_WINS = Counter(
+    "llm_hedge_wins",
+    "ヘッジを送った呼び出しで先に応答した側（winner: primary / hedge）",
+    ["winner"],
+    namespace=NAMESPACE,
+)
+
+LLM_HEDGE_DELAY = Gauge(
+    "llm_hedge_delay_seconds",
+    "ヘッジを送るまでの待ち時間（主系の直近の p95 レイテンシ）",
+    ["model"],
+    namespace=NAMESPACE,
+)
+
+LLM_RETRIES = Counter(
+    "llm_retries",
+    "429・5xx・接続エラーによる LLM 呼び出しのリトライ回数",
+    ["model", "error"],
+    namespace=NAMESPACE,
+)
+
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "LLM のサーキットブレーカーが開いていれば 1",
+    ["model"],
+    namespace=NAMESPACE,
+)
+
+LLM_CIRCUIT_TRANSITIONS = Counter(
+    "llm_circuit_transitions",
+    "LLM のサーキットブレーカーの状態遷移回数（state: 遷移後の状態）",
+    ["model", "state"],
+    namespace=NAMESPACE,
+)
+
+LLM_GOVERNOR_WAIT = Histogram(
+    "llm_governor_wait_seconds",
+    "レート制限のガバナーで LLM 呼び出しが送信まで待った時間",
+    ["model"],
+    namespace=NAMESPACE,
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+
+LLM_GOVERNOR_QUEUED = Gauge(
+    "llm_governor_queued",
+    "レート制限のガバナーで送信を待っている LLM 呼び出しの数",
+    ["model"],
+    namespace=NAMESPACE,
+)
+
+LLM_RATE_LIMIT = Gauge(
+    "llm_rate_limit",
+    "ガバナーが使っている1分あたりの上限（kind: requests / tokens。応答ヘッダから学習）",
+    ["model", "kind"],
+    namespace=NAMESPACE,
+)
+
+AGENT_RUNS_IN_FLIGHT = Gauge(
+    "agent_runs_in_flight",
+    "実行中の AgentExecutor の数",
+    namespace=NAMESPACE,
+)
+
+STORED_SESSIONS = Gauge(
+    "stored_sessions",
+    "保持しているセッション数（削除されるまで減らない）",
+    namespace=NAMESPACE,
+)
+
+ACTIVE_SESSIONS = Gauge(
+    "active_sessions",
+    "直近 active_session_window_seconds 以内に作成・更新されたセッション数",
+    namespace=NAMESPACE,
+)
+
+SESSION_QUEUE = Gauge(
+    "session_queue",
+    "同一セッションの実行待ち（kind: busy_sessions / queued_turns / max_depth）",
+    ["kind"],
+    namespace=NAMESPACE,
+)
+
+SESSION_TURNS = Counter(
+    "session_turns",
+    "同一セッションの実行待ちの結果（outcome: acquired / rejected / timeout）",
+    ["outcome"],
+    namespace=NAMESPACE,
+)
+
+SESSION_TURN_WAIT = Histogram(
+    "session_turn_wait_seconds",
+    "同じセッションの前のメッセージの処理を待った時間（outcome: acquired / timeout）",
+    ["outcome"],
+    namespace=NAMESPACE,
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0),
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus のテキスト形式で出力（本文, Content-Type）"""
+    return generate_latest(), CONTENT_TYPE_LATEST
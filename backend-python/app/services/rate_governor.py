@@ -0,0 +1,217 @@
+"""OpenAI のレート制限（RPM・TPM）に合わせて LLM 呼び出しを待たせるガバナー
+
+プロバイダの上限を超えると同時に走っているエージェント実行がまとめて 429 で失敗するため、
+送信前にクライアント側で流量を整える。モデルごとにリクエスト数・トークン数の
+トークンバケット（1分あたりの上限を容量とし、連続的に補充）を持ち、
+足りない呼び出しは FIFO の待ち行列で順番に待たせる（拒否はしない）。
+先頭が大きな呼び出しでも後続に追い越されないため、大きなプロンプトが飢餓にならない。
+
+- トークン数は送信前に文字数から見積もり、max_tokens（未指定なら既定値）を足す
+- 上限は応答ヘッダ（x-ratelimit-limit-*）から学習し、残量（x-ratelimit-remaining-*）が
+  見積もりより少なければ合わせる。残量 0 のときはリセットまで（x-ratelimit-reset-*）送らない
+- 学習前は llm_governor_default_rpm / llm_governor_default_tpm を使う
+
+待ち時間は llm_governor_wait_seconds で公開する。
+ヘッダは共有の HTTP クライアント（app.services.http_client）のレスポンスフックで受け取る。
+"""
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import httpx
+
+from app.config import get_settings
+from app.logging_config import get_logger
+from app.services import metrics
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """x-ratelimit-reset-* の値（"120ms", "2s", "1m30s" 等）を秒にする"""
+    if not value:
+        return None
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+class _Bucket:
+    """1分あたりの上限を容量とし、連続的に補充するトークンバケット"""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.level = limit
+        self.blocked_until = 0.0
+        self._updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.limit, self.level + (now - self._updated_at) * self.limit / 60.0)
+        self._updated_at = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """amount を取れるまでの秒数（0 なら今すぐ取れる）"""
+        blocked = max(0.0, self.blocked_until - now)
+        deficit = min(amount, self.limit) - self.level
+        return max(blocked, deficit * 60.0 / self.limit if deficit > 0 else 0.0)
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.limit)
+
+    def learn(self, limit: Optional[float], remaining: Optional[float], reset: Optional[float], now: float) -> bool:
+        """応答ヘッダの値を反映する（上限が変わったら True）"""
+        self.refill(now)
+        changed = limit is not None and limit > 0 and limit != self.limit
+        if changed:
+            # 上限が変わった分だけ残量もずらす（学習前の既定値で詰まらないように）
+            self.level = max(0.0, min(limit, self.level + limit - self.limit))
+            self.limit = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+            if remaining <= 0 and reset:
+                self.blocked_until = max(self.blocked_until, now + reset)
+        return changed
+
+
+class _ModelGovernor:
+    """1モデル分のバケットと待ち行列"""
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self._waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+        self._pump: Optional[asyncio.Task] = None
+        metrics.LLM_RATE_LIMIT.labels(model=model, kind="requests").set(rpm)
+        metrics.LLM_RATE_LIMIT.labels(model=model, kind="tokens").set(tpm)
+
+    def _try_take(self, tokens: float) -> float:
+        """取れたら 0、取れなければ待つべき秒数"""
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_for(1, now), self.tokens.wait_for(tokens, now))
+        if wait <= 0:
+            self.requests.take(1)
+            self.tokens.take(tokens)
+        return wait
+
+    async def acquire(self, tokens: float) -> None:
+        if not self._waiters and self._try_take(tokens) <= 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((tokens, future))
+        metrics.LLM_GOVERNOR_QUEUED.labels(model=self.model).inc()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.ensure_future(self._run())
+        try:
+            await future
+        finally:
+            metrics.LLM_GOVERNOR_QUEUED.labels(model=self.model).dec()
+
+    async def _run(self) -> None:
+        """待ち行列の先頭から順に、取れるまで待って通す"""
+        while self._waiters:
+            tokens, future = self._waiters[0]
+            if future.done():  # 待っている側がキャンセルされた
+                self._waiters.popleft()
+                continue
+            wait = self._try_take(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self._waiters.popleft()
+            future.set_result(None)
+
+
+class RateGovernor:
+    """モデルごとの RPM・TPM ガバナー"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        default_rpm: int = 500,
+        default_tpm: int = 30000,
+        chars_per_token: float = 2.0,
+        completion_tokens: int = 500,
+    ):
+        self.enabled = enabled
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.chars_per_token = chars_per_token
+        self.completion_tokens = completion_tokens
+        self._models: Dict[str, _ModelGovernor] = {}
+
+    def _governor(self, model: str) -> _ModelGovernor:
+        governor = self._models.get(model)
+        if governor is None:
+            governor = self._models[model] = _ModelGovernor(model, self.default_rpm, self.default_tpm)
+        return governor
+
+    def estimate_tokens(self, prompt_chars: int, max_tokens: Optional[int] = None) -> int:
+        """送信前の見積もり（プロンプトの文字数 + 出力の上限）"""
+        return math.ceil(prompt_chars / self.chars_per_token) + (max_tokens or self.completion_tokens)
+
+    async def acquire(self, model: str, tokens: int) -> float:
+        """送信してよくなるまで待つ（待った秒数を返す）"""
+        if not self.enabled:
+            return 0.0
+        start = time.perf_counter()
+        await self._governor(model).acquire(tokens)
+        waited = time.perf_counter() - start
+        metrics.LLM_GOVERNOR_WAIT.labels(model=model).observe(waited)
+        if waited >= 1.0:
+            logger.info("llm_governor_waited", model=model, tokens=tokens, wait_seconds=round(waited, 3))
+        return waited
+
+    def learn(self, model: str, headers: httpx.Headers) -> None:
+        """応答ヘッダから上限・残量を反映する"""
+        governor = self._governor(model)
+        now = time.monotonic()
+        for kind, bucket in (("requests", governor.requests), ("tokens", governor.tokens)):
+            limit = _header_float(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+            if bucket.learn(limit, remaining, reset, now):
+                metrics.LLM_RATE_LIMIT.labels(model=model, kind=kind).set(bucket.limit)
+                logger.info("llm_rate_limit_learned", model=model, kind=kind, limit=bucket.limit)
+
+    async def observe_response(self, response: httpx.Response) -> None:
+        """共有 HTTP クライアントのレスポンスフック（chat completions の応答ヘッダを学習する）"""
+        if not self.enabled or not response.request.url.path.endswith("/chat/completions"):
+            return
+        if "x-ratelimit-limit-requests" not in response.headers and "x-ratelimit-remaining-requests" not in response.headers:
+            return
+        try:
+            model = json.loads(response.request.content)["model"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self.learn(model, response.headers)
+
+
+def _header_float(headers: httpx.Headers, name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+rate_governor = RateGovernor(
+    enabled=settings.llm_governor_enabled,
+    default_rpm=settings.llm_governor_default_rpm,
+    default_tpm=settings.llm_governor_default_tpm,
+    chars_per_token=settings.llm_governor_chars_per_token,
+    completion_tokens=settings.llm_governor_completion_tokens,
+)
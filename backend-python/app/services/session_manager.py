@@ -1,21 +1,131 @@
 """セッション管理サービス"""
+import asyncio
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
+from app.config import get_settings
 from app.models.schemas import SessionData, TravelConditions, TravelPlan, Message
 from app.logging_config import get_logger
+from app.services import metrics
 
 logger = get_logger(__name__)
+settings = get_settings()
+
+
+class SessionBusyError(Exception):
+    """セッションの実行待ちが上限（待ち行列の長さ・待ち時間）を超えた"""
+
+    def __init__(self, session_id: str, reason: str):
+        super().__init__(f"セッション {session_id} は処理中です（{reason}）")
+        self.session_id = session_id
+        self.reason = reason
+
+
+class _SessionQueue:
+    """セッション1件の実行順序（asyncio.Lock は待機順に獲得される）"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0  # 実行中 + 待機中
 
 
 class SessionManager:
-    """インメモリセッション管理（デモ用）"""
+    """インメモリセッション管理（デモ用）
+
+    同じセッションへのメッセージ処理は session_turn() で1件ずつ順番に実行する。
+    別のセッションは並列に実行される。
+    """
     
     def __init__(self):
         self._sessions: Dict[str, SessionData] = {}
+        self._queues: Dict[str, _SessionQueue] = {}
+        self._last_active: Dict[str, float] = {}  # セッションID → 最後に作成・更新した時刻（monotonic）
+        self._queue_counters: Dict[str, int] = {"acquired": 0, "rejected": 0, "timeouts": 0}
+        self._max_queue_depth_seen = 0
         logger.info("session_manager_initialized")
     
+    @asynccontextmanager
+    async def session_turn(self, session_id: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """セッションの処理を順番に実行する（読み込み〜エージェント実行〜書き込みを囲む）
+
+        Args:
+            session_id: セッションID
+            timeout: 待ち時間の上限（リクエストの残り時間。設定値の方が短ければ設定値）
+
+        Raises:
+            SessionBusyError: 待ち行列が上限に達している、または timeout までに順番が来なかった
+        """
+        queue = self._queues.get(session_id)
+        if queue is None:
+            queue = self._queues[session_id] = _SessionQueue()
+
+        if queue.depth >= settings.session_queue_max_depth:
+            self._queue_counters["rejected"] += 1
+            metrics.SESSION_TURNS.labels(outcome="rejected").inc()
+            logger.warning("session_queue_rejected", session_id=session_id, depth=queue.depth, **self.queue_stats())
+            raise SessionBusyError(session_id, "queue_full")
+
+        if timeout is None or timeout > settings.session_queue_timeout_seconds:
+            timeout = settings.session_queue_timeout_seconds
+
+        queue.depth += 1
+        self._max_queue_depth_seen = max(self._max_queue_depth_seen, queue.depth)
+        queued_at = time.perf_counter()
+        try:
+            try:
+                await asyncio.wait_for(queue.lock.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._queue_counters["timeouts"] += 1
+                metrics.SESSION_TURNS.labels(outcome="timeout").inc()
+                metrics.SESSION_TURN_WAIT.labels(outcome="timeout").observe(time.perf_counter() - queued_at)
+                logger.warning(
+                    "session_queue_timeout",
+                    session_id=session_id,
+                    wait_ms=round((time.perf_counter() - queued_at) * 1000, 2),
+                    **self.queue_stats(),
+                )
+                raise SessionBusyError(session_id, "wait_timeout")
+
+            self._queue_counters["acquired"] += 1
+            metrics.SESSION_TURNS.labels(outcome="acquired").inc()
+            metrics.SESSION_TURN_WAIT.labels(outcome="acquired").observe(time.perf_counter() - queued_at)
+            logger.debug(
+                "session_turn_acquired",
+                session_id=session_id,
+                depth=queue.depth,
+                wait_ms=round((time.perf_counter() - queued_at) * 1000, 2),
+            )
+            try:
+                yield
+            finally:
+                queue.lock.release()
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0 and self._queues.get(session_id) is queue:
+                del self._queues[session_id]
+    
+    @property
+    def session_count(self) -> int:
+        return len(self._sessions)
+    
+    def active_session_count(self, window_seconds: float) -> int:
+        """直近 window_seconds 以内に作成・更新したセッション数"""
+        since = time.monotonic() - window_seconds
+        return sum(1 for last_active in self._last_active.values() if last_active >= since)
+    
+    def queue_stats(self) -> Dict[str, Any]:
+        """実行待ちのメトリクス"""
+        return {
+            "busy_sessions": len(self._queues),
+            "queued_turns": sum(max(0, q.depth - 1) for q in self._queues.values()),
+            "max_queue_depth": max((q.depth for q in self._queues.values()), default=0),
+            "max_queue_depth_seen": self._max_queue_depth_seen,
+            **self._queue_counters,
+        }
+    
     def create_session(self, user_id: str) -> SessionData:
         """新規セッションを作成"""
         session_id = str(uuid.uuid4())
@@ -32,6 +142,7 @@ class SessionManager:
         )
         
         self._sessions[session_id] = session
+        self._last_active[session_id] = time.monotonic()
         
         logger.info(
             "session_created",
@@ -117,6 +228,7 @@ class SessionManager:
         
         session.updated_at = datetime.now().isoformat()
         self._sessions[session_id] = session
+        self._last_active[session_id] = time.monotonic()
         
         logger.debug(
             "session_updated",
@@ -141,6 +253,7 @@ class SessionManager:
         session.plans = plans
         session.updated_at = datetime.now().isoformat()
         self._sessions[session_id] = session
+        self._last_active[session_id] = time.monotonic()
         
         logger.info(
             "plans_added",
@@ -185,6 +298,7 @@ class SessionManager:
         """セッションを削除"""
         if session_id in self._sessions:
             del self._sessions[session_id]
+            self._last_active.pop(session_id, None)
             logger.info(
                 "session_deleted",
                 session_id=session_id,
@@ -201,3 +315,11 @@ class SessionManager:
 
 # グローバルインスタンス
 session_manager = SessionManager()
+
+metrics.STORED_SESSIONS.set_function(lambda: session_manager.session_count)
+metrics.ACTIVE_SESSIONS.set_function(
+    lambda: session_manager.active_session_count(settings.active_session_window_seconds)
+)
+metrics.SESSION_QUEUE.labels(kind="busy_sessions").set_function(lambda: session_manager.queue_stats()["busy_sessions"])
+metrics.SESSION_QUEUE.labels(kind="queued_turns").set_function(lambda: session_manager.queue_stats()["queued_turns"])
+metrics.SESSION_QUEUE.labels(kind="max_depth").set_function(lambda: session_manager.queue_stats()["max_queue_depth"])
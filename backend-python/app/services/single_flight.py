@@ -0,0 +1,119 @@
+"""重複リクエストの合流（single-flight）
+
+ダブルクリックやフロントエンドのリトライで、同じセッションに同じメッセージが同時に届くことがある。
+実行中のリクエストを「セッションID + メッセージのハッシュ」で登録し、重複したリクエストは
+新たにエージェントを実行せず、先行リクエストの結果（ChatResponse）を待って同じものを返す。
+
+- do(): 処理をタスクとして実行し、待っている全リクエストが切断したらタスクをキャンセルする
+- lead() / join(): ストリーミング用。先行リクエストが自分で結果を設定し、重複側は結果だけを待つ
+  （先行リクエストの途中経過は流さず、最終結果のみ返す）。join() と lead() は await を挟まずに
+  続けて呼ぶ（同時に届いた重複リクエストの先行を1件にするため）
+"""
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import get_settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def build_flight_key(session_id: Optional[str], user_id: str, message: str) -> str:
+    """合流キー（セッション未作成の最初のメッセージはユーザー単位）"""
+    owner = f"session:{session_id}" if session_id else f"user:{user_id}"
+    digest = hashlib.sha256(message.strip().encode("utf-8")).hexdigest()
+    return f"{owner}:{digest}"
+
+
+class _Flight:
+    """実行中のリクエスト1件"""
+
+    def __init__(self, future: "asyncio.Future", owns_task: bool):
+        self.future = future
+        self.owns_task = owns_task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """実行中リクエストの登録簿と合流回数のカウンタ"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _register(self, key: str, flight: _Flight) -> None:
+        self._inflight[key] = flight
+        self.leaders += 1
+
+        def _unregister(_: "asyncio.Future") -> None:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+        flight.future.add_done_callback(_unregister)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """key の処理が実行中ならその結果を待ち、なければ func() を実行して結果を共有する"""
+        if not self.enabled:
+            return await func()
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()), owns_task=True)
+            # 全員が待つのをやめた場合の例外を未回収のまま残さない
+            flight.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._register(key, flight)
+        else:
+            self._count_coalesced(key)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            # 待っているリクエストがすべて切断したら処理も止める
+            if flight.waiters == 0 and flight.owns_task and not flight.future.done():
+                flight.future.cancel()
+                logger.info("single_flight_abandoned", key=key)
+
+    def join(self, key: str) -> Optional["asyncio.Future"]:
+        """key の処理が実行中なら結果の Future を返す（重複として数える）"""
+        if not self.enabled:
+            return None
+        flight = self._inflight.get(key)
+        if flight is None:
+            return None
+        self._count_coalesced(key)
+        return flight.future
+
+    def lead(self, key: str) -> Optional["asyncio.Future"]:
+        """先行リクエストとして key を登録し、結果を設定する Future を返す
+
+        呼び出し側は set_result() / set_exception() で必ず決着させる（無効時は None）。
+        key が実行中の場合は登録を上書きせず RuntimeError にする（先に join() で確認する）。
+        """
+        if not self.enabled:
+            return None
+        if key in self._inflight:
+            raise RuntimeError(f"single-flight key is already in flight: {key}")
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._register(key, _Flight(future, owns_task=False))
+        return future
+
+    def _count_coalesced(self, key: str) -> None:
+        self.coalesced += 1
+        logger.info("single_flight_coalesced", key=key, **self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        """カウンタのスナップショット"""
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight(enabled=get_settings().single_flight_enabled)
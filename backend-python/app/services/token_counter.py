@@ -0,0 +1,35 @@
+"""テキストのトークン数
+
+会話履歴の予算（app.agents.chat_history）とツール出力の計測（app.agents.tools.tool_output）で共用する。
+tiktoken のエンコーディングを取得できない環境では文字数で概算する。
+"""
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from app.config import get_settings
+from app.logging_config import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+@lru_cache()
+def _get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """tiktoken のエンコーディング（取得できない環境では None）"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # エンコーディングファイルをダウンロードできない環境では文字数で概算する
+        logger.warning("tiktoken_unavailable", model=model, error=str(e))
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    """テキストそのもののトークン数（キャッシュしない。繰り返し数える場合は呼び出し側でキャッシュする）"""
+    encoding = _get_encoding(settings.openai_model)
+    return len(encoding.encode(text)) if encoding else len(text)
@@ -0,0 +1,200 @@
+"""トークン・コストの集計
+
+LLM の応答ごとに入力・出力トークン数を記録し、モデルの価格表（USD / 100万トークン）から
+コストを計算する。セッション・ユーザー・会社・モデル別にメモリ上で集計し、
+前回からの差分を定期的にログ（と JSON Lines ファイル）に書き出す。
+
+誰の利用かはエージェント実行中の ContextVar（usage_scope）で伝える。
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.config import get_settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+GROUPS = ("session", "user", "company", "model")
+NO_COMPANY = "(none)"
+
+_scope: ContextVar[Optional[Dict[str, str]]] = ContextVar("usage_scope", default=None)
+
+
+class UsageTotals:
+    """LLM 呼び出し回数・トークン数・コストの合計"""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost_usd = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int, cost_usd: float) -> None:
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.cost_usd += cost_usd
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class UsageMeter:
+    """セッション・ユーザー・会社・モデル別の利用量"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_sessions: int = 10000,
+    ):
+        self.enabled = enabled
+        self.prices = prices or {}
+        self.max_sessions = max_sessions
+        # コールバックがスレッドから呼ばれる場合に備えてロックで保護
+        self._lock = threading.Lock()
+        self._totals = self._new_groups()
+        self._pending = self._new_groups()  # 前回の書き出しからの差分
+        self._overall = UsageTotals()
+        self._unknown_models: set = set()
+
+    @staticmethod
+    def _new_groups() -> Dict[str, "OrderedDict[str, UsageTotals]"]:
+        return {group: OrderedDict() for group in GROUPS}
+
+    @contextmanager
+    def usage_scope(self, session_id: str, user_id: str, company_name: Optional[str]) -> Iterator[None]:
+        """この中の LLM 呼び出しを指定したセッション・ユーザー・会社に計上する"""
+        token = _scope.set({"session": session_id, "user": user_id, "company": company_name or NO_COMPANY})
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+
+    def price(self, model: str) -> Tuple[float, float]:
+        """モデルの (入力, 出力) 単価（USD / 100万トークン）。日付付きのモデル名は最長一致で引く"""
+        if model in self.prices:
+            return self.prices[model]
+        matches = [name for name in self.prices if model.startswith(name)]
+        if matches:
+            return self.prices[max(matches, key=len)]
+        if model not in self._unknown_models:
+            self._unknown_models.add(model)
+            logger.warning("usage_meter_unknown_model", model=model)
+        return 0.0, 0.0
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        """LLM 応答1件の利用量を計上し、コスト（USD）を返す
+
+        cached_tokens（prompt_tokens の内数）は件数のみ集計し、コストの割引は考慮しない。
+        """
+        prompt_price, completion_price = self.price(model)
+        cost_usd = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+        if not self.enabled:
+            return cost_usd
+
+        keys = dict(_scope.get() or {"company": NO_COMPANY})
+        keys["model"] = model
+        with self._lock:
+            self._overall.add(prompt_tokens, completion_tokens, cached_tokens, cost_usd)
+            for groups in (self._totals, self._pending):
+                for group, key in keys.items():
+                    totals = groups[group].get(key)
+                    if totals is None:
+                        totals = groups[group][key] = UsageTotals()
+                    else:
+                        groups[group].move_to_end(key)
+                    totals.add(prompt_tokens, completion_tokens, cached_tokens, cost_usd)
+            while len(self._totals["session"]) > self.max_sessions:
+                self._totals["session"].popitem(last=False)
+        return cost_usd
+
+    def forget_session(self, session_id: str) -> None:
+        """セッション別の累計から外す（ユーザー・会社・モデル別と書き出し前の差分には残る）"""
+        with self._lock:
+            self._totals["session"].pop(session_id, None)
+
+    def summary(
+        self,
+        group: str,
+        key: Optional[str] = None,
+        sort_by: str = "cost_usd",
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        """集計結果（group 内を sort_by の降順で limit 件。key 指定時はその1件）"""
+        with self._lock:
+            items = [
+                {"key": name, **totals.as_dict()}
+                for name, totals in self._totals[group].items()
+                if key is None or name == key
+            ]
+            overall = self._overall.as_dict()
+        items.sort(key=lambda item: item.get(sort_by, 0), reverse=True)
+        return {"group": group, "overall": overall, "count": len(items), "items": items[:limit]}
+
+    def flush(self) -> int:
+        """前回からの差分を書き出す（書き出した件数を返す）"""
+        with self._lock:
+            pending, self._pending = self._pending, self._new_groups()
+
+        flushed_at = time.time()
+        records = [
+            {"flushed_at": flushed_at, "group": group, "key": key, **totals.as_dict()}
+            for group, entries in pending.items()
+            for key, totals in entries.items()
+        ]
+        if not records:
+            return 0
+
+        if settings.usage_flush_path:
+            try:
+                with open(settings.usage_flush_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+            except OSError as e:
+                logger.warning("usage_flush_write_failed", path=settings.usage_flush_path, error=str(e))
+
+        delta = [record for record in records if record["group"] == "model"]
+        logger.info(
+            "usage_flushed",
+            records=len(records),
+            prompt_tokens=sum(record["prompt_tokens"] for record in delta),
+            completion_tokens=sum(record["completion_tokens"] for record in delta),
+            cached_tokens=sum(record["cached_tokens"] for record in delta),
+            cost_usd=round(sum(record["cost_usd"] for record in delta), 6),
+            by_company={
+                record["key"]: record["cost_usd"] for record in records if record["group"] == "company"
+            },
+        )
+        return len(records)
+
+    async def run_flusher(self, interval_seconds: float) -> None:
+        """interval_seconds ごとに flush する（lifespan でタスクとして起動）"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                self.flush()
+        finally:
+            self.flush()
+
+
+usage_meter = UsageMeter(
+    enabled=settings.usage_meter_enabled,
+    prices=settings.model_price_map,
+    max_sessions=settings.usage_max_sessions,
+)
@@ -0,0 +1,159 @@
+"""エージェントループのフレームワークオーバーヘッドのベンチマーク
+
+AgentExecutor（AGENT_ENGINE=langchain）と ToolCallingLoop（AGENT_ENGINE=native）で同じターンを実行し、
+ターンあたりの所要時間・LLM ステップあたりの所要時間・メモリを比較する。
+
+OpenAI API は httpx.MockTransport で即座に応答させるため（ツールは実物のモックデータ）、
+2つのエンジンの差がそのままフレームワーク側のオーバーヘッドになる。
+1ターンは「交通・ホテル検索（並列）→ 交通検索を --extra-steps 回 → 規程チェック → 最終応答」。
+
+使い方（backend-python ディレクトリで実行）:
+    python -m benchmarks.agent_engine
+    python -m benchmarks.agent_engine --turns 200 --extra-steps 6 --concurrency 100
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("LLM_GOVERNOR_ENABLED", "false")  # モックの応答を RPM・TPM の既定値で待たせない
+
+import httpx  # noqa: E402
+import openai  # noqa: E402
+
+from app.agents import TravelSupportAgent  # noqa: E402
+from app.agents.callbacks import TokenUsageCollector, ToolOutputCollector, metrics_callback  # noqa: E402
+
+ENGINES = ("langchain", "native")
+
+TOOL_ARGS = {
+    "transportation_search": {"departure": "東京", "destination": "大阪"},
+    "hotel_search": {"destination": "大阪", "nights": 1},
+    "policy_checker": {
+        "transportation_type": "新幹線",
+        "transportation_cost": 27000,
+        "hotel_cost_per_night": 9000,
+        "total_nights": 1,
+    },
+}
+
+
+def build_script(extra_steps: int) -> List[List[str]]:
+    """LLM ステップごとに呼び出すツール（空リストは最終応答）"""
+    return (
+        [["transportation_search", "hotel_search"]]
+        + [["transportation_search"]] * extra_steps
+        + [["policy_checker"], []]
+    )
+
+
+def mock_transport(script: List[List[str]]) -> httpx.MockTransport:
+    """リクエスト中のツール呼び出し済みのステップ数から次の応答を返す"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        step = sum(1 for message in body["messages"] if message.get("tool_calls"))
+        tools = script[min(step, len(script) - 1)]
+        message: Dict[str, Any] = {"role": "assistant", "content": None if tools else "規程の範囲内です。"}
+        if tools:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{step}_{index}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(TOOL_ARGS[name], ensure_ascii=False)},
+                }
+                for index, name in enumerate(tools)
+            ]
+        return httpx.Response(200, json={
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tools else "stop"}],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": 20, "total_tokens": 1020},
+        })
+
+    return httpx.MockTransport(handler)
+
+
+async def run_turn(engine: Any) -> float:
+    """1ターン実行し、所要時間（秒）を返す"""
+    start = time.perf_counter()
+    result = await engine.ainvoke(
+        {"input": "大阪出張の規程を確認して", "chat_history": [], "context": "会話ターン数: 0"},
+        config={"callbacks": [ToolOutputCollector(), TokenUsageCollector(), metrics_callback]},
+    )
+    elapsed = time.perf_counter() - start
+    assert result["output"], result
+    return elapsed
+
+
+async def measure(engine: Any, turns: int, concurrency: int, llm_steps: int) -> Dict[str, Any]:
+    for _ in range(5):  # ウォームアップ（search_memo・HTTP クライアントの初期化）
+        await run_turn(engine)
+
+    samples = sorted([await run_turn(engine) * 1000 for _ in range(turns)])
+
+    gc.collect()
+    tracemalloc.start()
+    await asyncio.gather(*(run_turn(engine) for _ in range(concurrency)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean_ms = statistics.fmean(samples)
+    return {
+        "turns": turns,
+        "llm_steps_per_turn": llm_steps,
+        "mean_ms": round(mean_ms, 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95)], 3),
+        "per_step_us": round(mean_ms * 1000 / llm_steps, 1),
+        "concurrent_turns": concurrency,
+        "peak_kib": round(peak / 1024, 1),
+        "peak_kib_per_turn": round(peak / 1024 / concurrency, 1),
+    }
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    script = build_script(args.extra_steps)
+    agent = TravelSupportAgent()
+    agent.llm.async_client = openai.AsyncOpenAI(
+        api_key="sk-benchmark",
+        http_client=httpx.AsyncClient(transport=mock_transport(script)),
+        max_retries=0,
+    ).chat.completions
+
+    results = {}
+    # AgentExecutor(verbose=True) の標準出力も計測に含め、表示は捨てる
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name in ENGINES:
+            results[name] = await measure(agent.build_engine(name), args.turns, args.concurrency, len(script))
+
+    base, lean = results["langchain"], results["native"]
+    results["native_vs_langchain"] = {
+        "per_step_saved_us": round(base["per_step_us"] - lean["per_step_us"], 1),
+        "turn_speedup": round(base["mean_ms"] / lean["mean_ms"], 3),
+        "peak_memory_ratio": round(lean["peak_kib"] / base["peak_kib"], 3),
+    }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100, help="逐次実行するターン数")
+    parser.add_argument("--extra-steps", type=int, default=2, help="1ターンに追加する交通検索のステップ数")
+    parser.add_argument("--concurrency", type=int, default=50, help="メモリ計測で同時に実行するターン数")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main_async(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""条件抽出（ルールベース）の精度・速度ベンチマーク
+
+fixtures/condition_corpus.json の各メッセージを新規セッションの条件にマージし、
+期待値と項目単位で比較する。速度はメッセージごとの extract_conditions の所要時間。
+
+使い方（backend-python ディレクトリで実行）:
+    python -m benchmarks.condition_extractor
+    python -m benchmarks.condition_extractor --repeat 1000 --verbose
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.agents.tools.condition_extractor import extract_conditions, merge_conditions
+from app.models.schemas import TravelConditions
+
+CORPUS_PATH = Path(__file__).parent / "fixtures" / "condition_corpus.json"
+
+# 比較対象の項目（notes 以外の TravelConditions の項目）
+FIELDS = [
+    "departure_location",
+    "destination",
+    "depart_date",
+    "return_date",
+    "is_day_trip",
+    "budget",
+    "preferred_transportation",
+    "purpose",
+]
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def evaluate(corpus: List[Dict[str, Any]], verbose: bool = False) -> Dict[str, Any]:
+    """項目単位の precision / recall と完全一致率を計算"""
+    true_positive = 0
+    false_positive = 0
+    false_negative = 0
+    exact = 0
+
+    for item in corpus:
+        today = date.fromisoformat(item["today"])
+        extracted = extract_conditions(item["message"], today=today)
+        actual = merge_conditions(TravelConditions(), extracted).model_dump()
+        expected = item["expected"]
+
+        mismatches = []
+        for field in FIELDS:
+            got = actual.get(field)
+            want = expected.get(field)
+            if got is not None and got == want:
+                true_positive += 1
+            else:
+                if got is not None:
+                    false_positive += 1
+                if want is not None:
+                    false_negative += 1
+                if got != want:
+                    mismatches.append(f"{field}: got={got!r} want={want!r}")
+
+        if not mismatches:
+            exact += 1
+        elif verbose:
+            print(f"[MISS] {item['message']}")
+            for line in mismatches:
+                print(f"       {line}")
+
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 1.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 1.0
+    return {
+        "messages": len(corpus),
+        "exact_match": round(exact / len(corpus), 4),
+        "field_precision": round(precision, 4),
+        "field_recall": round(recall, 4),
+    }
+
+
+def measure(corpus: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    """1メッセージあたりの抽出時間（マイクロ秒）"""
+    today = date.fromisoformat(corpus[0]["today"])
+    samples = []
+    for _ in range(repeat):
+        for item in corpus:
+            start = time.perf_counter()
+            extract_conditions(item["message"], today=today)
+            samples.append((time.perf_counter() - start) * 1_000_000)
+
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p50_us": round(samples[len(samples) // 2], 2),
+        "p95_us": round(samples[int(len(samples) * 0.95)], 2),
+        "p99_us": round(samples[int(len(samples) * 0.99)], 2),
+        "max_us": round(samples[-1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="速度計測の繰り返し回数")
+    parser.add_argument("--verbose", action="store_true", help="不一致のメッセージを表示")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    accuracy = evaluate(corpus, verbose=args.verbose)
+    speed = measure(corpus, args.repeat)
+
+    print(json.dumps({"accuracy": accuracy, "speed": speed}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""pytest の共通設定
+
+app.config.Settings はインポート時に読み込まれるため、アプリのモジュールより先に環境変数を設定する。
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Union
+
+import httpx
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("DD_LLMOBS_ENABLED", "false")
+os.environ.setdefault("DD_TRACE_ENABLED", "false")
+# モックの応答には実際の RPM・TPM の制限がないため、テスト全体で共有のガバナーの予算を消費させない
+os.environ.setdefault("LLM_GOVERNOR_ENABLED", "false")
+
+# 応答の指定: 文字列は最終応答、dict はツール呼び出し（{"name": ..., "args": ...}）、int は HTTP エラー
+MockResponse = Union[str, Dict[str, Any], int]
+
+USAGE = {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}
+
+
+class MockOpenAI:
+    """chat.completions を順番に応答する httpx.MockTransport（リクエスト本文は requests に残す）"""
+
+    def __init__(self, responses: List[MockResponse]):
+        self.responses = list(responses)
+        self.requests: List[Dict[str, Any]] = []
+        self.transport = httpx.MockTransport(self._handle)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body)
+        spec = self.responses[min(len(self.requests), len(self.responses)) - 1]
+        headers = {"x-ratelimit-limit-requests": "10000", "x-ratelimit-remaining-requests": "9999"}
+        if isinstance(spec, int):
+            return httpx.Response(spec, json={"error": {"message": "mock error"}}, headers=headers)
+
+        message: Dict[str, Any] = {"role": "assistant", "content": spec if isinstance(spec, str) else None}
+        if isinstance(spec, dict):
+            message["tool_calls"] = [{
+                "id": f"call_{len(self.requests)}",
+                "type": "function",
+                "function": {"name": spec["name"], "arguments": json.dumps(spec["args"], ensure_ascii=False)},
+            }]
+        finish_reason = "tool_calls" if isinstance(spec, dict) else "stop"
+        base = {"id": "chatcmpl-test", "created": int(time.time()), "model": body["model"]}
+        if body.get("stream"):
+            return self._stream(base, message, finish_reason, headers)
+        return httpx.Response(200, headers=headers, json={
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": USAGE,
+        })
+
+    @staticmethod
+    def _stream(base: Dict[str, Any], message: Dict[str, Any], finish_reason: str, headers: Dict[str, str]) -> httpx.Response:
+        """stream=True の応答（本文は2チャンクに分けて送る）"""
+        if message.get("tool_calls"):
+            deltas = [{"role": "assistant", "tool_calls": [{"index": 0, **message["tool_calls"][0]}]}]
+        else:
+            content = message["content"]
+            half = len(content) // 2
+            deltas = [{"role": "assistant", "content": content[:half]}, {"content": content[half:]}]
+        chunks = [{"choices": [{"index": 0, "delta": delta, "finish_reason": None}]} for delta in deltas]
+        chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+        chunks.append({"choices": [], "usage": USAGE})
+        payload = "".join(
+            f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', **chunk}, ensure_ascii=False)}\n\n"
+            for chunk in chunks
+        )
+        return httpx.Response(
+            200,
+            headers={**headers, "content-type": "text/event-stream"},
+            content=(payload + "data: [DONE]\n\n").encode(),
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=self.transport)
+
+
+@pytest.fixture
+def mock_openai() -> Callable[[List[MockResponse]], MockOpenAI]:
+    return MockOpenAI
+
+
+@pytest.fixture
+def build_agent(monkeypatch):
+    """OpenAI への送信を MockOpenAI に向けた TravelSupportAgent を作る"""
+    from app.agents import chat_history, travel_agent
+
+    def build(openai: MockOpenAI) -> "travel_agent.TravelSupportAgent":
+        # LLMObs を無効にしているとスパンに種類が付かず annotate が例外になるため読み捨てる
+        monkeypatch.setattr(travel_agent.LLMObs, "annotate", staticmethod(lambda *args, **kwargs: None))
+        monkeypatch.setattr(travel_agent, "get_openai_http_client", openai.client)
+        monkeypatch.setattr(chat_history, "get_openai_http_client", openai.client)
+        return travel_agent.TravelSupportAgent()
+
+    return build
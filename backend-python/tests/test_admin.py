@@ -0,0 +1,30 @@
+"""管理APIの認証"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import admin
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(admin.router)
+    return TestClient(app)
+
+
+def test_usage_is_forbidden_without_configured_key(client, monkeypatch):
+    monkeypatch.setattr(admin.settings, "admin_api_key", "")
+
+    assert client.get("/api/admin/usage").status_code == 403
+    assert client.get("/api/admin/usage", headers={"X-Admin-Key": ""}).status_code == 403
+
+
+def test_usage_requires_matching_key(client, monkeypatch):
+    monkeypatch.setattr(admin.settings, "admin_api_key", "secret")
+
+    assert client.get("/api/admin/usage").status_code == 401
+    assert client.get("/api/admin/usage", headers={"X-Admin-Key": "wrong"}).status_code == 401
+    response = client.get("/api/admin/usage", headers={"X-Admin-Key": "secret"})
+    assert response.status_code == 200
+    assert response.json()["group"] == "company"
@@ -0,0 +1,62 @@
+"""バッチチャット（/api/chat/batch）"""
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routes import chat
+from app.services.session_manager import session_manager
+from app.services.usage_meter import usage_meter
+
+
+class _EchoAgent:
+    def __init__(self):
+        self.session_ids = set()
+
+    async def process_message(self, user_message, session_data, company_name=None, deadline=None):
+        self.session_ids.add(session_data.session_id)
+        with usage_meter.usage_scope(session_data.session_id, session_data.user_id, company_name):
+            usage_meter.record("gpt-4o", 10, 1)
+        return {"response": f"受付: {user_message}", "plans": [], "updated_conditions": None}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    agent = _EchoAgent()
+    monkeypatch.setattr(chat, "get_agent", lambda: agent)
+    app = FastAPI()
+    app.include_router(chat.router)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    client.agent = agent
+    return client
+
+
+@pytest.mark.asyncio
+async def test_batch_deletes_its_sessions(client):
+    before = session_manager.session_count
+    body = {"conversations": [{"messages": ["大阪", "1泊"]}, {"messages": ["名古屋"]}]}
+
+    async with client:
+        response = await client.post("/api/chat/batch", json=body)
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    conversations = [line for line in lines if line["type"] == "conversation"]
+    assert [len(c["turns"]) for c in sorted(conversations, key=lambda c: c["conversation_id"])] == [2, 1]
+    assert lines[-1]["type"] == "summary" and lines[-1]["errors"] == 0
+    # 同じ会話のターンは同じセッションで実行し、終わったら残さない
+    assert len(client.agent.session_ids) == 2
+    assert session_manager.session_count == before
+    sessions = {item["key"] for item in usage_meter.summary("session", limit=10000)["items"]}
+    assert not sessions & client.agent.session_ids
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_too_many_turns(client, monkeypatch):
+    monkeypatch.setattr(chat.settings, "batch_max_turns", 2)
+    body = {"conversations": [{"messages": ["a", "b"]}, {"messages": ["c"]}]}
+
+    async with client:
+        response = await client.post("/api/chat/batch", json=body)
+
+    assert response.status_code == 413
@@ -0,0 +1,57 @@
+"""モデルカスケード"""
+import pytest
+
+from app.agents.cascade import ModelCascade, needs_tools
+from app.agents.llm import DeadlineAwareChatOpenAI
+from app.models.schemas import TravelConditions
+
+FULL_CONDITIONS = TravelConditions(
+    departure_location="東京", destination="大阪", depart_date="2099-12-09", return_date="2099-12-10"
+)
+
+
+def cascade(openai) -> ModelCascade:
+    small_llm = DeadlineAwareChatOpenAI(
+        model="gpt-4o-mini", api_key="sk-test", max_retries=0, http_async_client=openai.client()
+    )
+    return ModelCascade(small_llm)
+
+
+def test_needs_tools_short_circuits_obvious_turns():
+    assert needs_tools("こんにちは", FULL_CONDITIONS) == "conditions_complete"
+    assert needs_tools("ホテルを探して", TravelConditions()) == "tool_keyword"
+    assert needs_tools("こんにちは", TravelConditions()) is None
+
+
+@pytest.mark.asyncio
+async def test_small_model_answers_chit_chat(mock_openai):
+    openai = mock_openai([{"name": "CascadeDecision", "args": {"route": "answer", "response": "こんにちは！"}}])
+    model_cascade = cascade(openai)
+
+    decision = await model_cascade.decide("こんにちは", TravelConditions(), [], "")
+
+    assert (decision["tier"], decision["response"], decision["reason"]) == ("small", "こんにちは！", "small_model_answered")
+    assert decision["prompt_tokens"] > 0
+    assert model_cascade.stats()["routes"] == {"small": 1, "escalate": 0}
+
+
+@pytest.mark.asyncio
+async def test_escalation_and_classifier_errors_go_to_the_large_model(mock_openai):
+    openai = mock_openai([{"name": "CascadeDecision", "args": {"route": "escalate"}}, 500])
+    model_cascade = cascade(openai)
+
+    escalated = await model_cascade.decide("出張の相談です", TravelConditions(), [], "")
+    failed = await model_cascade.decide("出張の相談です", TravelConditions(), [], "")
+
+    assert (escalated["tier"], escalated["reason"]) == ("large", "small_model_escalated")
+    assert (failed["tier"], failed["reason"]) == ("large", "classifier_error")
+    assert model_cascade.stats()["small_tier_rate"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_tool_turns_skip_the_small_model(mock_openai):
+    openai = mock_openai([])
+    decision = await cascade(openai).decide("新幹線の料金は？", TravelConditions(), [], "")
+
+    assert (decision["tier"], decision["reason"]) == ("large", "tool_keyword")
+    assert openai.requests == []
@@ -0,0 +1,65 @@
+"""トークン予算付きの会話履歴"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.agents.chat_history import ChatHistoryBuilder, count_tokens
+from app.agents.llm import DeadlineAwareChatOpenAI
+from app.models.schemas import Message, SessionData
+
+
+def session_with(*contents: str) -> SessionData:
+    session = SessionData(session_id="history-test", user_id="u")
+    for index, content in enumerate(contents):
+        session.messages.append(Message(role="user" if index % 2 == 0 else "assistant", type="text", content=content))
+    return session
+
+
+def builder(openai, token_budget: int) -> ChatHistoryBuilder:
+    summary_llm = DeadlineAwareChatOpenAI(
+        model="gpt-4o-mini", api_key="sk-test", max_retries=0, http_async_client=openai.client()
+    )
+    return ChatHistoryBuilder(token_budget, summary_llm=summary_llm)
+
+
+@pytest.mark.asyncio
+async def test_history_within_budget_is_passed_as_is(mock_openai):
+    openai = mock_openai(["要約"])
+    session = session_with("大阪に出張", "承知しました", "1泊です")
+
+    history = await builder(openai, 1000).build(session, "1泊です")
+
+    assert [type(m) for m in history] == [HumanMessage, AIMessage]
+    assert openai.requests == []
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_folded_into_summary(mock_openai):
+    openai = mock_openai(["東京→大阪の出張を相談中"])
+    contents = [f"メッセージ{i} " + "あ" * 40 for i in range(6)]
+    session = session_with(*contents)
+    budget = sum(count_tokens(c) for c in contents) - 1
+
+    history = await builder(openai, budget).build(session, "次の質問")
+
+    assert isinstance(history[0], SystemMessage) and "東京→大阪の出張を相談中" in history[0].content
+    assert session.summarized_message_count > 0
+    assert len(history) - 1 == len(contents) - session.summarized_message_count
+    assert "メッセージ0" in openai.requests[0]["messages"][0]["content"]
+
+    # 次のターンは要約済みのメッセージを再要約しない
+    await builder(openai, budget).build(session, "次の質問")
+    assert len(openai.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_summary_failure_still_fits_budget(mock_openai):
+    openai = mock_openai([500])
+    contents = [f"メッセージ{i} " + "あ" * 40 for i in range(6)]
+    session = session_with(*contents)
+    budget = count_tokens(contents[-1]) * 2
+
+    history = await builder(openai, budget).build(session, "次の質問")
+
+    assert session.history_summary in ("", None)
+    assert sum(count_tokens(m.content) for m in history) <= budget
+    assert history[-1].content == contents[-1]
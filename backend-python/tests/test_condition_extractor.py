@@ -0,0 +1,84 @@
+"""ルールベースの条件抽出"""
+from datetime import date
+
+import pytest
+
+from app.agents.tools.condition_extractor import extract_conditions, merge_conditions
+from app.models.schemas import TravelConditions
+
+TODAY = date(2026, 10, 17)
+
+
+def extract(message: str) -> TravelConditions:
+    return merge_conditions(TravelConditions(), extract_conditions(message, today=TODAY))
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "東京→大阪 12/9-10",
+        "東京-大阪 12/9-10",
+        "東京ー大阪 12/9-10",
+        "東京〜大阪 12/9-10",
+        "12/9-10 東京 大阪",
+        "12/9-10 東京、大阪",
+        "東京から大阪、12/9-10で",
+        "12/9-10に大阪へ、東京発",
+    ],
+)
+def test_ordered_pairs_map_to_departure_then_destination(message):
+    conditions = extract(message)
+
+    assert conditions.departure_location == "東京"
+    assert conditions.destination == "大阪"
+    assert conditions.depart_date == "2026-12-09"
+    assert conditions.return_date == "2026-12-10"
+
+
+def test_ambiguous_locations_are_left_for_the_llm():
+    extracted = extract_conditions("東京 大阪 名古屋", today=TODAY)
+
+    assert extracted["unassigned_locations"] == ["東京", "大阪", "名古屋"]
+    conditions = merge_conditions(TravelConditions(), extracted)
+    assert conditions.departure_location is None
+    assert conditions.destination is None
+
+
+def test_single_location_fills_the_open_slot():
+    assert extract("大阪").destination == "大阪"
+
+    current = TravelConditions(destination="大阪")
+    merged = merge_conditions(current, extract_conditions("東京", today=TODAY))
+    assert merged.departure_location == "東京"
+    assert merged.destination == "大阪"
+
+
+@pytest.mark.parametrize("message", ["2024-12-09に大阪", "2024/12/09 大阪", "2024年12月9日 大阪"])
+def test_past_absolute_dates_are_rejected(message):
+    extracted = extract_conditions(message, today=TODAY)
+
+    assert "depart_date" not in extracted
+    assert "return_date" not in extracted
+
+
+def test_future_absolute_and_yearless_dates_are_accepted():
+    assert extract_conditions("2027-01-05 大阪", today=TODAY)["depart_date"] == "2027-01-05"
+    # 年の省略された過去の月日は翌年として扱う
+    assert extract_conditions("3/2 大阪", today=TODAY)["depart_date"] == "2027-03-02"
+
+
+def test_nights_after_start_date_are_not_a_date_range():
+    conditions = extract("大阪に12/9から2泊、東京発")
+
+    assert conditions.depart_date == "2026-12-09"
+    assert conditions.return_date == "2026-12-11"
+    assert conditions.is_day_trip is False
+
+
+def test_day_trip_clears_return_date():
+    current = TravelConditions(depart_date="2026-12-09", return_date="2026-12-10")
+
+    merged = merge_conditions(current, extract_conditions("日帰りで", today=TODAY))
+
+    assert merged.is_day_trip is True
+    assert merged.return_date is None
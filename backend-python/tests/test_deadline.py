@@ -0,0 +1,58 @@
+"""リクエストのデッドライン"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.agents.tools.tool_runtime import get_tool_timeout
+from app.services import deadline as deadline_module
+from app.services.deadline import Deadline, current_deadline, deadline_scope, remaining_seconds, resolve_deadline_seconds
+from app.services.session_manager import SessionManager
+
+
+def test_company_overrides_endpoint_and_default(monkeypatch):
+    settings = deadline_module.settings
+    monkeypatch.setattr(settings, "request_deadline_seconds", 45.0)
+    monkeypatch.setattr(settings, "request_deadlines", "stream=90")
+    monkeypatch.setattr(settings, "company_request_deadlines", "ACME=20")
+
+    assert resolve_deadline_seconds("chat") == 45.0
+    assert resolve_deadline_seconds("stream") == 90.0
+    assert resolve_deadline_seconds("stream", "ACME") == 20.0
+    assert resolve_deadline_seconds("stream", "Other") == 90.0
+
+
+def test_scope_caps_remaining_seconds_and_tool_timeouts():
+    assert remaining_seconds(5.0) == 5.0
+    with deadline_scope(Deadline(1.0)):
+        assert current_deadline() is not None
+        assert remaining_seconds(5.0) <= 1.0
+        assert remaining_seconds() <= 1.0
+        assert get_tool_timeout("hotel_search") <= 1.0
+    assert current_deadline() is None
+
+
+def test_expired_deadline_never_goes_negative():
+    deadline = Deadline(0.0)
+    assert deadline.expired
+    assert deadline.remaining() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_slow_llm_returns_partial_result_at_deadline(build_agent):
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(5)
+        return httpx.Response(500)
+
+    transport = httpx.MockTransport(slow)
+    agent = build_agent(SimpleNamespace(client=lambda: httpx.AsyncClient(transport=transport)))
+    session = SessionManager().create_session("deadline-test")
+
+    start = time.monotonic()
+    result = await agent.process_message("大阪出張の規程を確認して", session, deadline=Deadline(0.3))
+
+    assert time.monotonic() - start < 2
+    assert result["deadline_exceeded"] is True
+    assert "時間内に回答を完了できませんでした" in result["response"]
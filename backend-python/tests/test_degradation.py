@@ -0,0 +1,109 @@
+"""縮退運転の判定と決定的なプランナー"""
+import asyncio
+import threading
+
+import httpx
+import openai
+import pytest
+
+from app.agents.degraded_planner import DEGRADED_NOTICE, DegradedPlanner
+from app.agents.resilience import LLMResilience
+from app.agents.tools import PlanGeneratorTool, PolicyCheckerTool
+from app.models.schemas import TravelConditions
+from app.services.degradation import DEGRADED, NORMAL, DegradationController
+
+
+def server_error() -> openai.InternalServerError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.InternalServerError("boom", response=httpx.Response(500, request=request), body=None)
+
+
+def make_controller(**kwargs) -> DegradationController:
+    options = dict(min_samples=3, latency_p95_seconds=1.0, error_rate=0.5, probe_interval_seconds=60.0, recovery_samples=2)
+    options.update(kwargs)
+    return DegradationController(**options)
+
+
+def test_controller_degrades_on_latency_and_recovers():
+    controller = make_controller()
+    for _ in range(3):
+        controller.record(2.0)
+    assert controller.mode == DEGRADED
+
+    # 縮退に入った直後はプローブの間隔まで LLM を使わない
+    controller._last_probe_at -= 61
+    assert controller.allow_llm()
+    assert not controller.allow_llm()
+
+    controller.record(0.1)
+    controller.record(0.1)
+    assert controller.mode == NORMAL
+
+
+def test_controller_degrades_on_error_rate_but_ignores_cancellation():
+    controller = make_controller()
+    for _ in range(3):
+        controller.record(0.1, asyncio.CancelledError())
+    assert controller.mode == NORMAL
+
+    for _ in range(4):
+        controller.record(0.1, RuntimeError("boom"))
+    assert controller.mode == DEGRADED
+
+
+@pytest.mark.asyncio
+async def test_resilience_records_only_primary_calls():
+    controller = make_controller(min_samples=100)
+    resilience = LLMResilience("big", retry_attempts=0, health=controller)
+
+    async def ok():
+        return "ok"
+
+    async def fail():
+        raise server_error()
+
+    assert await resilience.call(ok) == "ok"
+    with pytest.raises(openai.InternalServerError):
+        await resilience.call(fail)
+
+    assert [ok for _, _, ok in controller._samples] == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_degraded_planner_generates_plans_off_the_event_loop(monkeypatch):
+    threads = []
+    original_run = PlanGeneratorTool._run
+
+    def recording_run(self, **kwargs):
+        threads.append(threading.current_thread())
+        return original_run(self, **kwargs)
+
+    monkeypatch.setattr(PlanGeneratorTool, "_run", recording_run)
+    conditions = TravelConditions(
+        departure_location="東京", destination="大阪", depart_date="2099-12-09", return_date="2099-12-10"
+    )
+
+    result = await DegradedPlanner(PlanGeneratorTool(), PolicyCheckerTool()).respond("お願いします", conditions)
+
+    assert result["route"] == "plan"
+    assert result["plans"]
+    assert result["response"].endswith(DEGRADED_NOTICE)
+    assert threads and threads[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_degraded_planner_answers_policy_questions():
+    conditions = TravelConditions(destination="大阪", preferred_transportation="新幹線", budget=30000)
+
+    result = await DegradedPlanner(PlanGeneratorTool(), PolicyCheckerTool()).respond("規程を教えて", conditions)
+
+    assert result["route"] == "policy"
+    assert "ご指定の条件でのチェック結果" in result["response"]
+
+
+@pytest.mark.asyncio
+async def test_degraded_planner_asks_for_missing_slots():
+    result = await DegradedPlanner(PlanGeneratorTool(), PolicyCheckerTool()).respond("大阪に行きたい", TravelConditions())
+
+    assert result["route"] == "slot_filling"
+    assert "出発地" in result["response"]
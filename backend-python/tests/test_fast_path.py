@@ -0,0 +1,98 @@
+"""ファストパスの判定"""
+import threading
+
+import pytest
+
+from app.agents.fast_path import FastPathRouter, is_confirmation, missing_slots
+from app.agents.tools import PlanGeneratorTool
+from app.models.schemas import TravelConditions
+from app.services import metrics
+
+FULL_CONDITIONS = TravelConditions(
+    departure_location="東京",
+    destination="大阪",
+    depart_date="2099-12-09",
+    return_date="2099-12-10",
+)
+
+
+def route_count(route: str) -> float:
+    return metrics.FAST_PATH_ROUTES.labels(route=route)._value.get()
+
+
+def test_is_confirmation_ignores_tags_and_punctuation():
+    assert is_confirmation("[Python] それでお願いします！")
+    assert not is_confirmation("大阪のホテルは？")
+
+
+def test_bare_acknowledgement_needs_a_plan_confirmation_question():
+    assert is_confirmation("はい", "この条件でプランを作成してよろしいですか？")
+    assert not is_confirmation("はい", "ほかにご質問はありますか？")
+    assert not is_confirmation("うん")
+
+
+@pytest.mark.asyncio
+async def test_acknowledgement_to_an_unrelated_question_goes_to_agent():
+    router = FastPathRouter(PlanGeneratorTool())
+
+    result = await router.route("はい", FULL_CONDITIONS, {}, "領収書の提出方法もご説明しましょうか？")
+
+    assert result is None
+
+
+@pytest.mark.asyncio
+async def test_acknowledgement_to_a_plan_confirmation_generates_plans():
+    router = FastPathRouter(PlanGeneratorTool())
+
+    result = await router.route("はい", FULL_CONDITIONS, {}, "この条件でプランを作成しますか？")
+
+    assert result["route"] == "plan"
+
+
+def test_missing_slots_accepts_day_trip_without_return_date():
+    conditions = TravelConditions(departure_location="東京", destination="大阪", depart_date="2099-12-09", is_day_trip=True)
+    assert missing_slots(conditions) == []
+
+
+@pytest.mark.asyncio
+async def test_confirmation_with_full_conditions_generates_plans_off_the_event_loop(monkeypatch):
+    tool = PlanGeneratorTool()
+    threads = []
+    original_run = PlanGeneratorTool._run
+
+    def recording_run(self, **kwargs):
+        threads.append(threading.current_thread())
+        return original_run(self, **kwargs)
+
+    monkeypatch.setattr(PlanGeneratorTool, "_run", recording_run)
+    before = route_count("plan")
+
+    result = await FastPathRouter(tool).route("お願いします", FULL_CONDITIONS)
+
+    assert result["route"] == "plan"
+    assert result["tool_output"]["plans"]
+    assert threads and threads[0] is not threading.main_thread()
+    assert route_count("plan") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_confirmation_with_missing_conditions_asks_for_slots():
+    before = route_count("slot_filling")
+
+    result = await FastPathRouter(PlanGeneratorTool()).route("お願いします", TravelConditions(destination="大阪"))
+
+    assert result["route"] == "slot_filling"
+    assert "出発地" in result["response"]
+    assert route_count("slot_filling") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_open_question_is_delegated_to_agent():
+    router = FastPathRouter(PlanGeneratorTool())
+    before = route_count("agent")
+
+    result = await router.route("大阪のホテルのおすすめは？", FULL_CONDITIONS, {"destination": "大阪"})
+
+    assert result is None
+    assert router.stats()["hits"] == {"plan": 0, "slot_filling": 0}
+    assert route_count("agent") == before + 1
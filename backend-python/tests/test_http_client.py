@@ -0,0 +1,47 @@
+"""OpenAI 呼び出し用の共有 HTTP クライアント"""
+import httpx
+import pytest
+
+from app.services import http_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+
+
+@pytest.mark.asyncio
+async def test_client_is_shared_until_closed():
+    client = http_client.get_openai_http_client()
+
+    assert http_client.get_openai_http_client() is client
+    assert http_client.rate_governor.observe_response in client.event_hooks["response"]
+
+    await http_client.close_openai_http_client()
+    assert client.is_closed
+    assert http_client.get_openai_http_client() is not client
+    await http_client.close_openai_http_client()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_sends_an_authorized_models_request(monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"data": []})
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    await http_client.warm_up_openai_connection()
+
+    assert seen[0].url.path == "/v1/models"
+    assert seen[0].headers["authorization"].startswith("Bearer ")
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failure_does_not_raise(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("unreachable", request=request)
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    await http_client.warm_up_openai_connection()
@@ -0,0 +1,18 @@
+"""共有キーワードによる判定（カスケード・ファストパス・ツール選択）"""
+from app.agents.cascade import needs_tools
+from app.agents.fast_path import is_condition_statement
+from app.agents.tool_selection import select_tools
+from app.models.schemas import TravelConditions
+
+
+def test_cascade_and_tool_selection_agree_on_hotel_words():
+    conditions = TravelConditions(departure_location="東京", destination="大阪")
+
+    assert needs_tools("宿はどこがいい", TravelConditions()) == "tool_keyword"
+    assert "hotel_search" in select_tools(conditions, "宿はどこがいい")
+
+
+def test_trip_words_do_not_turn_a_condition_into_a_question():
+    assert is_condition_statement("東京から大阪、新幹線で1泊", {"destination": "大阪"})
+    assert not is_condition_statement("大阪のホテルを教えて", {"destination": "大阪"})
+    assert not is_condition_statement("大阪出張の精算は？", {"destination": "大阪"})
@@ -0,0 +1,107 @@
+"""LLM レスポンスキャッシュ"""
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.outputs import Generation
+from prometheus_client import REGISTRY
+
+from app.agents import callbacks
+from app.agents.callbacks import MetricsCallbackHandler, TokenUsageCollector
+from app.agents.llm import DeadlineAwareChatOpenAI
+from app.services.llm_cache import LLMResponseCache, MemoryLRUBackend, build_cache_keys, set_cache_bypass
+
+LLM_STRING = '{"lc": 1, "kwargs": {"model_name": "gpt-4o", "temperature": 0.3}}---[(\'stop\', None)]'
+
+
+def prompt(content: str) -> str:
+    return '[{"lc": 1, "id": ["langchain", "schema", "messages", "HumanMessage"], "kwargs": {"content": "%s"}}]' % content
+
+
+def test_normalized_key_ignores_whitespace_and_uuids():
+    a = dict(build_cache_keys(prompt("プラン 123e4567-e89b-12d3-a456-426614174000  を確認"), LLM_STRING))
+    b = dict(build_cache_keys(prompt("プラン 00000000-0000-0000-0000-000000000000 を確認"), LLM_STRING))
+
+    assert a["exact"] != b["exact"]
+    assert a["normalized"] == b["normalized"]
+
+
+def test_normalized_key_depends_on_model_and_content():
+    base = dict(build_cache_keys(prompt("大阪"), LLM_STRING))
+    other_content = dict(build_cache_keys(prompt("名古屋"), LLM_STRING))
+    other_model = dict(build_cache_keys(prompt("大阪"), LLM_STRING.replace("gpt-4o", "gpt-4o-mini")))
+
+    assert base["normalized"] != other_content["normalized"]
+    assert base["normalized"] != other_model["normalized"]
+
+
+def test_unparsable_llm_string_falls_back_to_exact_key():
+    assert [kind for kind, _ in build_cache_keys(prompt("大阪"), "not json")] == ["exact"]
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryLRUBackend(max_entries=2, ttl_seconds=60)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+    assert backend.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_are_not_metered(mock_openai, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(callbacks.usage_meter, "record", lambda *args, **kwargs: recorded.append(args) or 0.0)
+    openai = mock_openai(["こんにちは"])
+    cache = LLMResponseCache([MemoryLRUBackend(max_entries=10, ttl_seconds=60)])
+    llm = DeadlineAwareChatOpenAI(
+        model="gpt-4o", api_key="sk-test", cache=cache, max_retries=0, http_async_client=openai.client(),
+    )
+    usage = TokenUsageCollector()
+    config = {"callbacks": [MetricsCallbackHandler(), usage]}
+
+    first = await llm.ainvoke([HumanMessage("hi")], config=config)
+    second = await llm.ainvoke([HumanMessage("hi")], config=config)
+
+    assert first.content == second.content == "こんにちは"
+    assert len(openai.requests) == 1
+    assert len(recorded) == 1
+    assert usage.as_dict()["llm_calls"] == 2
+    assert usage.as_dict()["llm_cache_hits"] == 1
+    assert usage.as_dict()["prompt_tokens"] == 100
+
+
+@pytest.mark.asyncio
+async def test_bypass_skips_lookup(mock_openai):
+    openai = mock_openai(["a", "b"])
+    cache = LLMResponseCache([MemoryLRUBackend(max_entries=10, ttl_seconds=60)])
+    llm = DeadlineAwareChatOpenAI(
+        model="gpt-4o", api_key="sk-test", cache=cache, max_retries=0, http_async_client=openai.client(),
+    )
+    await llm.ainvoke([HumanMessage("hi")])
+
+    set_cache_bypass(True)
+    try:
+        assert (await llm.ainvoke([HumanMessage("hi")])).content == "b"
+    finally:
+        set_cache_bypass(False)
+    assert cache.bypasses == 1
+
+
+def test_lookups_are_exported_to_prometheus():
+    def sample(result, backend):
+        return REGISTRY.get_sample_value(
+            "sales_support_llm_cache_lookups_total", {"result": result, "backend": backend}
+        ) or 0.0
+
+    cache = LLMResponseCache([MemoryLRUBackend(max_entries=10, ttl_seconds=60)])
+    backend = cache.backends[0].name
+    hits, misses = sample("hit", backend), sample("miss", "")
+
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", [Generation(text="ok")])
+    assert cache.lookup("prompt", "llm")[0].text == "ok"
+
+    assert sample("miss", "") == misses + 1
+    assert sample("hit", backend) == hits + 1
@@ -0,0 +1,90 @@
+"""Prometheus メトリクス（MetricsCallbackHandler）"""
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from prometheus_client import REGISTRY
+
+from app.agents.callbacks import MetricsCallbackHandler
+from app.services.llm_cache import CACHE_HIT_KEY
+from app.services.metrics import render_metrics
+
+MODEL = "metrics-test-model"
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(f"sales_support_{name}", labels) or 0.0
+
+
+def llm_result(cache_hit: bool = False) -> LLMResult:
+    message = AIMessage(content="ok", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+    generation_info = {CACHE_HIT_KEY: True} if cache_hit else None
+    return LLMResult(generations=[[ChatGeneration(message=message, generation_info=generation_info)]])
+
+
+async def run_llm(handler: MetricsCallbackHandler, parent_run_id, response: LLMResult) -> None:
+    run_id = uuid4()
+    await handler.on_chat_model_start(
+        {}, [[]], run_id=run_id, parent_run_id=parent_run_id, metadata={"ls_model_name": MODEL}
+    )
+    await handler.on_llm_end(response, run_id=run_id)
+
+
+@pytest.mark.asyncio
+async def test_agent_run_records_llm_calls_iterations_and_tokens():
+    handler = MetricsCallbackHandler()
+    calls_before = sample("llm_call_duration_seconds_count", model=MODEL, status="success")
+    tokens_before = sample("llm_prompt_tokens_sum", model=MODEL)
+    iterations_before = sample("agent_iterations_sum")
+
+    root, child = uuid4(), uuid4()
+    await handler.on_chain_start({}, {}, run_id=root)
+    await handler.on_chain_start({}, {}, run_id=child, parent_run_id=root)
+    await run_llm(handler, child, llm_result())
+    await run_llm(handler, child, llm_result())
+    await handler.on_chain_end({}, run_id=child)
+    await handler.on_chain_end({}, run_id=root)
+
+    assert sample("llm_call_duration_seconds_count", model=MODEL, status="success") - calls_before == 2
+    assert sample("llm_prompt_tokens_sum", model=MODEL) - tokens_before == 240
+    assert sample("agent_iterations_sum") - iterations_before == 2
+    assert handler._agent_runs == {} and handler._root_of == {}
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_record_latency_but_not_tokens():
+    handler = MetricsCallbackHandler()
+    hits_before = sample("llm_call_duration_seconds_count", model=MODEL, status="cache_hit")
+    tokens_before = sample("llm_prompt_tokens_count", model=MODEL)
+
+    await run_llm(handler, None, llm_result(cache_hit=True))
+
+    assert sample("llm_call_duration_seconds_count", model=MODEL, status="cache_hit") - hits_before == 1
+    assert sample("llm_prompt_tokens_count", model=MODEL) == tokens_before
+
+
+@pytest.mark.asyncio
+async def test_tool_status_distinguishes_timeouts_and_errors():
+    handler = MetricsCallbackHandler()
+
+    def count(status: str) -> float:
+        return sample("tool_duration_seconds_count", tool="metrics_test_tool", status=status)
+
+    before = {status: count(status) for status in ("success", "timeout", "error")}
+    for output, status in (({"success": True}, "success"), ({"timeout": True}, "timeout"), (None, "error")):
+        run_id = uuid4()
+        await handler.on_tool_start({"name": "metrics_test_tool"}, "", run_id=run_id)
+        if status == "error":
+            await handler.on_tool_error(RuntimeError("boom"), run_id=run_id)
+        else:
+            await handler.on_tool_end(output, run_id=run_id)
+
+    assert {status: count(status) - before[status] for status in before} == {"success": 1, "timeout": 1, "error": 1}
+
+
+def test_render_metrics_exposes_the_namespace():
+    body, content_type = render_metrics()
+
+    assert content_type.startswith("text/plain")
+    assert b"sales_support_llm_call_duration_seconds" in body
@@ -0,0 +1,31 @@
+"""plan_generator のプランのサイドチャネル"""
+import pytest
+
+from app.agents.tools import PlanGeneratorTool, plan_artifact_scope, published_plans
+from app.agents.tools.plan_artifacts import publish_plans
+from app.models.schemas import TravelPlan
+
+PLAN_INPUT = {"departure_location": "東京", "destination": "大阪", "depart_date": "2099-12-09", "return_date": "2099-12-10"}
+
+
+@pytest.mark.asyncio
+async def test_plan_generator_publishes_typed_plans_and_returns_compact_text():
+    with plan_artifact_scope() as plans:
+        output = await PlanGeneratorTool().ainvoke(PLAN_INPUT)
+
+    assert plans and all(isinstance(plan, TravelPlan) for plan in plans)
+    assert isinstance(output, str)
+    assert plans[0].label in output
+    assert published_plans() == []
+
+
+def test_scopes_are_isolated_and_publishing_outside_is_a_no_op():
+    publish_plans(["outside"])
+    with plan_artifact_scope() as outer:
+        publish_plans(["a"])
+        with plan_artifact_scope() as inner:
+            publish_plans(["b"])
+        assert published_plans() == ["a"]
+
+    assert (outer, inner) == (["a"], ["b"])
+    assert published_plans() == []
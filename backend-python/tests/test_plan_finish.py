@@ -0,0 +1,58 @@
+"""plan_generator の成功でエージェントのループを終える"""
+import pytest
+
+from app.agents import travel_agent
+from app.models.schemas import TravelConditions, TravelPlan
+from app.services.session_manager import SessionManager
+
+PLAN_CALL = {
+    "name": "plan_generator",
+    "args": {"departure_location": "東京", "destination": "大阪", "depart_date": "2099-12-09", "return_date": "2099-12-10"},
+}
+
+
+async def run(monkeypatch, mock_openai, build_agent, responses, engine="langchain", mode="template"):
+    monkeypatch.setattr(travel_agent.settings, "agent_engine", engine)
+    monkeypatch.setattr(travel_agent.settings, "plan_finish_mode", mode)
+    openai = mock_openai(responses)
+    session = SessionManager().create_session("plan-finish-test")
+    session.conditions = TravelConditions(**PLAN_CALL["args"])
+    result = await build_agent(openai).process_message("おすすめのプランを提案して", session)
+    return result, openai
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("engine", ["langchain", "native"])
+async def test_template_mode_ends_the_run_without_another_llm_call(monkeypatch, mock_openai, build_agent, engine):
+    result, openai = await run(monkeypatch, mock_openai, build_agent, [PLAN_CALL, "使われない応答"], engine=engine)
+
+    assert len(openai.requests) == 1
+    assert result["plans"] and all(isinstance(plan, TravelPlan) for plan in result["plans"])
+    assert result["response"].startswith("東京から大阪への出張（2099-12-09〜2099-12-10）について")
+
+
+@pytest.mark.asyncio
+async def test_summary_mode_asks_the_small_model(monkeypatch, mock_openai, build_agent):
+    result, openai = await run(
+        monkeypatch, mock_openai, build_agent, [PLAN_CALL, "プランAが最安です。"], mode="summary"
+    )
+
+    assert len(openai.requests) == 2
+    assert openai.requests[1]["model"] == travel_agent.settings.cascade_model
+    assert result["response"] == "プランAが最安です。"
+
+
+@pytest.mark.asyncio
+async def test_summary_failure_falls_back_to_the_template(monkeypatch, mock_openai, build_agent):
+    result, _ = await run(monkeypatch, mock_openai, build_agent, [PLAN_CALL, 500], mode="summary")
+
+    assert "件のプランを作成しました" in result["response"]
+
+
+@pytest.mark.asyncio
+async def test_off_mode_lets_the_agent_model_answer(monkeypatch, mock_openai, build_agent):
+    result, openai = await run(monkeypatch, mock_openai, build_agent, [PLAN_CALL, "3件のプランです。"], mode="off")
+
+    assert len(openai.requests) == 2
+    assert openai.requests[1]["model"] == openai.requests[0]["model"]
+    assert result["response"] == "3件のプランです。"
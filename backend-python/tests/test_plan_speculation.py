@@ -0,0 +1,84 @@
+"""plan_generator の投機実行"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.tools.plan_speculation import PlanSpeculator, take_speculative_plan
+
+PLAN_INPUT = {"departure_location": "東京", "destination": "大阪", "depart_date": "2099-12-09"}
+
+
+def fake_generator(result=None, error=None):
+    calls = []
+
+    def run(**kwargs):
+        calls.append(kwargs)
+        if error:
+            raise error
+        return result
+
+    return SimpleNamespace(name="plan_generator", _run=run), calls
+
+
+@pytest.mark.asyncio
+async def test_same_arguments_reuse_the_speculative_result():
+    tool, calls = fake_generator({"plans": ["A"]})
+    speculator = PlanSpeculator(tool)
+
+    speculator.start(PLAN_INPUT)
+    result = await take_speculative_plan({**PLAN_INPUT, "budget": None})
+    speculator.finish()
+
+    assert result == {"plans": ["A"]}
+    assert len(calls) == 1
+    assert (speculator.hits, speculator.wasted, speculator.hit_rate) == (1, 0, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_different_arguments_are_a_mismatch():
+    tool, _ = fake_generator({"plans": ["A"]})
+    speculator = PlanSpeculator(tool)
+
+    speculator.start(PLAN_INPUT)
+    assert await take_speculative_plan({**PLAN_INPUT, "destination": "名古屋"}) is None
+    # 一度判定した投機は再利用しない
+    assert await take_speculative_plan(PLAN_INPUT) is None
+    speculator.finish()
+
+    assert (speculator.mismatches, speculator.hits, speculator.wasted) == (1, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_unused_speculation_is_cancelled_and_counted_as_wasted():
+    tool, _ = fake_generator({"plans": []})
+    speculator = PlanSpeculator(tool)
+
+    speculator.start(PLAN_INPUT)
+    speculator.finish()
+    await asyncio.sleep(0)
+
+    assert speculator.wasted == 1
+    assert await take_speculative_plan(PLAN_INPUT) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_speculation_falls_back_to_a_normal_call():
+    tool, _ = fake_generator(error=RuntimeError("boom"))
+    speculator = PlanSpeculator(tool)
+
+    speculator.start(PLAN_INPUT)
+    assert await take_speculative_plan(PLAN_INPUT) is None
+    speculator.finish()
+
+    assert speculator.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_disabled_speculator_does_nothing():
+    tool, calls = fake_generator({"plans": []})
+    speculator = PlanSpeculator(tool, enabled=False)
+
+    speculator.start(PLAN_INPUT)
+    assert await take_speculative_plan(PLAN_INPUT) is None
+    assert calls == [] and speculator.started == 0
@@ -0,0 +1,58 @@
+"""プロンプトキャッシュ向けのプロンプト構成とキャッシュ済みトークンの集計"""
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from app.agents.callbacks import TokenUsageCollector, extract_cached_tokens
+from app.agents.travel_agent import SYSTEM_PROMPT
+from app.models.schemas import Message
+from app.services.session_manager import SessionManager
+
+
+def result_with(usage_metadata=None, llm_output=None) -> LLMResult:
+    message = AIMessage(content="ok", usage_metadata=usage_metadata) if usage_metadata else AIMessage(content="ok")
+    return LLMResult(generations=[[ChatGeneration(message=message)]], llm_output=llm_output)
+
+
+def test_cached_tokens_are_read_from_either_usage_format():
+    usage = {"input_tokens": 2000, "output_tokens": 10, "total_tokens": 2010, "input_token_details": {"cache_read": 1536}}
+    token_usage = {"prompt_tokens": 2000, "completion_tokens": 10, "prompt_tokens_details": {"cached_tokens": 1024}}
+
+    assert extract_cached_tokens(result_with(usage_metadata=usage)) == 1536
+    assert extract_cached_tokens(result_with(llm_output={"token_usage": token_usage})) == 1024
+    assert extract_cached_tokens(result_with()) == 0
+
+
+@pytest.mark.asyncio
+async def test_collector_reports_prompt_cache_hit_rate():
+    collector = TokenUsageCollector()
+    token_usage = {"prompt_tokens": 2000, "completion_tokens": 10, "prompt_tokens_details": {"cached_tokens": 1500}}
+
+    await collector.on_llm_end(result_with(llm_output={"token_usage": token_usage}))
+    await collector.on_llm_end(result_with(llm_output={"token_usage": {"prompt_tokens": 2000, "completion_tokens": 10}}))
+
+    assert collector.as_dict()["cached_tokens"] == 1500
+    assert collector.as_dict()["prompt_cache_hit_rate"] == 0.375
+
+
+@pytest.mark.asyncio
+async def test_turn_context_follows_the_stable_prefix(mock_openai, build_agent):
+    openai = mock_openai(["承知しました。", "承知しました。"])
+    agent = build_agent(openai)
+    session = SessionManager().create_session("prompt-cache-test")
+
+    result = await agent.process_message("大阪出張の規程を確認して", session)
+    # 会話履歴への追記は API 側（chat ルート）が行う
+    session.messages += [
+        Message(role="user", type="text", content="大阪出張の規程を確認して"),
+        Message(role="assistant", type="text", content=result["response"]),
+    ]
+    await agent.process_message("福岡出張の規程も確認して", session)
+
+    first, second = (request["messages"] for request in openai.requests)
+    assert first[0] == second[0] and first[0]["content"].startswith(SYSTEM_PROMPT[:30])
+    # 前のターンは履歴としてコンテキストより前に追記される
+    assert [m["content"] for m in second[1:3]] == ["大阪出張の規程を確認して", "承知しました。"]
+    for messages in (first, second):
+        assert messages[-2]["role"] == "system" and messages[-2]["content"].startswith("## 現在の会話状況")
+        assert messages[-1]["role"] == "user"
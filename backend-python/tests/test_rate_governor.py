@@ -0,0 +1,138 @@
+"""RPM・TPM のガバナー"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.agents.resilience import LLMResilience
+from app.services.degradation import DegradationController
+from app.services.rate_governor import RateGovernor, parse_reset
+
+
+def response(headers, model="gpt-test", status=200) -> httpx.Response:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions", json={"model": model})
+    return httpx.Response(status, headers=headers, request=request)
+
+
+def test_parse_reset():
+    assert parse_reset("120ms") == pytest.approx(0.12)
+    assert parse_reset("2s") == 2.0
+    assert parse_reset("1m30s") == 90.0
+    assert parse_reset("") is None
+    assert parse_reset("soon") is None
+
+
+def test_estimate_tokens_adds_completion_budget():
+    governor = RateGovernor(chars_per_token=2.0, completion_tokens=500)
+
+    assert governor.estimate_tokens(1000) == 1000
+    assert governor.estimate_tokens(1000, max_tokens=100) == 600
+
+
+@pytest.mark.asyncio
+async def test_requests_beyond_the_limit_wait_in_fifo_order():
+    governor = RateGovernor(default_rpm=600, default_tpm=1_000_000)  # 0.1 秒に1回補充
+    governor._governor("m").requests.level = 1
+    order = []
+
+    async def call(index: int) -> None:
+        await governor.acquire("m", 1)
+        order.append(index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(4)))
+
+    assert order == [0, 1, 2, 3]
+    assert 0.25 <= time.perf_counter() - start < 1.0
+
+
+@pytest.mark.asyncio
+async def test_large_request_is_not_overtaken_by_small_ones():
+    governor = RateGovernor(default_rpm=10_000, default_tpm=6000)  # 0.01 秒に1トークン補充
+    governor._governor("m").tokens.level = 0
+    order = []
+
+    async def call(name: str, tokens: int) -> None:
+        await governor.acquire("m", tokens)
+        order.append(name)
+
+    big = asyncio.ensure_future(call("big", 20))
+    await asyncio.sleep(0)
+    small = asyncio.ensure_future(call("small", 1))
+    await asyncio.gather(big, small)
+
+    assert order == ["big", "small"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_block_the_queue():
+    governor = RateGovernor(default_rpm=600, default_tpm=1_000_000)
+    model = governor._governor("m")
+    model.requests.level = 0
+
+    waiter = asyncio.ensure_future(governor.acquire("m", 1))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.wait_for(governor.acquire("m", 1), timeout=1.0)
+
+    assert not model._waiters
+
+
+@pytest.mark.asyncio
+async def test_limits_are_learned_from_response_headers():
+    governor = RateGovernor(default_rpm=500, default_tpm=30000)
+    await governor.observe_response(response({
+        "x-ratelimit-limit-requests": "5000",
+        "x-ratelimit-limit-tokens": "800000",
+        "x-ratelimit-remaining-requests": "4999",
+        "x-ratelimit-remaining-tokens": "1000",
+    }))
+
+    model = governor._governor("gpt-test")
+    assert model.requests.limit == 5000
+    assert model.tokens.limit == 800000
+    assert model.tokens.level <= 1000
+
+
+@pytest.mark.asyncio
+async def test_exhausted_limit_blocks_until_reset():
+    governor = RateGovernor(default_rpm=1_000_000, default_tpm=1_000_000)
+    await governor.observe_response(response(
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "200ms"}, status=429,
+    ))
+
+    start = time.perf_counter()
+    await governor.acquire("gpt-test", 1)
+
+    assert time.perf_counter() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_other_endpoints_and_disabled_governor_are_ignored():
+    governor = RateGovernor(enabled=False)
+    await governor.observe_response(response({"x-ratelimit-limit-requests": "5"}))
+    assert governor._models == {}
+    assert await governor.acquire("m", 10**9) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_governor_wait_is_not_counted_as_model_latency():
+    health = DegradationController(min_samples=100)
+    resilience = LLMResilience("big", hedge_model="small", hedge_max_delay_seconds=0.05, health=health)
+    hedged = []
+
+    async def admit():
+        await asyncio.sleep(0.2)
+
+    async def primary():
+        return "primary"
+
+    async def hedge():
+        hedged.append(True)
+        return "hedge"
+
+    assert await resilience.call(primary, hedge, admit=admit) == "primary"
+    assert not hedged
+    assert list(resilience._latencies)[0] < 0.05
+    assert health._samples[0][1] < 0.05
@@ -0,0 +1,225 @@
+"""LLM 呼び出しのヘッジ・リトライ・サーキットブレーカー"""
+import asyncio
+
+import httpx
+import openai
+import pytest
+from langchain_core.callbacks import AsyncCallbackHandler
+from prometheus_client import REGISTRY
+
+from app.agents.callbacks import MetricsCallbackHandler
+from app.agents.llm import DeadlineAwareChatOpenAI
+from app.agents.resilience import MIN_LATENCY_SAMPLES, CircuitBreaker, CircuitOpenError, LLMResilience
+from app.services.degradation import DegradationController
+from conftest import USAGE
+
+
+def rate_limited(retry_after: str = "") -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    headers = {"retry-after": retry_after} if retry_after else {}
+    return openai.RateLimitError("slow down", response=httpx.Response(429, request=request, headers=headers), body=None)
+
+
+def make_resilience(**kwargs) -> LLMResilience:
+    options = dict(
+        hedge_model="hedge-model",
+        hedge_min_delay_seconds=0.05,
+        hedge_max_delay_seconds=0.05,
+        retry_attempts=2,
+        retry_base_seconds=0.0,
+        circuit_failure_threshold=2,
+        circuit_reset_seconds=60.0,
+        health=DegradationController(enabled=False),
+    )
+    options.update(kwargs)
+    return LLMResilience("resilience-test-model", **options)
+
+
+def sequence(*outcomes):
+    """呼ばれるたびに outcomes を順に返す（例外なら送出、(秒, 値) なら待ってから返す）"""
+    calls = []
+
+    async def call():
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(1)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, tuple):
+            await asyncio.sleep(outcome[0])
+            return outcome[1]
+        return outcome
+
+    return call, calls
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried_then_raised():
+    resilience = make_resilience(circuit_failure_threshold=10)
+    primary, calls = sequence(rate_limited(), "ok")
+    assert await resilience.call(primary) == "ok"
+    assert len(calls) == 2
+
+    failing, calls = sequence(rate_limited())
+    with pytest.raises(openai.RateLimitError):
+        await resilience.call(failing)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_are_not_retried():
+    resilience = make_resilience()
+    primary, calls = sequence(ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        await resilience.call(primary)
+    assert len(calls) == 1 and resilience.breaker.failures == 0
+
+
+def test_retry_delay_honours_retry_after_and_caps_jitter():
+    resilience = make_resilience(retry_base_seconds=1.0, retry_max_seconds=4.0)
+
+    assert resilience.retry_delay(0, rate_limited("2")) == 2.0
+    assert resilience.retry_delay(0, rate_limited("30")) == 4.0
+    assert all(0 <= resilience.retry_delay(5, rate_limited()) <= 4.0 for _ in range(20))
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_the_faster_answer_wins():
+    resilience = make_resilience()
+    primary, _ = sequence((1.0, "primary"))
+    hedge, hedge_calls = sequence((0.0, "hedge"))
+
+    assert await resilience.call(primary, hedge) == "hedge"
+    assert len(hedge_calls) == 1
+
+    fast_primary, _ = sequence("primary")
+    hedge, hedge_calls = sequence("hedge")
+    assert await resilience.call(fast_primary, hedge) == "primary"
+    assert hedge_calls == []
+
+
+def test_hedge_delay_uses_the_recent_p95():
+    resilience = make_resilience(hedge_min_delay_seconds=0.5, hedge_max_delay_seconds=10.0)
+    assert resilience.hedge_delay() == 10.0
+
+    resilience._latencies.extend([1.0] * (MIN_LATENCY_SAMPLES - 1) + [3.0])
+    assert resilience.hedge_delay() == 3.0
+    resilience._latencies.clear()
+    resilience._latencies.extend([0.1] * MIN_LATENCY_SAMPLES)
+    assert resilience.hedge_delay() == 0.5
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_or_goes_to_the_hedge():
+    resilience = make_resilience(retry_attempts=0)
+    failing, calls = sequence(rate_limited())
+    for _ in range(2):
+        with pytest.raises(openai.RateLimitError):
+            await resilience.call(failing)
+    assert resilience.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        await resilience.call(failing)
+    hedge, _ = sequence("hedge")
+    assert await resilience.call(failing, hedge) == "hedge"
+    assert len(calls) == 2
+
+
+def test_breaker_half_open_allows_one_trial():
+    breaker = CircuitBreaker("breaker-test-model", failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_loser_that_also_finished_is_discarded():
+    resilience = make_resilience()
+    gate = asyncio.get_running_loop().create_future()
+    discarded = []
+
+    async def primary():
+        await gate
+        return "primary"
+
+    async def hedge():
+        gate.set_result(None)
+        return "hedge"
+
+    async def discard(result):
+        discarded.append(result)
+
+    winner = await resilience.call(primary, hedge, discard=discard)
+
+    assert discarded == [{"primary": "hedge", "hedge": "primary"}[winner]]
+
+
+def test_release_trial_reopens_the_half_open_slot():
+    breaker = CircuitBreaker("breaker-test-model", failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+
+    assert breaker.allow() and not breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_hedge_answer_is_metered_under_the_hedge_model(mock_openai):
+    primary_openai, hedge_openai = mock_openai(["primary"]), mock_openai(["hedge"])
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return primary_openai._handle(request)
+
+    hedge_llm = DeadlineAwareChatOpenAI(
+        model="hedge-test-model", api_key="sk-test", max_retries=0, http_async_client=hedge_openai.client()
+    )
+    llm = DeadlineAwareChatOpenAI(
+        model="primary-test-model",
+        api_key="sk-test",
+        max_retries=0,
+        http_async_client=httpx.AsyncClient(transport=httpx.MockTransport(slow)),
+    ).with_resilience(make_resilience(), hedge_llm)
+
+    def tokens(model: str) -> float:
+        return REGISTRY.get_sample_value("sales_support_llm_prompt_tokens_sum", {"model": model}) or 0.0
+
+    before = tokens("hedge-test-model"), tokens("primary-test-model")
+    message = await llm.ainvoke("こんにちは", config={"callbacks": [MetricsCallbackHandler()]})
+
+    assert message.content == "hedge"
+    assert tokens("hedge-test-model") - before[0] == USAGE["prompt_tokens"]
+    assert tokens("primary-test-model") == before[1]
+
+
+@pytest.mark.asyncio
+async def test_hedged_stream_emits_token_callbacks(mock_openai):
+    primary_openai, hedge_openai = mock_openai(["primary"]), mock_openai(["ヘッジの応答"])
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return primary_openai._handle(request)
+
+    hedge_llm = DeadlineAwareChatOpenAI(
+        model="hedge-test-model", api_key="sk-test", max_retries=0, http_async_client=hedge_openai.client()
+    )
+    llm = DeadlineAwareChatOpenAI(
+        model="primary-test-model",
+        api_key="sk-test",
+        max_retries=0,
+        stream_usage=True,
+        http_async_client=httpx.AsyncClient(transport=httpx.MockTransport(slow)),
+    ).with_resilience(make_resilience(), hedge_llm)
+    tokens = []
+
+    class TokenCollector(AsyncCallbackHandler):
+        async def on_llm_new_token(self, token: str, **kwargs) -> None:
+            tokens.append(token)
+
+    chunks = [chunk async for chunk in llm.astream("こんにちは", config={"callbacks": [TokenCollector()]})]
+
+    assert "".join(chunk.content for chunk in chunks) == "ヘッジの応答"
+    assert "".join(tokens) == "ヘッジの応答"
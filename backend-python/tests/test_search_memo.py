@@ -0,0 +1,83 @@
+"""検索ツールのメモ化"""
+from prometheus_client import REGISTRY
+
+from app.agents.tools.search_memo import SearchMemo, build_memo_key
+
+
+def counting(result):
+    calls = []
+
+    def func():
+        calls.append(1)
+        return result
+
+    return func, calls
+
+
+def test_key_normalizes_strings_and_ignores_none():
+    assert build_memo_key("hotel_search", {"destination": " 大阪 ", "area": None}) == build_memo_key(
+        "hotel_search", {"destination": "大阪"}
+    )
+    assert build_memo_key("hotel_search", {"destination": "大阪"}) != build_memo_key(
+        "transportation_search", {"destination": "大阪"}
+    )
+
+
+def test_run_scope_and_global_hits():
+    memo = SearchMemo(enabled=True, max_entries=10, ttl_seconds=60)
+    func, calls = counting({"results": [1]})
+
+    with memo.run_scope():
+        memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+        memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+    with memo.run_scope():
+        memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+
+    assert len(calls) == 1
+    counters = memo.stats()["tools"]["hotel_search"]
+    assert (counters["misses"], counters["run_hits"], counters["global_hits"]) == (1, 1, 1)
+
+
+def test_results_are_copies():
+    memo = SearchMemo(enabled=True, max_entries=10, ttl_seconds=60)
+    func, _ = counting({"results": [1]})
+
+    memo.get_or_call("hotel_search", {"destination": "大阪"}, func)["results"].append(2)
+
+    assert memo.get_or_call("hotel_search", {"destination": "大阪"}, func) == {"results": [1]}
+
+
+def test_expired_and_evicted_entries_are_recomputed():
+    memo = SearchMemo(enabled=True, max_entries=1, ttl_seconds=60)
+    func, calls = counting({"results": []})
+
+    memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+    memo.get_or_call("hotel_search", {"destination": "名古屋"}, func)
+    memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+    assert len(calls) == 3
+
+    memo.ttl_seconds = -1
+    memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+    assert len(calls) == 4
+
+
+def test_disabled_memo_always_calls():
+    memo = SearchMemo(enabled=False, max_entries=10, ttl_seconds=60)
+    func, calls = counting({})
+    memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+    memo.get_or_call("hotel_search", {"destination": "大阪"}, func)
+    assert len(calls) == 2
+
+
+def test_lookups_are_exported_to_prometheus():
+    def sample(result):
+        return REGISTRY.get_sample_value(
+            "sales_support_search_memo_lookups_total", {"tool": "memo_metrics_test", "result": result}
+        ) or 0.0
+
+    memo = SearchMemo(enabled=True, max_entries=10, ttl_seconds=60)
+    func, _ = counting({})
+    memo.get_or_call("memo_metrics_test", {"destination": "大阪"}, func)
+    memo.get_or_call("memo_metrics_test", {"destination": "大阪"}, func)
+
+    assert (sample("miss"), sample("global_hit")) == (1, 1)
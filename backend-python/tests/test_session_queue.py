@@ -0,0 +1,103 @@
+"""同一セッションのメッセージの逐次実行"""
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services import session_manager as session_manager_module
+from app.services.session_manager import SessionBusyError, SessionManager, session_manager
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(f"sales_support_{name}", labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_turns_of_one_session_run_in_arrival_order():
+    manager = SessionManager()
+    order = []
+
+    async def turn(index):
+        async with manager.session_turn("s"):
+            order.append(("start", index))
+            await asyncio.sleep(0.01)
+            order.append(("end", index))
+
+    await asyncio.gather(*(turn(i) for i in range(3)))
+
+    assert order == [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+    assert manager.queue_stats()["busy_sessions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_other_sessions_run_in_parallel():
+    manager = SessionManager()
+    inside = []
+
+    async def turn(session_id):
+        async with manager.session_turn(session_id):
+            inside.append(session_id)
+            await asyncio.sleep(0.05)
+
+    tasks = [asyncio.ensure_future(turn(s)) for s in ("a", "b")]
+    await asyncio.sleep(0.01)
+    assert sorted(inside) == ["a", "b"]
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(session_manager_module.settings, "session_queue_max_depth", 1)
+    manager = SessionManager()
+    rejected = sample("session_turns_total", outcome="rejected")
+
+    async with manager.session_turn("s"):
+        with pytest.raises(SessionBusyError) as error:
+            async with manager.session_turn("s"):
+                pass
+
+    assert error.value.reason == "queue_full"
+    assert sample("session_turns_total", outcome="rejected") == rejected + 1
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_is_recorded():
+    manager = SessionManager()
+    timeouts = sample("session_turn_wait_seconds_count", outcome="timeout")
+
+    async with manager.session_turn("s"):
+        with pytest.raises(SessionBusyError) as error:
+            async with manager.session_turn("s", timeout=0.01):
+                pass
+
+    assert error.value.reason == "wait_timeout"
+    assert manager.queue_stats()["timeouts"] == 1
+    assert sample("session_turn_wait_seconds_count", outcome="timeout") == timeouts + 1
+
+
+@pytest.mark.asyncio
+async def test_queue_gauges_follow_the_global_manager():
+    async def turn():
+        async with session_manager.session_turn("gauge-test"):
+            await asyncio.sleep(0.05)
+
+    tasks = [asyncio.ensure_future(turn()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert sample("session_queue", kind="queued_turns") == 2
+    assert sample("session_queue", kind="max_depth") == 3
+    await asyncio.gather(*tasks)
+    assert sample("session_queue", kind="busy_sessions") == 0
+
+
+def test_active_sessions_count_recent_activity_only():
+    manager = SessionManager()
+    old = manager.create_session("u").session_id
+    manager.create_session("u")
+    manager._last_active[old] -= 1000
+
+    assert manager.session_count == 2
+    assert manager.active_session_count(window_seconds=60) == 1
+    manager.update_session(old)
+    assert manager.active_session_count(window_seconds=60) == 2
+    manager.delete_session(old)
+    assert manager.active_session_count(window_seconds=60) == 1
@@ -0,0 +1,98 @@
+"""重複リクエストの合流"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routes import chat
+from app.services.single_flight import SingleFlight, build_flight_key
+
+
+def test_flight_key_depends_on_owner_and_message():
+    assert build_flight_key("s1", "u", " 大阪 ") == build_flight_key("s1", "u", "大阪")
+    assert build_flight_key("s1", "u", "大阪") != build_flight_key("s2", "u", "大阪")
+    assert build_flight_key(None, "u1", "大阪") != build_flight_key(None, "u2", "大阪")
+
+
+@pytest.mark.asyncio
+async def test_do_runs_duplicates_once():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flights.do("k", work) for _ in range(3)))
+
+    assert results == ["result"] * 3
+    assert len(calls) == 1
+    assert flights.stats() == {"inflight": 0, "leaders": 1, "coalesced": 2}
+
+
+@pytest.mark.asyncio
+async def test_do_cancels_work_when_every_waiter_leaves():
+    flights = SingleFlight()
+    started = asyncio.Event()
+    cancelled = []
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    waiter = asyncio.ensure_future(flights.do("k", work))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert cancelled == [True]
+
+
+@pytest.mark.asyncio
+async def test_lead_refuses_to_overwrite_and_join_sees_leader():
+    flights = SingleFlight()
+    leader = flights.lead("k")
+
+    with pytest.raises(RuntimeError):
+        flights.lead("k")
+    assert flights.join("k") is leader
+
+    leader.set_result("done")
+    await asyncio.sleep(0)
+    assert flights.join("k") is None
+
+
+class _SlowAgent:
+    def __init__(self):
+        self.runs = 0
+
+    async def stream_message(self, user_message, session_data, company_name=None, deadline=None):
+        self.runs += 1
+        await asyncio.sleep(0.1)
+        yield {"event": "token", "data": {"content": "了解"}}
+        yield {"event": "result", "data": {"response": "了解しました", "plans": [], "updated_conditions": None}}
+
+
+@pytest.mark.asyncio
+async def test_simultaneous_stream_requests_have_a_single_leader(monkeypatch):
+    agent = _SlowAgent()
+    monkeypatch.setattr(chat, "get_agent", lambda: agent)
+    monkeypatch.setattr(chat, "single_flight", SingleFlight())
+    app = FastAPI()
+    app.include_router(chat.router)
+    body = {"message": "大阪に出張", "user_id": "single-flight-test"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/api/chat/stream", json=body) for _ in range(2)))
+
+    assert agent.runs == 1
+    for response in responses:
+        assert "event: done" in response.text
+        assert "了解しました" in response.text
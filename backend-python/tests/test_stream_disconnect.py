@@ -0,0 +1,65 @@
+"""ストリーミング中のクライアント切断"""
+import asyncio
+import json
+
+import pytest
+
+from app.api.routes import chat
+from app.main import app
+
+
+class _BlockingAgent:
+    def __init__(self):
+        self.cancelled = asyncio.Event()
+
+    async def stream_message(self, user_message, session_data, company_name=None, deadline=None):
+        yield {"event": "token", "data": {"content": "了解"}}
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        yield {"event": "result", "data": {"response": "了解しました", "plans": [], "updated_conditions": None}}
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_agent_through_middleware(monkeypatch):
+    agent = _BlockingAgent()
+    monkeypatch.setattr(chat, "get_agent", lambda: agent)
+    body = json.dumps({"message": "大阪に出張", "user_id": "disconnect-test"}).encode()
+    disconnected = asyncio.Event()
+    received = []
+    sent = []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},  # uvicorn の HTTP と同じ
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat/stream",
+        "raw_path": b"/api/chat/stream",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "server": ("test", 80),
+        "client": ("test", 1),
+    }
+    request = asyncio.ensure_future(app(scope, receive, send))
+    while not any(b"event: token" in message.get("body", b"") for message in sent):
+        await asyncio.sleep(0.01)
+
+    disconnected.set()
+    await asyncio.wait_for(request, 2)
+
+    assert agent.cancelled.is_set()
+    assert not any(b"event: done" in message.get("body", b"") for message in sent)
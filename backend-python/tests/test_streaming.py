@@ -0,0 +1,41 @@
+"""ストリーミング（TravelSupportAgent.stream_message）"""
+import pytest
+
+from app.services.session_manager import SessionManager
+
+POLICY_ARGS = {
+    "transportation_type": "新幹線",
+    "transportation_cost": 27000,
+    "hotel_cost_per_night": 9000,
+    "total_nights": 1,
+}
+
+
+async def collect(agent, message):
+    session = SessionManager().create_session("stream-test")
+    return [event async for event in agent.stream_message(message, session)]
+
+
+@pytest.mark.asyncio
+async def test_events_arrive_in_order(mock_openai, build_agent):
+    openai = mock_openai([{"name": "policy_checker", "args": POLICY_ARGS}, "規程の範囲内です。"])
+    events = await collect(build_agent(openai), "大阪出張の規程を確認して")
+
+    kinds = [event["event"] for event in events]
+    assert kinds[:2] == ["tool_start", "tool_end"]
+    assert kinds[-1] == "result"
+    assert events[1]["data"]["tool"] == "policy_checker"
+    assert "result" in events[1]["data"]  # LLM には圧縮した表、API には完全な結果
+    tokens = [event["data"]["content"] for event in events if event["event"] == "token"]
+    assert len(tokens) == 2 and "".join(tokens) == "規程の範囲内です。"
+    assert events[-1]["data"]["response"] == "規程の範囲内です。"
+    assert all(request.get("stream") for request in openai.requests)
+
+
+@pytest.mark.asyncio
+async def test_llm_error_is_reported_as_result(mock_openai, build_agent):
+    openai = mock_openai([400])
+    events = await collect(build_agent(openai), "大阪出張の規程を確認して")
+
+    assert events[-1]["event"] == "result"
+    assert "エラーが発生しました" in events[-1]["data"]["response"]
@@ -0,0 +1,76 @@
+"""ToolCallingLoop（AGENT_ENGINE=native）のテスト"""
+import pytest
+from langchain_core.tools import tool
+
+from app.agents.llm import DeadlineAwareChatOpenAI
+from app.agents.tool_loop import ToolCallingLoop
+
+
+@tool
+def echo(text: str) -> str:
+    """入力をそのまま返す"""
+    return f"echo: {text}"
+
+
+@tool
+def broken(text: str) -> str:
+    """必ず失敗する"""
+    raise ValueError("backend down")
+
+
+def build_loop(openai) -> ToolCallingLoop:
+    llm = DeadlineAwareChatOpenAI(model="gpt-4o", api_key="sk-test", max_retries=0, http_async_client=openai.client())
+    return ToolCallingLoop(llm, [echo, broken], "system", "{context}")
+
+
+@pytest.mark.asyncio
+async def test_tool_result_is_fed_back(mock_openai):
+    openai = mock_openai([{"name": "echo", "args": {"text": "hi"}}, "done"])
+    result = await build_loop(openai).ainvoke({"input": "q"})
+
+    assert result["output"] == "done"
+    assert result["intermediate_steps"][0][1] == "echo: hi"
+    assert openai.requests[1]["messages"][-1]["content"] == "echo: hi"
+
+
+@pytest.mark.asyncio
+async def test_tool_error_becomes_observation(mock_openai):
+    openai = mock_openai([{"name": "broken", "args": {"text": "hi"}}, "sorry"])
+    result = await build_loop(openai).ainvoke({"input": "q"})
+
+    assert result["output"] == "sorry"
+    observation = openai.requests[1]["messages"][-1]["content"]
+    assert "ValueError" in observation and "backend down" in observation
+
+
+@pytest.mark.asyncio
+async def test_unknown_tool(mock_openai):
+    openai = mock_openai([{"name": "missing", "args": {}}, "ok"])
+    result = await build_loop(openai).ainvoke({"input": "q"})
+
+    assert result["output"] == "ok"
+    assert "missing is not a valid tool" in result["intermediate_steps"][0][1]
+
+
+def test_sync_invoke(mock_openai):
+    openai = mock_openai([{"name": "echo", "args": {"text": "hi"}}, "done"])
+    assert build_loop(openai).invoke({"input": "q"})["output"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_sync_invoke_inside_running_loop_is_rejected(mock_openai):
+    openai = mock_openai(["done"])
+    with pytest.raises(RuntimeError, match="ainvoke"):
+        build_loop(openai).invoke({"input": "q"})
+    assert openai.requests == []
+
+
+@pytest.mark.asyncio
+async def test_iteration_limit(mock_openai):
+    openai = mock_openai([{"name": "echo", "args": {"text": "hi"}}])
+    loop = build_loop(openai)
+    loop.max_iterations = 2
+    result = await loop.ainvoke({"input": "q"})
+
+    assert result["output"] == "Agent stopped due to iteration limit or time limit."
+    assert len(openai.requests) == 2
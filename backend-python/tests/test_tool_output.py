@@ -0,0 +1,102 @@
+"""LLM に渡すツール出力の圧縮表現"""
+import json
+
+import pytest
+
+from app.agents import travel_agent
+from app.agents.tools import HotelSearchTool, PolicyCheckerTool, TransportationSearchTool
+from app.agents.tools import tool_output
+from app.agents.tools.tool_output import render_for_llm, tool_result_scope
+from app.models.schemas import TravelConditions
+from app.services.session_manager import SessionManager
+from app.services.token_counter import count_text_tokens
+
+PLAN_CALL = {
+    "name": "plan_generator",
+    "args": {"departure_location": "東京", "destination": "大阪", "depart_date": "2099-12-09", "return_date": "2099-12-10"},
+}
+
+
+def test_transportation_table_is_smaller_than_json():
+    result = TransportationSearchTool()._run(departure="東京", destination="大阪")
+
+    rendered = render_for_llm("transportation_search", result)
+
+    assert rendered.startswith("東京→大阪")
+    assert len(rendered.splitlines()) == len(result["options"]) + 1
+    assert count_text_tokens(rendered) < count_text_tokens(json.dumps(result, ensure_ascii=False))
+
+
+def test_hotels_are_cut_to_top_k(monkeypatch):
+    monkeypatch.setattr(tool_output.settings, "tool_output_top_k", 2)
+    result = HotelSearchTool()._run(destination="大阪", nights=2)
+
+    rendered = render_for_llm("hotel_search", result)
+
+    assert len(rendered.splitlines()) == 1 + min(2, len(result["hotels"]))
+    assert result["hotels"][0]["name"] in rendered
+
+
+def test_policy_lines_keep_every_finding():
+    result = PolicyCheckerTool()._run(
+        transportation_type="新幹線", transportation_cost=27000, hotel_cost_per_night=30000, total_nights=1
+    )
+
+    rendered = render_for_llm("policy_checker", result)
+
+    assert rendered.splitlines()[0] == f"判定: {result['status']}"
+    assert all(error in rendered for error in result.get("errors", []))
+    assert all(warning in rendered for warning in result.get("warnings", []))
+
+
+def test_failures_timeouts_and_unknown_tools_pass_through():
+    failure = {"found": False, "message": "該当なし"}
+    timeout = {"success": False, "timeout": True, "message": "timeout"}
+
+    assert render_for_llm("hotel_search", failure) == failure
+    assert render_for_llm("plan_generator", timeout) == timeout
+    assert render_for_llm("condition_extractor", {"a": 1}) == {"a": 1}
+
+
+def test_compact_output_can_be_disabled_and_full_results_are_collected(monkeypatch):
+    monkeypatch.setattr(tool_output.settings, "tool_output_compact", False)
+    result = HotelSearchTool()._run(destination="大阪")
+
+    with tool_result_scope() as results:
+        assert render_for_llm("hotel_search", result) == result
+
+    assert results == [("hotel_search", result)]
+
+
+def test_token_stats_are_only_measured_when_enabled(monkeypatch):
+    result = HotelSearchTool()._run(destination="大阪")
+
+    def fail(text):
+        raise AssertionError("counted tokens with stats disabled")
+
+    monkeypatch.setattr(tool_output, "count_text_tokens", fail)
+    assert isinstance(render_for_llm("hotel_search", result), str)
+
+    counted = []
+    monkeypatch.setattr(tool_output, "count_text_tokens", lambda text: counted.append(text) or 0)
+    monkeypatch.setattr(tool_output.settings, "tool_output_token_stats", True)
+    render_for_llm("hotel_search", result)
+    assert len(counted) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("engine", ["langchain", "native"])
+async def test_uncompacted_plans_reach_the_llm_as_json(monkeypatch, mock_openai, build_agent, engine):
+    monkeypatch.setattr(tool_output.settings, "tool_output_compact", False)
+    monkeypatch.setattr(travel_agent.settings, "agent_engine", engine)
+    monkeypatch.setattr(travel_agent.settings, "plan_finish_mode", "off")
+    openai = mock_openai([PLAN_CALL, "3件のプランです。"])
+    session = SessionManager().create_session("tool-output-test")
+    session.conditions = TravelConditions(**PLAN_CALL["args"])
+
+    await build_agent(openai).process_message("おすすめのプランを提案して", session)
+
+    tool_message = next(m for m in openai.requests[1]["messages"] if m["role"] == "tool")
+    content = json.loads(tool_message["content"])
+    assert content["success"] is True
+    assert content["plans"][0]["label"] == "プランA"
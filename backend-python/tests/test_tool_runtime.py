@@ -0,0 +1,58 @@
+"""ツールの非同期実行（スレッドプール・同時実行数・タイムアウト）"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.agents.chat_history import MESSAGE_OVERHEAD_TOKENS, count_tokens
+from app.agents.tools import tool_runtime
+from app.agents.tools.tool_runtime import ThreadPoolTool, run_tool_async
+from app.services.token_counter import count_text_tokens
+
+
+class _SleepTool(ThreadPoolTool):
+    name: str = "sleep_tool"
+    description: str = "指定秒数待つ"
+
+    def _run(self, seconds: float = 0.05) -> dict:
+        time.sleep(seconds)
+        return {"success": True, "thread": threading.current_thread().name}
+
+
+@pytest.mark.asyncio
+async def test_runs_off_the_event_loop_in_parallel():
+    tool = _SleepTool()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_tool_async(tool, seconds=0.1) for _ in range(4)))
+
+    assert time.perf_counter() - start < 0.3
+    assert all(result["thread"] != threading.current_thread().name for result in results)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped(monkeypatch):
+    monkeypatch.setattr(tool_runtime, "_semaphore", asyncio.Semaphore(1))
+    tool = _SleepTool()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_tool_async(tool, seconds=0.05) for _ in range(3)))
+
+    assert time.perf_counter() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_timeout_is_returned_to_the_llm(monkeypatch):
+    monkeypatch.setattr(tool_runtime.settings, "tool_timeout_seconds", 0.05)
+    result = await run_tool_async(_SleepTool(), seconds=0.3)
+
+    assert result["success"] is False and result["timeout"] is True
+    assert "sleep_tool" in result["message"]
+
+
+@pytest.mark.asyncio
+async def test_shared_arun_returns_result_for_tools_without_renderer():
+    assert (await _SleepTool().ainvoke({"seconds": 0.0}))["success"] is True
+
+
+def test_text_token_count_has_no_message_overhead():
+    assert count_tokens("大阪に出張") == count_text_tokens("大阪に出張") + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,59 @@
+"""ターンごとに LLM に渡すツールの選択"""
+import pytest
+
+from app.agents import travel_agent
+from app.agents.tool_selection import select_tools
+from app.models.schemas import TravelConditions
+from app.services.session_manager import SessionManager
+
+FULL = dict(departure_location="東京", destination="大阪", depart_date="2099-12-09", return_date="2099-12-10")
+
+
+def test_policy_checker_is_always_available():
+    assert select_tools(TravelConditions(), "こんにちは") == ("policy_checker",)
+
+
+def test_searches_follow_known_conditions():
+    route = TravelConditions(departure_location="東京", destination="大阪")
+    day_trip = TravelConditions(departure_location="東京", destination="大阪", is_day_trip=True)
+
+    assert select_tools(route, "どうしよう") == ("policy_checker", "transportation_search", "hotel_search")
+    assert select_tools(day_trip, "どうしよう") == ("policy_checker", "transportation_search")
+
+
+def test_complete_conditions_expose_searches_only_when_mentioned():
+    conditions = TravelConditions(**FULL)
+
+    assert select_tools(conditions, "おすすめは？") == ("policy_checker", "plan_generator")
+    assert select_tools(conditions, "ホテルだけ見たい") == ("policy_checker", "hotel_search", "plan_generator")
+    assert select_tools(conditions, "新幹線の時刻は？") == ("policy_checker", "transportation_search", "plan_generator")
+
+
+def request_tools(request) -> list:
+    return [tool["function"]["name"] for tool in request.get("tools", [])]
+
+
+@pytest.mark.asyncio
+async def test_agent_sends_only_the_selected_tools_and_reuses_engines(mock_openai, build_agent):
+    openai = mock_openai(["承知しました。"])
+    agent = build_agent(openai)
+    engine_count = len(agent._engines)
+    session = SessionManager().create_session("tool-selection-test")
+
+    await agent.process_message("規程を確認して", session)
+    await agent.process_message("規程の上限は？", session)
+
+    assert [request_tools(request) for request in openai.requests] == [["policy_checker"], ["policy_checker"]]
+    assert ("policy_checker",) in agent._engines
+    assert len(agent._engines) == engine_count + 1
+
+
+@pytest.mark.asyncio
+async def test_all_tools_are_sent_when_disabled(monkeypatch, mock_openai, build_agent):
+    monkeypatch.setattr(travel_agent.settings, "dynamic_tools_enabled", False)
+    openai = mock_openai(["承知しました。"])
+    session = SessionManager().create_session("tool-selection-test")
+
+    await build_agent(openai).process_message("規程を確認して", session)
+
+    assert len(request_tools(openai.requests[0])) > 1
@@ -0,0 +1,67 @@
+"""トークン・コストの集計"""
+import json
+
+from app.services import usage_meter as usage_meter_module
+from app.services.usage_meter import NO_COMPANY, UsageMeter
+
+PRICES = {"gpt-4o": (2.5, 10.0), "gpt-4o-mini": (0.15, 0.6)}
+
+
+def test_cost_uses_longest_matching_price():
+    meter = UsageMeter(prices=PRICES)
+
+    assert meter.record("gpt-4o-mini-2024-07-18", 1_000_000, 0) == 0.15
+    assert meter.record("gpt-4o-2024-08-06", 0, 1_000_000) == 10.0
+    assert meter.record("unknown-model", 1000, 1000) == 0.0
+
+
+def test_usage_is_grouped_by_scope():
+    meter = UsageMeter(prices=PRICES)
+
+    with meter.usage_scope("s1", "u1", "ACME"):
+        meter.record("gpt-4o", 1000, 100, cached_tokens=500)
+        meter.record("gpt-4o", 1000, 100)
+    with meter.usage_scope("s2", "u2", None):
+        meter.record("gpt-4o-mini", 1000, 100)
+    meter.record("gpt-4o", 10, 10)  # スコープ外は会社なし・モデル別にのみ計上
+
+    acme = meter.summary("company", key="ACME")["items"][0]
+    assert (acme["llm_calls"], acme["prompt_tokens"], acme["cached_tokens"]) == (2, 2000, 500)
+    assert [item["key"] for item in meter.summary("company")["items"]] == ["ACME", NO_COMPANY]
+    assert meter.summary("company", key=NO_COMPANY)["items"][0]["llm_calls"] == 2
+    assert {item["key"] for item in meter.summary("session")["items"]} == {"s1", "s2"}
+    assert meter.summary("model")["overall"]["llm_calls"] == 4
+
+
+def test_old_sessions_are_evicted_and_forgotten():
+    meter = UsageMeter(prices=PRICES, max_sessions=2)
+    for session_id in ("s1", "s2", "s3"):
+        with meter.usage_scope(session_id, "u", None):
+            meter.record("gpt-4o", 10, 10)
+
+    assert [item["key"] for item in meter.summary("session")["items"]] == ["s2", "s3"]
+    meter.forget_session("s2")
+    assert meter.summary("session")["count"] == 1
+    assert meter.summary("user", key="u")["items"][0]["llm_calls"] == 3
+
+
+def test_flush_writes_only_the_delta(tmp_path, monkeypatch):
+    path = tmp_path / "usage.jsonl"
+    monkeypatch.setattr(usage_meter_module.settings, "usage_flush_path", str(path))
+    meter = UsageMeter(prices=PRICES)
+
+    with meter.usage_scope("s1", "u1", "ACME"):
+        meter.record("gpt-4o", 1000, 100)
+    assert meter.flush() == 4
+    assert meter.flush() == 0
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert {record["group"] for record in records} == {"session", "user", "company", "model"}
+    assert all(record["prompt_tokens"] == 1000 for record in records)
+
+
+def test_disabled_meter_only_returns_cost():
+    meter = UsageMeter(enabled=False, prices=PRICES)
+
+    assert meter.record("gpt-4o", 1_000_000, 0) == 2.5
+    assert meter.summary("model")["count"] == 0